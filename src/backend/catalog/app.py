@@ -2,8 +2,10 @@ from flask import Flask, request
 from concurrent.futures import ThreadPoolExecutor
 import json
 import requests
-from service import lookup, is_trade_valid, catalog
+from service import lookup, lookup_many, all_items, content, is_trade_valid, catalog
 import time
+import queue
+import threading
 import argparse
 import sys
 import signal
@@ -23,6 +25,11 @@ with open('../../config.json', 'r') as file:
 
 config = json.loads(config_file_data)
 
+# id of this catalog process, sent with every item version: the versions restart from the ones in db.json
+# (or lower, if the process died before writing it), so a version is only ordered after the versions of the
+# previous processes through this id, which grows with the start time
+START_ID = int(time.time() * 1000)
+
 # stock lookup API endpoint
 @app.get("/catalog/<stock_name>")
 def lookup_API(stock_name):
@@ -36,18 +43,52 @@ def lookup_API(stock_name):
 
     if (result != None):
         # If the result is not None, construct the response object
-        
+        # reading the version first, it is bumped last when the item is updated by a trade
+        version = result.get('version', 0)
+
         # iterating over the result to keep only the values needed
-        for key in result.keys():
-            if key != 'trading_volume':
+        for key in list(result.keys()):
+            if key != 'trading_volume' and key != 'version':
                 response[key] = result[key]
         # Send a success response to the client with body as response dictionary
-        return response
+        # the version is sent as a header so that the frontend can order the cache updates
+        return response, 200, {'X-Catalog-Version': str(START_ID)+':'+str(version)}
     else:
         # If the result is None, send a 404 error response to the client
         response['error'] = 'Stock Not Found!'
         return response, 404
 
+# bulk stock lookup API endpoint, used by the ml service to read many stocks in one request
+@app.post("/catalog/lookup")
+def bulk_lookup_API():
+    # reading the stock names from the request payload
+    data = request.get_json()
+    names = data.get('names') if data else None
+    if not isinstance(names, list):
+        return {'error': 'names must be a list of stock names'}, 400
+    # submitting the lookup task to the threadpool
+    future = pool.submit(lookup_many, names)
+    found, not_found = future.result()
+
+    items = {}
+    versions = {}
+    for name, item in found.items():
+        # keeping only the values needed, like the single stock lookup
+        items[name] = {key: value for key, value in item.items() if key != 'trading_volume' and key != 'version'}
+        # the versions are sent like the cache updates so that the frontend can fill its cache from this lookup
+        versions[name] = [START_ID, item.get('version', 0)]
+    return {'data': items, 'not_found': not_found, 'versions': versions}
+
+# API endpoint to list every stock, used by the ml service for the recommendations
+@app.get("/catalog/all")
+def all_items_API():
+    # submitting the task to the threadpool
+    future = pool.submit(all_items)
+    items = future.result()
+    # keeping only the values needed, like the single stock lookup
+    return [{key: value for key, value in item.items() if key != 'trading_volume' and key != 'version'}
+            for item in items]
+
 # update catalog API endpoint
 @app.put("/catalog")
 def update_catalog():
@@ -58,13 +99,18 @@ def update_catalog():
     # reading the result received from the threadpool
     result, error = future.result()
     if result != None:
-        # invalidating the cache only if caching is enabled 
+        # the version is only used for the cache updates and is not part of the response
+        version = result.pop('version')
+        # refreshing the cache only if caching is enabled 
         # getting the cache flag from the config file
         if config['cache']:
             # constructing the request payload for cache API
-            # sending stock name in the payload such that frontend service will remove this stock from cache
+            # sending the updated stock with its version so that the frontend can replace its cached
+            # entry (write-through) instead of deleting it
             req_body = {
-                'name': data['name']
+                'name': data['name'],
+                'data': {key: value for key, value in result.items() if key != 'trading_volume'},
+                'version': [START_ID, version]
             }
             # reading the frontend config from the config 
             frontend_config = config['frontend']
@@ -78,6 +124,9 @@ def update_catalog():
             }
             # calling the cache API with requests module
             cache_resp = requests.post(url=url, json=req_body, headers=headers)
+        # the recommendations only depend on the listed stocks and their prices, the ml service is told
+        # when they changed, not on every quantity update
+        check_catalog_content()
         # returning the result 
         return result
     else:
@@ -86,6 +135,41 @@ def update_catalog():
         del error['code']
         return error, status_code
 
+# queue of the invalidations for the ml service, sent by a single background thread so that a slow or
+# stopped ml service never holds a request worker, an invalidation is dropped when the queue is full
+ml_queue = queue.Queue(maxsize=100)
+
+# last catalog content the ml service was told about
+content_lock = threading.Lock()
+last_content = None
+
+# function to send the queued invalidations to the ml service, run on its own thread
+def send_invalidations():
+    ml_config = config['ml_service']
+    url = 'http://'+ml_config['host']+':'+str(ml_config['port'])+'/ml/recommendations/invalidate'
+    while True:
+        payload = ml_queue.get()
+        try:
+            requests.post(url, json=payload, timeout=1)
+        except requests.RequestException:
+            print("recommendation invalidation failed")
+
+# function to ask the ml service to recompute the recommendations when the catalog content changed
+def check_catalog_content():
+    global last_content
+    # the notifications are only sent when the ml service is part of the stack
+    if not config.get('notify_ml_service'):
+        return
+    current = content()
+    with content_lock:
+        if current == last_content:
+            return
+        last_content = current
+    try:
+        ml_queue.put_nowait({'catalog': True})
+    except queue.Full:
+        print("recommendation invalidation dropped")
+
 def handler(sig, frame):
     print("shutdown called...")
     print("writing db file....")
@@ -99,6 +183,10 @@ def handler(sig, frame):
     sys.exit(0)
 
 if __name__ == '__main__':
+    if config.get('notify_ml_service'):
+        threading.Thread(target=send_invalidations, daemon=True).start()
+        # the catalog read from db.json may differ from the one the stored recommendations were computed on
+        check_catalog_content()
     # running the app and listening on all addresses (for AWS part) 
     # running on port passed from arguments
     app.run(host="0.0.0.0", port=args.port)
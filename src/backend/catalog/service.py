@@ -23,6 +23,34 @@ def lookup(stock_name):
     # if a stock is not found, we are returning the None value to handle the errors
     return None
 
+# function to lookup several stocks by name in a single pass over the catalog
+# returns the found items keyed by name and the list of names that were not found
+def lookup_many(stock_names):
+    wanted = set(stock_names)
+    found = {}
+    # acquiring the read lock
+    with read_lock:
+        for item in catalog:
+            if item['name'] in wanted:
+                # copying the item so that the caller does not read it while a trade updates it
+                found[item['name']] = dict(item)
+    not_found = [name for name in stock_names if name not in found]
+    return found, not_found
+
+# function to list every stock of the catalog
+def all_items():
+    # acquiring the read lock
+    with read_lock:
+        # copying the items so that the caller does not read them while a trade updates them
+        return [dict(item) for item in catalog]
+
+# function to read the part of the catalog the recommendations depend on: the listed stocks and their
+# prices (a trade only changes the quantities, so it does not change this content)
+def content():
+    # acquiring the read lock
+    with read_lock:
+        return sorted((item['name'], item['price']) for item in catalog)
+
 # function to check if the trade is valid or not
 def is_trade_valid(payload):
     # acquiring the write lock
@@ -45,8 +73,11 @@ def is_trade_valid(payload):
 
                 # incrementing the trading volume for all types of transactions
                 item['trading_volume'] += payload['quantity']
-                # return the updated stock item and error as None
-                return item, None
+                # bumping the version of the item after all the other fields are updated, lookups read the
+                # version first so a lookup never tags old values with a new version
+                item['version'] = item.get('version', 0) + 1
+                # return a copy of the updated stock item (taken under the lock) and error as None
+                return dict(item), None
 
     # return success as None and error if the stock is not found
     return None, {'code': 404, 'error':'Stock Not Found!'}
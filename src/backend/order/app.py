@@ -3,6 +3,7 @@ import json
 import requests
 from concurrent.futures import ThreadPoolExecutor
 import os
+import queue
 import threading
 import argparse
 
@@ -21,8 +22,9 @@ with open('../../config.json', 'r') as file:
 
 config = json.loads(config_file_data)
 
-# initializing the leader_id
+# initializing the leader_id and the epoch of the election it was received with
 leader_id = None
+leader_epoch = 0
 
 # initializing the locks
 read_lock = threading.Lock()
@@ -70,16 +72,23 @@ def handle_request(payload):
             result['type'] = payload['type']
             result['quantity'] = payload['quantity']
             result['transaction_number'] = transaction_number
+            # keeping the user of the trade so that the orders of a user can be listed
+            if payload.get('user_id') is not None:
+                result['user_id'] = payload['user_id']
             # adding the result object at the end of the transaction history list
             transaction_history.append(result)
             # updating the db file with the updated data
-            with open(f'log_{args.port}.json', 'w') as file:
-                json.dump(transaction_history, file)
+            write_log(transaction_history)
             
             # calling a function to sync data with other nodes (replication)
             sync_data_with_nodes(result)
-        # returning success and None as error
-        return transaction_history, None
+        # telling the ml service that the recommendations of the user are out of date, without
+        # waiting for it (the trade does not depend on the ml service)
+        if result.get('user_id') is not None:
+            invalidate_recommendations(result['user_id'])
+        # returning the new transaction as success and None as error (reading the end of the
+        # history after releasing the lock could return the transaction of a concurrent trade)
+        return result, None
     else:
         # reading the error code from response status code
         code = catalog_response.status_code
@@ -99,7 +108,7 @@ def trade_API():
     if(result != None):
         # if the result is not None, creating a response object and constructing the object as required
         response = {}
-        response = {'transaction_number': result[-1]['transaction_number']}
+        response = {'transaction_number': result['transaction_number']}
         # returning the response
         return response
     else:
@@ -125,6 +134,14 @@ def get_order_info(order_number):
         # if order is found, then returning
         return result
     
+# API endpoint to get the orders of a user, used by the ml service for the recommendations
+@app.get("/orders/user/<user_id>")
+def get_user_orders(user_id):
+    # acquiring the read lock as we are reading the transaction history (shared)
+    with read_lock:
+        orders = [item for item in transaction_history if str(item.get('user_id')) == user_id]
+    return jsonify(orders)
+
 # API endpoing to check the node health
 @app.get("/ping")
 def check_health():
@@ -137,11 +154,23 @@ def notify_leader():
     # reading the request payload
     data = request.get_json()
     global leader_id
-    # setting the leader id with the id received in the request payload
-    leader_id = data['leader_id']
+    global leader_epoch
+    epoch = data.get('epoch', 0)
+    with write_lock:
+        # ignoring notifications from an older election that arrive out of order
+        if epoch < leader_epoch:
+            return jsonify({'status': 'stale', 'epoch': leader_epoch})
+        # setting the leader id with the id received in the request payload
+        leader_id = data['leader_id']
+        leader_epoch = epoch
     # return json data with 200 ok response
     return jsonify({'status': 'ok'})
 
+# API endpoint to read the leader this node was notified about
+@app.get("/leader")
+def get_leader():
+    return jsonify({'leader_id': leader_id, 'epoch': leader_epoch})
+
 # API endpoint to sync data when the leader pushes the data to the nodes
 @app.post("/sync_data")
 def sync_data():
@@ -153,8 +182,7 @@ def sync_data():
         # append the received data to the transaction history
         transaction_history.append(data)
         # update the db file with the updated data
-        with open(f'log_{args.port}.json', 'w') as file:
-            json.dump(transaction_history, file)
+        write_log(transaction_history)
     # return 200 ok response as json 
     return jsonify({'status': 'ok'})
 
@@ -189,6 +217,14 @@ def get_backlog_data(transaction_id):
     # returning the sliced data
     return sliced_tr_history
 
+# function to write the transaction history to the db file of this node, through a temporary file that
+# replaces the db file so that a node killed during the write never leaves a truncated db file behind
+def write_log(history):
+    filename = f'log_{args.port}.json'
+    with open(filename+'.tmp', 'w') as file:
+        json.dump(history, file)
+    os.replace(filename+'.tmp', filename)
+
 # function to load the db file to in memory data structure
 def load_db(port):
 
@@ -198,8 +234,7 @@ def load_db(port):
 
     # if the db file does not exist, then creating it with the empty list
     if not os.path.exists(filename):
-        with open(filename, "w") as file:
-            json.dump([], file)
+        write_log([])
     else:
         # on server start reading the log.json file and loading its contents to in-memory transaction history data
         with open(filename, 'r') as file:
@@ -252,10 +287,59 @@ def sync_data_with_nodes(result):
                 # if the node is unresponse, just printing that the node is unavailable
                 print("data sync failed for order service running on ", node['port'])
 
+# queue of the invalidations for the ml service, sent by a single background thread so that a slow or
+# stopped ml service never holds a request worker, an invalidation is dropped when the queue is full
+ml_queue = queue.Queue(maxsize=100)
+
+# function to send the queued invalidations to the ml service, run on its own thread
+def send_invalidations():
+    ml_config = config['ml_service']
+    url = 'http://'+ml_config['host']+':'+str(ml_config['port'])+'/ml/recommendations/invalidate'
+    while True:
+        payload = ml_queue.get()
+        try:
+            requests.post(url, json=payload, timeout=1)
+        except requests.RequestException:
+            print("recommendation invalidation failed for user ", payload['user_id'])
+
+# function to ask the ml service to recompute the recommendations of a user after a trade
+def invalidate_recommendations(user_id):
+    # the notifications are only sent when the ml service is part of the stack
+    if not config.get('notify_ml_service'):
+        return
+    try:
+        ml_queue.put_nowait({'user_id': user_id})
+    except queue.Full:
+        print("recommendation invalidation dropped for user ", user_id)
+
+# function to find the current leader when the node starts, the leader state is held in memory
+# by the other replicas so they are asked first (the most recent epoch wins), then the leader state
+# file written by the frontend is used and at last the leader id from the config
+def find_running_leader():
+    best = None
+    for node in config['order']['nodes']:
+        if node['port'] == args.port:
+            continue
+        try:
+            url = 'http://'+node['host']+':'+str(node['port'])+'/leader'
+            state = requests.get(url, timeout=1).json()
+            if state['leader_id'] is not None and (best is None or state['epoch'] > best['epoch']):
+                best = state
+        except:
+            print("leader lookup failed for order service running on ", node['port'])
+    if best is not None:
+        return best['leader_id']
+
+    try:
+        with open('../../leader_state.json', 'r') as file:
+            return json.load(file)['leader_id']
+    except (OSError, ValueError, KeyError):
+        return config['order']['leader_id']
+
 # function to sync with the leader after it back online from a crash
 def sync_with_leader():
-    # getting the current leader id from the config
-    running_leader_id = config['order']['leader_id']
+    # getting the current leader id
+    running_leader_id = find_running_leader()
     # getting the order nodes info
     order_nodes = config['order']['nodes']
     global transaction_number
@@ -298,8 +382,7 @@ def sync_with_leader():
         # updating the db file with the new data, here we are not using locks because 
         # this process happens at the start of the program and no thread can handle 
         # this before that time
-        with open(f'log_{args.port}.json', 'w') as file:
-            json.dump(transaction_history, file)
+        write_log(transaction_history)
     except:
         pass
     return
@@ -307,6 +390,8 @@ def sync_with_leader():
 if __name__ == "__main__":
     # loading db to in memory data
     load_db(args.port)
+    if config.get('notify_ml_service'):
+        threading.Thread(target=send_invalidations, daemon=True).start()
     # syncing data wiht the leader if this node is crashed
     sync_with_leader()
     # running the server to listen for all ips (for AWS part) and running on the port passed from the args
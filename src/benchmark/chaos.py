@@ -0,0 +1,235 @@
+import argparse
+import itertools
+import json
+import random
+import threading
+import time
+import requests
+
+from harness import Stack
+
+# leader failover chaos benchmark: runs sustained trades against a local stack (see harness.py) while order
+# replicas are killed and restarted on a schedule, and reports how long trades stall after each kill,
+# the errors seen by the clients, how long a restarted replica takes to catch up with the leader and,
+# once the load stopped, whether the replicas diverged and whether acknowledged orders were lost or duplicated
+parser = argparse.ArgumentParser()
+parser.add_argument('--replicas', type=int, default=3, help='number of order replicas')
+parser.add_argument('--mode', choices=['threaded', 'async'], default='threaded', help='frontend mode')
+parser.add_argument('--workers', type=int, default=8, help='number of concurrent trading clients')
+parser.add_argument('--cycles', type=int, default=3, help='number of kill and restart cycles')
+parser.add_argument('--interval', type=float, default=5.0, help='seconds of load before each kill')
+parser.add_argument('--down-time', type=float, default=3.0, help='seconds a killed replica stays down')
+parser.add_argument('--target', choices=['leader', 'follower', 'random'], default='leader',
+                    help='which replica is killed in each cycle')
+parser.add_argument('--settle', type=float, default=3.0, help='seconds of load after the last restart')
+parser.add_argument('--recovery-timeout', type=float, default=30.0,
+                    help='seconds to wait for a restarted replica to catch up')
+parser.add_argument('--seed', type=int, default=1)
+parser.add_argument('--keep', action='store_true', help='keep the temporary tree with the service logs')
+parser.add_argument('--output', help='optional path to write the json report')
+
+# class running the trading clients, every trade gets a unique quantity so that it can be found in the
+# order histories of the replicas afterwards
+class TradeLoad:
+    def __init__(self, base_url, workers, seed):
+        self.base_url = base_url
+        self.workers = workers
+        self.rng = random.Random(seed)
+        self.quantities = itertools.count(1)
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.trades = []
+        self.threads = []
+
+    def worker(self):
+        session = requests.Session()
+        while not self.stopped.is_set():
+            with self.lock:
+                payload = {'name': self.rng.choice(['GameStart', 'FishCo', 'BoarCo', 'MenhirCo']),
+                           'type': self.rng.choice(['buy', 'sell']), 'quantity': next(self.quantities)}
+            start_time = time.time()
+            try:
+                response = session.post(self.base_url+'/orders', json=payload, timeout=10)
+                status_code = response.status_code
+                number = response.json()['data']['transaction_number'] if status_code == 200 else None
+            except (requests.RequestException, ValueError, KeyError):
+                status_code, number = None, None
+            with self.lock:
+                self.trades.append({'start': start_time, 'end': time.time(), 'status': status_code,
+                                    'number': number, 'payload': payload})
+        session.close()
+
+    def start(self):
+        self.threads = [threading.Thread(target=self.worker) for i in range(self.workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        for thread in self.threads:
+            thread.join()
+
+    def snapshot(self):
+        with self.lock:
+            return list(self.trades)
+
+# function to read the leader chosen by the frontend
+def current_leader(stack):
+    return requests.get(stack.base_url()+'/metrics', timeout=5).json()['leader']['leader_id']
+
+# function to read the full order history of a replica, None if it is down
+def replica_history(node):
+    try:
+        return requests.get('http://'+node['host']+':'+str(node['port'])+'/backlog/-1', timeout=5).json()
+    except (requests.RequestException, ValueError):
+        return None
+
+# function to pick the replica to kill in a cycle
+def pick_target(stack, target, rng):
+    leader_id = current_leader(stack)
+    nodes = stack.config['order']['nodes']
+    if target == 'leader':
+        return next(node for node in nodes if node['id'] == leader_id)
+    if target == 'follower':
+        return rng.choice([node for node in nodes if node['id'] != leader_id])
+    return rng.choice(nodes)
+
+# function to measure the stall after a kill: the time until the first trade sent after the kill succeeded
+# and the trades that failed meanwhile
+def stall_after(trades, kill_time, until):
+    window = [trade for trade in trades if kill_time <= trade['end'] < until]
+    recovered = [trade['end'] for trade in window if trade['status'] == 200 and trade['start'] >= kill_time]
+    first_success = min(recovered) if recovered else None
+    return {
+        'stall_ms': (first_success - kill_time) * 1000 if first_success else None,
+        'errors': sum(1 for trade in window if trade['status'] != 200
+                      and (first_success is None or trade['end'] <= first_success))
+    }
+
+# function to wait until a restarted replica has every transaction the leader had when it came back
+def wait_for_catch_up(node, leader_node, timeout):
+    leader_history = replica_history(leader_node) or []
+    target = leader_history[-1]['transaction_number'] if leader_history else -1
+    start_time = time.time()
+    while time.time() - start_time < timeout:
+        history = replica_history(node)
+        if history is not None and (target < 0 or any(item['transaction_number'] == target for item in history)):
+            return (time.time() - start_time) * 1000
+        time.sleep(0.05)
+    return None
+
+# function to compare the replicas with the leader and the acknowledged trades with the leader history
+def check_consistency(stack, trades):
+    nodes = stack.config['order']['nodes']
+    leader_id = current_leader(stack)
+    histories = {node['id']: replica_history(node) for node in nodes}
+    leader_history = histories[leader_id] or []
+    leader_numbers = [item['transaction_number'] for item in leader_history]
+
+    replicas = {}
+    for node_id, history in histories.items():
+        if history is None:
+            replicas[node_id] = {'reachable': False}
+            continue
+        numbers = [item['transaction_number'] for item in history]
+        replicas[node_id] = {
+            'reachable': True,
+            'transactions': len(history),
+            'missing': len(set(leader_numbers) - set(numbers)),
+            'extra': len(set(numbers) - set(leader_numbers)),
+            'duplicate_numbers': len(numbers) - len(set(numbers)),
+            # a transaction number holding another trade than on the leader
+            'conflicting': sum(1 for a, b in zip(leader_history, history) if a != b and
+                               a['transaction_number'] == b['transaction_number'])
+        }
+
+    # every trade has a unique quantity, so it can be followed in the leader history
+    by_quantity = {}
+    for item in leader_history:
+        by_quantity.setdefault(item['quantity'], []).append(item)
+    acknowledged = [trade for trade in trades if trade['status'] == 200]
+    lost = [trade for trade in acknowledged if trade['payload']['quantity'] not in by_quantity]
+    wrong_number = [trade for trade in acknowledged if trade['payload']['quantity'] in by_quantity and
+                    trade['number'] not in [item['transaction_number']
+                                            for item in by_quantity[trade['payload']['quantity']]]]
+    duplicated = sum(len(items) - 1 for items in by_quantity.values())
+    # trades the clients saw fail but that were executed anyway (the leader died before answering)
+    failed_but_executed = sum(1 for trade in trades if trade['status'] != 200
+                              and trade['payload']['quantity'] in by_quantity)
+    diverged = any(not state['reachable'] or state['missing'] or state['extra'] or state['conflicting']
+                   for state in replicas.values())
+    return {
+        'leader_id': leader_id,
+        'replicas': replicas,
+        'diverged': diverged,
+        'acknowledged_orders': len(acknowledged),
+        'lost_orders': len(lost),
+        'wrong_transaction_number': len(wrong_number),
+        'duplicated_orders': duplicated,
+        'failed_but_executed': failed_but_executed
+    }
+
+def run(args):
+    rng = random.Random(args.seed)
+    with Stack(args.replicas, args.mode, True, args.keep) as stack:
+        load = TradeLoad(stack.base_url(), args.workers, args.seed)
+        load.start()
+        cycles = []
+        try:
+            for cycle in range(args.cycles):
+                time.sleep(args.interval)
+                node = pick_target(stack, args.target, rng)
+                was_leader = node['id'] == current_leader(stack)
+                kill_time = time.time()
+                stack.kill('order-'+str(node['id']))
+                time.sleep(args.down_time)
+
+                restart_time = time.time()
+                restart_error = None
+                try:
+                    stack.restart('order-'+str(node['id']))
+                except RuntimeError as e:
+                    # the replica did not come back (see its log), the run goes on without it
+                    restart_error = str(e)
+                leader_id = current_leader(stack)
+                recovery_ms = None
+                if restart_error is None:
+                    leader_node = next(item for item in stack.config['order']['nodes'] if item['id'] == leader_id)
+                    recovery_ms = wait_for_catch_up(node, leader_node, args.recovery_timeout)
+                result = {'cycle': cycle, 'killed': node['id'], 'was_leader': was_leader,
+                          'new_leader': leader_id, 'restart_ms': (time.time() - restart_time) * 1000,
+                          'restart_failed': restart_error is not None, 'restart_error': restart_error,
+                          'recovery_ms': recovery_ms}
+                result.update(stall_after(load.snapshot(), kill_time, restart_time))
+                print(json.dumps(result))
+                cycles.append(result)
+            time.sleep(args.settle)
+        finally:
+            load.stop()
+
+        # giving the last replications time to arrive before comparing the replicas
+        time.sleep(1)
+        trades = load.snapshot()
+        consistency = check_consistency(stack, trades)
+
+    stalls = [cycle['stall_ms'] for cycle in cycles if cycle['stall_ms'] is not None]
+    recoveries = [cycle['recovery_ms'] for cycle in cycles if cycle['recovery_ms'] is not None]
+    return {
+        'config': vars(args),
+        'trades': len(trades),
+        'errors': sum(1 for trade in trades if trade['status'] != 200),
+        'max_stall_ms': max(stalls) if stalls else None,
+        'max_recovery_ms': max(recoveries) if recoveries else None,
+        'unrecovered_stalls': sum(1 for cycle in cycles if cycle['stall_ms'] is None),
+        'failed_restarts': sum(1 for cycle in cycles if cycle['restart_failed']),
+        'cycles': cycles,
+        'consistency': consistency
+    }
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    report = run(args)
+    print(json.dumps({key: value for key, value in report.items() if key != 'cycles'}, indent=4))
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=4)
@@ -0,0 +1,156 @@
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import aiohttp
+
+from stub_server import start_stub_server
+
+# benchmark comparing how many concurrent clients the threaded (flask) and the asyncio frontend
+# sustain in front of slow stub upstreams; the cache is disabled so every lookup is proxied
+parser = argparse.ArgumentParser()
+parser.add_argument('--clients', type=int, nargs='+', default=[10, 50, 100, 200, 400],
+                    help='concurrency levels to run')
+parser.add_argument('--duration', type=float, default=5.0, help='seconds per concurrency level')
+parser.add_argument('--delay', type=float, default=0.05, help='upstream service time in seconds')
+parser.add_argument('--max-p99', type=float, default=1000.0,
+                    help='p99 latency (ms) above which a level is not sustained')
+parser.add_argument('--max-error-rate', type=float, default=0.01,
+                    help='error rate above which a level is not sustained')
+parser.add_argument('--modes', nargs='+', default=['threaded', 'async'])
+parser.add_argument('--output', help='optional path to write the json report')
+
+FRONTEND_APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'frontend', 'app.py')
+
+# function to get a free ephemeral port
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+# function to read the number of OS threads of a process (linux only)
+def thread_count(pid):
+    try:
+        with open('/proc/'+str(pid)+'/status', 'r') as file:
+            for line in file:
+                if line.startswith('Threads:'):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+
+# function to start the frontend in the given mode against the stub upstreams
+def start_frontend(mode, catalog, orders, work_dir):
+    port = free_port()
+    config = {
+        'catalog': {'host': catalog.server_address[0], 'port': catalog.server_address[1]},
+        'order': {
+            'leader_id': len(orders),
+            'nodes': [{'host': server.server_address[0], 'port': server.server_address[1], 'id': i + 1}
+                      for i, server in enumerate(orders)]
+        },
+        'frontend': {'host': '127.0.0.1', 'port': port},
+        'upstream': {'connect_timeout': 1.0, 'read_timeout': 5.0},
+        # admission limits are lifted so that the raw capacity of each mode is measured
+        'admission': {'limits': {'lookup': 100000, 'trade': 100000, 'order_read': 100000}, 'total_limit': 100000},
+        'cache': False
+    }
+    with open(os.path.join(work_dir, 'config.json'), 'w') as file:
+        json.dump(config, file)
+    frontend_dir = os.path.join(work_dir, 'frontend')
+    os.makedirs(frontend_dir, exist_ok=True)
+
+    process = subprocess.Popen([sys.executable, FRONTEND_APP, '--port', str(port), '--mode', mode],
+                               cwd=frontend_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    # waiting until the frontend accepts connections
+    deadline = time.time() + 15
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return process, port
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError('frontend did not start in '+mode+' mode')
+
+# function to run a closed loop of lookups with the given number of concurrent clients
+async def run_level(port, clients, duration, pid):
+    url = 'http://127.0.0.1:'+str(port)+'/catalog/GameStart'
+    latencies = []
+    errors = 0
+    peak_threads = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker(session):
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            start_time = time.perf_counter()
+            try:
+                async with session.get(url) as response:
+                    await response.read()
+                    if response.status != 200:
+                        errors += 1
+                        continue
+                latencies.append(time.perf_counter() - start_time)
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                errors += 1
+
+    async def sample_threads():
+        nonlocal peak_threads
+        while time.perf_counter() < deadline:
+            peak_threads = max(peak_threads, thread_count(pid) or 0)
+            await asyncio.sleep(0.2)
+
+    connector = aiohttp.TCPConnector(limit=0)
+    timeout = aiohttp.ClientTimeout(total=10)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        start_time = time.perf_counter()
+        await asyncio.gather(sample_threads(), *[worker(session) for i in range(clients)])
+        elapsed = time.perf_counter() - start_time
+
+    latencies.sort()
+    count = len(latencies)
+    total = count + errors
+    return {
+        'clients': clients,
+        'requests': count,
+        'errors': errors,
+        'error_rate': errors / total if total else 0.0,
+        'throughput_rps': count / elapsed,
+        'p50_ms': latencies[int(0.50 * count)] * 1000 if count else None,
+        'p99_ms': latencies[min(count - 1, int(0.99 * count))] * 1000 if count else None,
+        'peak_threads': peak_threads
+    }
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    catalog = start_stub_server(delay=args.delay)
+    orders = [start_stub_server(delay=args.delay, body={'transaction_number': 0}) for i in range(3)]
+
+    report = {'config': vars(args), 'modes': {}}
+    for mode in args.modes:
+        with tempfile.TemporaryDirectory() as work_dir:
+            process, port = start_frontend(mode, catalog, orders, work_dir)
+            try:
+                levels = []
+                sustained = 0
+                for clients in args.clients:
+                    level = asyncio.run(run_level(port, clients, args.duration, process.pid))
+                    levels.append(level)
+                    print(mode, json.dumps(level))
+                    if level['error_rate'] <= args.max_error_rate and level['p99_ms'] is not None \
+                            and level['p99_ms'] <= args.max_p99:
+                        sustained = clients
+                report['modes'][mode] = {'levels': levels, 'max_sustained_clients': sustained}
+            finally:
+                process.kill()
+                process.wait()
+
+    print(json.dumps({mode: result['max_sustained_clients'] for mode, result in report['modes'].items()}))
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=4)
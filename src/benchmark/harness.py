@@ -0,0 +1,293 @@
+import argparse
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import requests
+
+# end to end benchmark harness: boots the catalog, N order replicas and the frontend on ephemeral ports
+# in a temporary tree with its own config and seeded db, runs named workloads with the load generator
+# (client/client.py) and stores one json result per scenario so that two runs can be compared
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# stocks seeded in the catalog db, the same list the client picks from
+STOCKS = ["GameStart", "FishCo", "MenhirCo", "BoarCo", "Google", "Netflix", "Amazon", "Apple", "Tesla", "Meta"]
+
+# named workloads, the keys are passed to the client as command line options
+SCENARIOS = {
+    'smoke': {'workers': 4, 'loop': 'closed', 'duration': 5, 'mix': 'lookup=0.7,trade=0.2,order_read=0.1'},
+    'lookup_heavy': {'workers': 32, 'loop': 'closed', 'duration': 20, 'mix': 'lookup=0.95,trade=0.05',
+                     'skew': 1.1},
+    'trade_heavy': {'workers': 16, 'loop': 'closed', 'duration': 20, 'mix': 'lookup=0.3,trade=0.6,order_read=0.1'},
+    'open_loop': {'workers': 64, 'loop': 'open', 'rate': 200, 'duration': 20,
+                  'mix': 'lookup=0.8,trade=0.15,order_read=0.05', 'skew': 1.1}
+}
+
+# default regression thresholds of the compare command (relative changes)
+DEFAULT_MAX_LATENCY_REGRESSION = 0.10
+DEFAULT_MAX_THROUGHPUT_REGRESSION = 0.10
+DEFAULT_MAX_ERROR_RATE_INCREASE = 0.01
+
+# function to get a free ephemeral port
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+# function to wait until a process accepts connections on the given port
+def wait_for_port(port, process, name, timeout=15):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(name+' exited with code '+str(process.returncode))
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(name+' did not start on port '+str(port))
+
+# function to read the commit of the working tree, used as the default label of a run
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=SRC_DIR,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+# class to run the whole stack in a temporary tree laid out like src/ (config.json, backend/catalog,
+# backend/order, frontend, client) so that every service finds its files relative to its working directory
+class Stack:
+    def __init__(self, replicas=3, mode='threaded', cache=True, keep=False, frontend_args=()):
+        self.replicas = replicas
+        self.frontend_args = list(frontend_args)
+        self.mode = mode
+        self.cache = cache
+        self.keep = keep
+        self.work_dir = None
+        self.processes = []
+        self.commands = {}
+        self.config = None
+
+    def _start(self, name, script, cwd, port, extra_args=()):
+        self.commands[name] = (script, cwd, port, extra_args)
+        log = open(os.path.join(self.work_dir, name+'.log'), 'a')
+        process = subprocess.Popen([sys.executable, os.path.join(SRC_DIR, script), '--port', str(port)]
+                                   + list(extra_args), cwd=cwd, stdout=log, stderr=subprocess.STDOUT)
+        self.processes.append((name, process, log))
+        wait_for_port(port, process, name)
+        return process
+
+    # function to crash a service (SIGKILL, so it cannot clean up)
+    def kill(self, name):
+        for entry in list(self.processes):
+            if entry[0] == name:
+                entry[1].kill()
+                entry[1].wait()
+                entry[2].close()
+                self.processes.remove(entry)
+
+    # function to start a killed service again with the same port and working directory
+    def restart(self, name):
+        self.kill(name)
+        return self._start(name, *self.commands[name])
+
+    def start(self):
+        self.work_dir = tempfile.mkdtemp(prefix='stack-')
+        for path in ['backend/catalog', 'backend/order', 'frontend', 'client']:
+            os.makedirs(os.path.join(self.work_dir, path))
+
+        # seeding the catalog with enough quantity that buys do not run out during a run
+        db = [{'name': name, 'price': 10 * (i + 1), 'quantity': 1000000000, 'trading_volume': 0}
+              for i, name in enumerate(STOCKS)]
+        with open(os.path.join(self.work_dir, 'backend', 'catalog', 'db.json'), 'w') as file:
+            json.dump(db, file)
+
+        nodes = [{'host': '127.0.0.1', 'port': free_port(), 'id': i + 1} for i in range(self.replicas)]
+        self.config = {
+            'catalog': {'host': '127.0.0.1', 'port': free_port()},
+            'order': {'leader_id': self.replicas, 'nodes': nodes},
+            'frontend': {'host': '127.0.0.1', 'port': free_port()},
+            'cache': self.cache
+        }
+        # keeping the tuning sections of the repository config (upstream, admission)
+        with open(os.path.join(SRC_DIR, 'config.json'), 'r') as file:
+            repo_config = json.load(file)
+        for section in ['upstream', 'admission']:
+            if section in repo_config:
+                self.config[section] = repo_config[section]
+        with open(os.path.join(self.work_dir, 'config.json'), 'w') as file:
+            json.dump(self.config, file, indent=4)
+
+        try:
+            self._start('catalog', 'backend/catalog/app.py', os.path.join(self.work_dir, 'backend', 'catalog'),
+                        self.config['catalog']['port'])
+            for node in nodes:
+                self._start('order-'+str(node['id']), 'backend/order/app.py',
+                            os.path.join(self.work_dir, 'backend', 'order'), node['port'])
+            self._start('frontend', 'frontend/app.py', os.path.join(self.work_dir, 'frontend'),
+                        self.config['frontend']['port'], ['--mode', self.mode] + self.frontend_args)
+        except Exception:
+            self.stop()
+            raise
+        return self
+
+    # function to stop all the services and remove the temporary tree
+    def stop(self):
+        for name, process, log in reversed(self.processes):
+            process.terminate()
+        for name, process, log in self.processes:
+            try:
+                process.wait(5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+            log.close()
+        self.processes = []
+        if self.work_dir and not self.keep:
+            shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def base_url(self):
+        return 'http://127.0.0.1:'+str(self.config['frontend']['port'])
+
+# function to build the client command line options of a scenario
+def client_args(scenario, seed):
+    options = []
+    for key, value in sorted(scenario.items()):
+        options += ['--'+key.replace('_', '-'), str(value)]
+    return options + ['--seed', str(seed)]
+
+# function to run a scenario on a fresh stack and return its result
+def run_scenario(name, scenario, replicas, mode, cache, seed, keep=False):
+    with Stack(replicas, mode, cache, keep) as stack:
+        report_path = os.path.join(stack.work_dir, 'client', 'report.json')
+        subprocess.run([sys.executable, os.path.join(SRC_DIR, 'client', 'client.py'), '--output', report_path]
+                       + client_args(scenario, seed), cwd=os.path.join(stack.work_dir, 'client'),
+                       stdout=subprocess.DEVNULL, check=True)
+        with open(report_path, 'r') as file:
+            report = json.load(file)
+        try:
+            metrics = requests.get(stack.base_url()+'/metrics', timeout=5).json()
+        except (requests.RequestException, ValueError):
+            metrics = None
+    return {
+        'scenario': name,
+        'workload': scenario,
+        'stack': {'replicas': replicas, 'mode': mode, 'cache': cache},
+        'client': report,
+        'frontend_metrics': metrics
+    }
+
+# function to read the values compared between two runs of a scenario
+def summarize(result):
+    report = result['client']
+    summary = {'throughput_rps': report['throughput_rps']}
+    requests_count = 0
+    errors = 0
+    for operation, stats in report['operations'].items():
+        requests_count += stats['count'] + stats['errors']
+        errors += stats['errors']
+        if stats['count']:
+            summary[operation+'_p50_ms'] = stats['p50_ms']
+            summary[operation+'_p99_ms'] = stats['p99_ms']
+    summary['error_rate'] = errors / requests_count if requests_count else 0.0
+    return summary
+
+# function to compare the results of two runs, returns the rows of the comparison and the regressions
+def compare(base, new, max_latency_regression=DEFAULT_MAX_LATENCY_REGRESSION,
+            max_throughput_regression=DEFAULT_MAX_THROUGHPUT_REGRESSION,
+            max_error_rate_increase=DEFAULT_MAX_ERROR_RATE_INCREASE):
+    rows = []
+    regressions = []
+    for name in sorted(set(base) & set(new)):
+        base_summary = summarize(base[name])
+        new_summary = summarize(new[name])
+        for metric in sorted(set(base_summary) & set(new_summary)):
+            before = base_summary[metric]
+            after = new_summary[metric]
+            change = (after - before) / before if before else 0.0
+            if metric == 'throughput_rps':
+                regressed = change < -max_throughput_regression
+            elif metric == 'error_rate':
+                regressed = after - before > max_error_rate_increase
+            else:
+                regressed = change > max_latency_regression
+            row = {'scenario': name, 'metric': metric, 'base': before, 'new': after, 'change': change,
+                   'regressed': regressed}
+            rows.append(row)
+            if regressed:
+                regressions.append(row)
+    return rows, regressions
+
+# function to read all the scenario results of a run directory
+def load_results(run_dir):
+    results = {}
+    for filename in sorted(os.listdir(run_dir)):
+        if filename.endswith('.json') and filename != 'run.json':
+            with open(os.path.join(run_dir, filename), 'r') as file:
+                result = json.load(file)
+            results[result['scenario']] = result
+    return results
+
+def run_command(args):
+    label = args.label or git_commit()
+    run_dir = os.path.join(args.results_dir, label)
+    os.makedirs(run_dir, exist_ok=True)
+    with open(os.path.join(run_dir, 'run.json'), 'w') as file:
+        json.dump({'label': label, 'commit': git_commit(), 'started_at': time.time(),
+                   'scenarios': args.scenarios, 'replicas': args.replicas, 'mode': args.mode}, file, indent=4)
+
+    for name in args.scenarios:
+        result = run_scenario(name, SCENARIOS[name], args.replicas, args.mode, not args.no_cache, args.seed,
+                              args.keep)
+        with open(os.path.join(run_dir, name+'.json'), 'w') as file:
+            json.dump(result, file, indent=4)
+        print(name, json.dumps(summarize(result)))
+    print('results written to', run_dir)
+
+def compare_command(args):
+    rows, regressions = compare(load_results(args.base), load_results(args.new), args.max_latency_regression,
+                                args.max_throughput_regression, args.max_error_rate_increase)
+    for row in rows:
+        print('%-14s %-22s %12.3f %12.3f %+8.1f%% %s' % (row['scenario'], row['metric'], row['base'], row['new'],
+                                                        row['change'] * 100, 'REGRESSION' if row['regressed'] else ''))
+    if regressions:
+        print(len(regressions), 'regression(s) found')
+        sys.exit(1)
+    print('no regressions')
+
+parser = argparse.ArgumentParser()
+commands = parser.add_subparsers(dest='command', required=True)
+
+run_parser = commands.add_parser('run', help='run scenarios on a fresh local stack')
+run_parser.add_argument('--scenarios', nargs='+', choices=sorted(SCENARIOS), default=['smoke'])
+run_parser.add_argument('--replicas', type=int, default=3, help='number of order replicas')
+run_parser.add_argument('--mode', choices=['threaded', 'async'], default='threaded', help='frontend mode')
+run_parser.add_argument('--no-cache', action='store_true', help='disable the frontend cache')
+run_parser.add_argument('--seed', type=int, default=1, help='seed of the client workload')
+run_parser.add_argument('--results-dir', default='results', help='directory the runs are stored in')
+run_parser.add_argument('--label', help='name of the run, defaults to the current commit')
+run_parser.add_argument('--keep', action='store_true', help='keep the temporary tree with the service logs')
+run_parser.set_defaults(func=run_command)
+
+compare_parser = commands.add_parser('compare', help='compare two runs and fail on regressions')
+compare_parser.add_argument('base', help='run directory of the baseline')
+compare_parser.add_argument('new', help='run directory to check')
+compare_parser.add_argument('--max-latency-regression', type=float, default=DEFAULT_MAX_LATENCY_REGRESSION)
+compare_parser.add_argument('--max-throughput-regression', type=float, default=DEFAULT_MAX_THROUGHPUT_REGRESSION)
+compare_parser.add_argument('--max-error-rate-increase', type=float, default=DEFAULT_MAX_ERROR_RATE_INCREASE)
+compare_parser.set_defaults(func=compare_command)
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    args.func(args)
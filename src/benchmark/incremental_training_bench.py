@@ -0,0 +1,87 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import numpy as np
+
+from harness import SRC_DIR
+
+# wall clock time and accuracy of keeping the price predictor fresh: a synthetic series whose level and period
+# drift is revealed --new-points at a time, and after every round the model is either retrained from scratch on
+# the whole history (train, --full-epochs) or fine-tuned from its current weights on the new points only
+# (update, --update-epochs). Both are scored by the RMSE of their one step predictions over the next
+# --new-points points, next to the stale model trained once on the initial history
+sys.path.insert(0, os.path.join(SRC_DIR, 'ml-service'))
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--initial-points', type=int, default=500, help='history of the first training')
+parser.add_argument('--new-points', type=int, default=50, help='points added per round, also the test horizon')
+parser.add_argument('--rounds', type=int, default=3)
+parser.add_argument('--full-epochs', type=int, default=50)
+parser.add_argument('--update-epochs', type=int, default=5)
+parser.add_argument('--learning-rate', type=float, default=1e-4, help='learning rate of the updates')
+parser.add_argument('--output', help='optional path to write the json report')
+
+def make_series(points):
+    steps = np.arange(points)
+    rng = np.random.default_rng(1)
+    return 100 + 0.01 * steps + 5 * np.sin(steps / (5.0 + steps / 500)) + rng.normal(0, 0.5, points)
+
+# root mean squared error of the one step predictions of the points [start, end) from the true history
+def rmse(predictor, series, start, end):
+    windows = [series[i - predictor.sequence_length:i] for i in range(start, end)]
+    predictions = predictor.predict_batch(windows)
+    return float(np.sqrt(np.mean((predictions - series[start:end]) ** 2)))
+
+def timed(func):
+    start_time = time.perf_counter()
+    func()
+    return time.perf_counter() - start_time
+
+def run(args):
+    from models.price_predictor import StockPricePredictor
+    series = make_series(args.initial_points + (args.rounds + 1) * args.new_points)
+
+    initial = series[:args.initial_points]
+    stale = StockPricePredictor()
+    initial_seconds = timed(lambda: stale.train(initial, epochs=args.full_epochs))
+    incremental = StockPricePredictor()
+    incremental.train(initial, epochs=args.full_epochs)
+    print(json.dumps({'round': 0, 'initial_training_s': round(initial_seconds, 3)}))
+
+    results = []
+    for round_number in range(1, args.rounds + 1):
+        end = args.initial_points + round_number * args.new_points
+        history = series[:end]
+        full = StockPricePredictor()
+        full_seconds = timed(lambda: full.train(history, epochs=args.full_epochs))
+        update_seconds = timed(lambda: incremental.update(history, epochs=args.update_epochs,
+                                                          learning_rate=args.learning_rate))
+        test_end = end + args.new_points
+        result = {
+            'round': round_number,
+            'history': end,
+            'full_retrain_s': round(full_seconds, 3),
+            'update_s': round(update_seconds, 3),
+            'speedup': round(full_seconds / update_seconds, 1),
+            'full_retrain_rmse': round(rmse(full, series, end, test_end), 4),
+            'update_rmse': round(rmse(incremental, series, end, test_end), 4),
+            'stale_rmse': round(rmse(stale, series, end, test_end), 4)
+        }
+        print(json.dumps(result))
+        results.append(result)
+    return {'initial_training_s': round(initial_seconds, 3), 'rounds': results}
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    report = {
+        'machine': {'python': platform.python_version(), 'system': platform.system(),
+                    'machine': platform.machine(), 'cpus': os.cpu_count()},
+        'settings': vars(args),
+        'benchmarks': run(args)
+    }
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=4)
@@ -0,0 +1,73 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import time
+import numpy as np
+
+from numpy_lstm_bench import train_predictor
+
+# latency of the Monte Carlo dropout confidence of the price predictor: for every number of samples K and
+# batch of symbols, times the plain prediction, the K stochastic passes run as one batch of K x symbols
+# (predict_with_uncertainty) and the same K passes run one after the other, with Keras and with the NumPy engine
+parser = argparse.ArgumentParser()
+parser.add_argument('--samples', type=int, nargs='+', default=[1, 10, 50])
+parser.add_argument('--symbols', type=int, nargs='+', default=[1, 32])
+parser.add_argument('--engines', nargs='+', choices=['keras', 'numpy'], default=['keras', 'numpy'])
+parser.add_argument('--repeats', type=int, default=20, help='timed calls per measurement, the median is kept')
+parser.add_argument('--epochs', type=int, default=2, help='training epochs of the benchmarked model')
+parser.add_argument('--output', help='optional path to write the json report')
+
+# function to time a call, the first call is not timed
+def median_ms(func, repeats):
+    func()
+    timings = []
+    for i in range(repeats):
+        start_time = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start_time)
+    return round(statistics.median(timings) * 1000, 4)
+
+def run(args):
+    from models.numpy_lstm import NumpyLSTMPredictor, export_weights
+    keras_predictor = train_predictor(200, args.epochs)
+    engines = {'keras': keras_predictor, 'numpy': NumpyLSTMPredictor(export_weights(keras_predictor))}
+
+    rng = np.random.default_rng(3)
+    results = []
+    for engine in args.engines:
+        predictor = engines[engine]
+        for symbols in args.symbols:
+            windows = [100 + 5 * np.sin(np.arange(predictor.sequence_length) / 5.0 + rng.uniform(0, 6))
+                       for i in range(symbols)]
+            single = median_ms(lambda: predictor.predict_batch(windows), args.repeats)
+            for samples in args.samples:
+                batched = median_ms(lambda: predictor.predict_with_uncertainty(windows, samples), args.repeats)
+                sequential = median_ms(lambda: [predictor.predict_with_uncertainty(windows, 1) for i in range(samples)],
+                                       args.repeats)
+                result = {
+                    'engine': engine,
+                    'symbols': symbols,
+                    'samples': samples,
+                    'single_prediction_ms': single,
+                    'batched_ms': batched,
+                    'sequential_ms': sequential,
+                    'batched_vs_single': round(batched / single, 2),
+                    'sequential_vs_batched': round(sequential / batched, 2)
+                }
+                print(json.dumps(result))
+                results.append(result)
+    return results
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    report = {
+        'machine': {'python': platform.python_version(), 'system': platform.system(),
+                    'machine': platform.machine(), 'cpus': os.cpu_count()},
+        'settings': {'repeats': args.repeats, 'epochs': args.epochs},
+        'benchmarks': run(args)
+    }
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=4)
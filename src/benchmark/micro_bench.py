@@ -0,0 +1,206 @@
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+# microbenchmarks of the catalog and order hot paths, run in process: the catalog service and the
+# order app are imported from a temporary tree (they read db.json and ../../config.json at import)
+# and the HTTP calls of the order app (catalog update and replication) are replaced by stubs
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+CATALOG_SIZES = [10, 1000, 10000]
+HISTORY_SIZES = [100, 1000, 10000]
+THREAD_COUNTS = [1, 4, 16]
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--catalog-sizes', type=int, nargs='+', default=CATALOG_SIZES)
+parser.add_argument('--history-sizes', type=int, nargs='+', default=HISTORY_SIZES)
+parser.add_argument('--threads', type=int, nargs='+', default=THREAD_COUNTS)
+parser.add_argument('--target-time', type=float, default=0.2, help='seconds each measured round should take')
+parser.add_argument('--min-calls', type=int, default=20, help='minimum number of calls of a measured round')
+parser.add_argument('--rounds', type=int, default=5, help='measured rounds per benchmark, the median round is kept')
+parser.add_argument('--filter', help='only run the benchmarks whose name contains this text')
+parser.add_argument('--output', help='optional path to write the json report')
+
+# response returned by the stubbed catalog update of the order app
+class StubResponse:
+    def __init__(self, payload):
+        self.status_code = 200
+        self.payload = payload
+
+    def json(self):
+        return {'name': self.payload['name'], 'price': 100, 'quantity': 1000, 'trading_volume': 0}
+
+# function to import a module from a file with the given working directory and arguments
+def import_module(name, path, cwd, argv):
+    old_cwd, old_argv = os.getcwd(), sys.argv
+    os.chdir(cwd)
+    sys.argv = argv
+    try:
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+    finally:
+        os.chdir(old_cwd)
+        sys.argv = old_argv
+
+# function to build the temporary tree and import the catalog service and the order app
+def load_modules(work_dir):
+    catalog_dir = os.path.join(work_dir, 'backend', 'catalog')
+    order_dir = os.path.join(work_dir, 'backend', 'order')
+    os.makedirs(catalog_dir)
+    os.makedirs(order_dir)
+    with open(os.path.join(catalog_dir, 'db.json'), 'w') as file:
+        json.dump([], file)
+    config = {
+        'catalog': {'host': '127.0.0.1', 'port': 1},
+        'order': {'leader_id': 1, 'nodes': [{'host': '127.0.0.1', 'port': 2, 'id': 1}]},
+        'frontend': {'host': '127.0.0.1', 'port': 3},
+        'cache': False
+    }
+    with open(os.path.join(work_dir, 'config.json'), 'w') as file:
+        json.dump(config, file)
+
+    service = import_module('catalog_service', os.path.join(SRC_DIR, 'backend', 'catalog', 'service.py'),
+                            catalog_dir, ['service.py'])
+    order = import_module('order_app', os.path.join(SRC_DIR, 'backend', 'order', 'app.py'),
+                          order_dir, ['app.py', '--port', '2'])
+    # stubbing the HTTP calls of the order app
+    order.update_catalog = StubResponse
+    order.sync_data_with_nodes = lambda result: None
+    # the order app writes its log file in its working directory
+    os.chdir(order_dir)
+    return service, order
+
+# function to run the given function with the given arguments from each thread and time every call
+def run_round(func, args, threads):
+    latencies = [[] for i in range(threads)]
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(index):
+        timings = latencies[index]
+        calls = args[index::threads]
+        barrier.wait()
+        for arg in calls:
+            start_time = time.perf_counter_ns()
+            func(arg)
+            timings.append(time.perf_counter_ns() - start_time)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    start_time = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start_time
+    return elapsed, [latency for timings in latencies for latency in timings]
+
+# function to benchmark a function, the number of calls of a round is calibrated to the target time
+# make_args(count) returns the arguments of count calls, reset() restores the state before every round
+def benchmark(name, params, func, make_args, threads, target_time, min_calls, rounds, reset=lambda: None):
+    # calibrating with a short run
+    reset()
+    calls = 10
+    while True:
+        elapsed, timings = run_round(func, make_args(calls), 1)
+        if elapsed >= target_time / 10 or calls >= 1000000:
+            break
+        calls *= 10
+    calls = max(threads, min_calls, int(calls * target_time / max(elapsed, 1e-9)))
+
+    results = []
+    for i in range(rounds):
+        reset()
+        elapsed, timings = run_round(func, make_args(calls), threads)
+        results.append((calls / elapsed, timings))
+    # keeping the median round so that one noisy round does not move the result
+    results.sort(key=lambda result: result[0])
+    ops_per_s, timings = results[len(results) // 2]
+    timings.sort()
+    micros = [timing / 1000.0 for timing in timings]
+    return {
+        'name': name,
+        'params': params,
+        'threads': threads,
+        'calls': calls,
+        'rounds': rounds,
+        'ops_per_s': round(ops_per_s, 1),
+        'mean_us': round(statistics.mean(micros), 3),
+        'min_us': round(micros[0], 3),
+        'p50_us': round(micros[len(micros) // 2], 3),
+        'p99_us': round(micros[min(len(micros) - 1, int(0.99 * len(micros)))], 3),
+        'stddev_us': round(statistics.pstdev(micros), 3)
+    }
+
+# function to fill the catalog with the given number of stocks
+def seed_catalog(service, size):
+    service.catalog[:] = [{'name': 'Stock'+str(i), 'price': 100, 'quantity': 1000000000, 'trading_volume': 0}
+                          for i in range(size)]
+
+# function to fill the order history with the given number of transactions
+def seed_history(order, size):
+    order.transaction_history = [{'name': 'Stock'+str(i % 10), 'quantity': 1, 'type': 'buy', 'trading_volume': 0,
+                                  'transaction_number': i} for i in range(size)]
+    order.transaction_number = size - 1
+
+def run_benchmarks(args):
+    rng = random.Random(1)
+    results = []
+
+    def selected(name):
+        return args.filter is None or args.filter in name
+
+    def add(name, params, func, make_args, reset=lambda: None):
+        if not selected(name):
+            return
+        for threads in args.threads:
+            result = benchmark(name, params, func, make_args, threads, args.target_time, args.min_calls, args.rounds,
+                               reset)
+            print(json.dumps(result))
+            results.append(result)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        old_cwd = os.getcwd()
+        service, order = load_modules(work_dir)
+        try:
+            for size in args.catalog_sizes:
+                seed_catalog(service, size)
+                names = ['Stock'+str(i) for i in range(size)]
+                add('catalog.lookup[catalog=%d]' % size, {'catalog_size': size}, service.lookup,
+                    lambda count: [rng.choice(names) for i in range(count)])
+                add('catalog.is_trade_valid[catalog=%d]' % size, {'catalog_size': size}, service.is_trade_valid,
+                    lambda count: [{'name': rng.choice(names), 'type': rng.choice(['buy', 'sell']), 'quantity': 1}
+                                   for i in range(count)])
+
+            for size in args.history_sizes:
+                add('order.order_info[history=%d]' % size, {'history_size': size}, order.order_info,
+                    lambda count: [str(rng.randrange(size)) for i in range(count)],
+                    lambda: seed_history(order, size))
+                add('order.handle_request[history=%d]' % size, {'history_size': size}, order.handle_request,
+                    lambda count: [{'name': 'Stock'+str(i % 10), 'type': 'buy', 'quantity': 1} for i in range(count)],
+                    lambda: seed_history(order, size))
+        finally:
+            os.chdir(old_cwd)
+    return results
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    benchmarks = run_benchmarks(args)
+    report = {
+        'machine': {'python': platform.python_version(), 'implementation': platform.python_implementation(),
+                    'system': platform.system(), 'machine': platform.machine(), 'cpus': os.cpu_count()},
+        'settings': {'target_time': args.target_time, 'min_calls': args.min_calls, 'rounds': args.rounds},
+        'benchmarks': sorted(benchmarks, key=lambda result: (result['name'], result['threads']))
+    }
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=4, sort_keys=True)
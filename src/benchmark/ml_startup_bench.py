@@ -0,0 +1,160 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import requests
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from harness import SRC_DIR, free_port, wait_for_port
+
+# cold start benchmark of the ML service: measures the import time of the heavy frameworks and of the
+# service module, and for every endpoint the time a fresh process takes until its port is open and until
+# it answered its first request, with lazy loading (the default) and with --warm-up. The catalog and
+# order services are replaced by a stub server so that only the ML service is measured
+ML_DIR = os.path.join(SRC_DIR, 'ml-service')
+
+MODULES = ['numpy', 'pandas', 'sklearn', 'tensorflow', 'app']
+
+# first request sent to each endpoint
+ENDPOINTS = {
+    'predictions': ('GET', '/ml/predictions/GameStart', None),
+    'batch_predictions': ('POST', '/ml/predictions', {'symbols': ['GameStart', 'FishCo']}),
+    'recommendations': ('GET', '/ml/recommendations?user_id=1', None),
+    'anomalies': ('POST', '/ml/anomalies', {'volume': [100, 120, 5000], 'price_change': [0.1, -0.2, 3.0],
+                                            'trade_frequency': [5, 6, 90], 'order_size': [10, 12, 800]}),
+    'metrics': ('GET', '/ml/metrics', None)
+}
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--endpoints', nargs='+', choices=list(ENDPOINTS), default=list(ENDPOINTS))
+parser.add_argument('--modes', nargs='+', choices=['lazy', 'warm_up'], default=['lazy', 'warm_up'])
+parser.add_argument('--runs', type=int, default=3, help='fresh processes per endpoint and mode, the median is kept')
+parser.add_argument('--timeout', type=float, default=120.0, help='seconds to wait for a start or a response')
+parser.add_argument('--output', help='optional path to write the json report')
+
+# prices served by the stub catalog, longer than the sequence length of the price predictor
+PRICES = [100 + (i % 7) for i in range(80)]
+
+# stub of the catalog and order services answering the calls of the ML service
+class StubHandler(BaseHTTPRequestHandler):
+    def reply(self, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.startswith('/orders/user/'):
+            self.reply([])
+        elif self.path == '/catalog/all':
+            self.reply([])
+        else:
+            self.reply({'data': {'name': self.path.split('/')[-1], 'prices': PRICES}})
+
+    def do_POST(self):
+        names = json.loads(self.rfile.read(int(self.headers['Content-Length'])))['names']
+        self.reply({'data': {name: {'name': name, 'prices': PRICES} for name in names}, 'not_found': []})
+
+    def log_message(self, format, *args):
+        pass
+
+# function to build the temporary tree of the ML service, it reads ../config.json from its working directory
+def build_tree(work_dir, stub_port, ml_service=None):
+    with open(os.path.join(SRC_DIR, 'config.json'), 'r') as file:
+        config = json.load(file)
+    config['ml_service'].update(ml_service or {})
+    config['catalog'] = {'host': '127.0.0.1', 'port': stub_port}
+    config['order']['nodes'] = [{'host': '127.0.0.1', 'port': stub_port, 'id': 1}]
+    with open(os.path.join(work_dir, 'config.json'), 'w') as file:
+        json.dump(config, file)
+    cwd = os.path.join(work_dir, 'ml-service')
+    os.makedirs(cwd)
+    return cwd
+
+# function to measure the import time of a module in a fresh interpreter
+def import_time(module, cwd):
+    code = ('import sys, time\n'
+            'sys.path.insert(0, %r)\n'
+            'sys.argv = ["app.py"]\n'
+            'start_time = time.perf_counter()\n'
+            'import %s\n'
+            'print(time.perf_counter() - start_time)\n') % (ML_DIR, module)
+    output = subprocess.check_output([sys.executable, '-c', code], cwd=cwd, stderr=subprocess.DEVNULL)
+    return float(output.decode().strip().splitlines()[-1])
+
+# function to start a fresh ML service and time its port opening and its first answer on the endpoint
+def cold_start(endpoint, warm_up, cwd, timeout):
+    method, path, payload = ENDPOINTS[endpoint]
+    port = free_port()
+    command = [sys.executable, os.path.join(ML_DIR, 'app.py'), '--port', str(port)]
+    if warm_up:
+        command.append('--warm-up')
+    start_time = time.perf_counter()
+    process = subprocess.Popen(command, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(port, process, 'ml-service', timeout)
+        ready = time.perf_counter() - start_time
+        response = requests.request(method, 'http://127.0.0.1:'+str(port)+path, json=payload, timeout=timeout)
+        first_response = time.perf_counter() - start_time
+        # the second request shows what is left once the lazy loading happened
+        second_start = time.perf_counter()
+        requests.request(method, 'http://127.0.0.1:'+str(port)+path, json=payload, timeout=timeout)
+        second_response = time.perf_counter() - second_start
+        return {'ready_s': ready, 'first_response_s': first_response, 'second_response_s': second_response,
+                'status_code': response.status_code}
+    finally:
+        process.terminate()
+        process.wait()
+
+def median_of(runs, key):
+    return round(statistics.median(run[key] for run in runs), 4)
+
+def run(args):
+    server = ThreadingHTTPServer(('127.0.0.1', free_port()), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        with tempfile.TemporaryDirectory() as work_dir:
+            cwd = build_tree(work_dir, server.server_address[1])
+            imports = {}
+            for module in MODULES:
+                try:
+                    imports[module] = round(import_time(module, cwd), 4)
+                except subprocess.CalledProcessError:
+                    imports[module] = None
+                print(json.dumps({'import': module, 'seconds': imports[module]}))
+
+            results = []
+            for mode in args.modes:
+                for endpoint in args.endpoints:
+                    runs = [cold_start(endpoint, mode == 'warm_up', cwd, args.timeout) for i in range(args.runs)]
+                    result = {
+                        'mode': mode,
+                        'endpoint': endpoint,
+                        'runs': len(runs),
+                        'ready_s': median_of(runs, 'ready_s'),
+                        'first_response_s': median_of(runs, 'first_response_s'),
+                        'second_response_s': median_of(runs, 'second_response_s'),
+                        'status_codes': sorted({run['status_code'] for run in runs})
+                    }
+                    print(json.dumps(result))
+                    results.append(result)
+    finally:
+        server.shutdown()
+    return {'import_s': imports, 'cold_start': results}
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    report = run(args)
+    report['machine'] = {'python': platform.python_version(), 'system': platform.system(),
+                         'machine': platform.machine(), 'cpus': os.cpu_count()}
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=4)
@@ -0,0 +1,93 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import numpy as np
+
+from harness import SRC_DIR
+
+# latency benchmark of the NumPy LSTM forward pass (ml-service/models/numpy_lstm.py) against Keras
+# model.predict: trains a StockPricePredictor on a synthetic series, exports its weights and times
+# predict_batch of both engines for every batch size, with the largest difference of their predictions
+sys.path.insert(0, os.path.join(SRC_DIR, 'ml-service'))
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8, 32, 128])
+parser.add_argument('--repeats', type=int, default=30, help='timed calls per engine and batch size, the median is kept')
+parser.add_argument('--epochs', type=int, default=2, help='training epochs of the benchmarked model')
+parser.add_argument('--points', type=int, default=200, help='length of the synthetic training series')
+parser.add_argument('--tolerance', type=float, default=1e-3, help='largest accepted price difference')
+parser.add_argument('--save', help='optional path to write the exported weights (.npz)')
+parser.add_argument('--output', help='optional path to write the json report')
+
+# function to train a predictor on a synthetic series with the given number of epochs
+def train_predictor(points, epochs):
+    from models.price_predictor import StockPricePredictor
+    predictor = StockPricePredictor()
+    series = 100 + 5 * np.sin(np.arange(points) / 5.0) + np.random.default_rng(1).normal(0, 0.5, points)
+    X, y = predictor.prepare_data(series)
+    X = X.reshape((X.shape[0], X.shape[1], 1))
+    predictor.build_model((X.shape[1], 1))
+    predictor.model.fit(X, y, epochs=epochs, batch_size=32, verbose=0)
+    predictor.version += 1
+    return predictor
+
+# function to time predict_batch, the first call is not timed
+def time_engine(engine, windows, repeats):
+    engine.predict_batch(windows)
+    timings = []
+    for i in range(repeats):
+        start_time = time.perf_counter()
+        engine.predict_batch(windows)
+        timings.append(time.perf_counter() - start_time)
+    timings.sort()
+    return {'median_ms': round(statistics.median(timings) * 1000, 4),
+            'p90_ms': round(timings[min(len(timings) - 1, int(0.9 * len(timings)))] * 1000, 4)}
+
+def run(args):
+    from models.numpy_lstm import NumpyLSTMPredictor, export_weights, save_weights
+    keras_predictor = train_predictor(args.points, args.epochs)
+    weights = export_weights(keras_predictor)
+    if args.save:
+        save_weights(weights, args.save)
+    numpy_predictor = NumpyLSTMPredictor(weights)
+
+    rng = np.random.default_rng(2)
+    results = []
+    for batch_size in args.batch_sizes:
+        windows = [100 + 5 * np.sin(np.arange(keras_predictor.sequence_length) / 5.0 + rng.uniform(0, 6))
+                   for i in range(batch_size)]
+        difference = float(np.max(np.abs(keras_predictor.predict_batch(windows) -
+                                          numpy_predictor.predict_batch(windows))))
+        keras_timing = time_engine(keras_predictor, windows, args.repeats)
+        numpy_timing = time_engine(numpy_predictor, windows, args.repeats)
+        result = {
+            'batch_size': batch_size,
+            'keras': keras_timing,
+            'numpy': numpy_timing,
+            'speedup': round(keras_timing['median_ms'] / numpy_timing['median_ms'], 2),
+            'max_abs_difference': difference,
+            'within_tolerance': difference <= args.tolerance
+        }
+        print(json.dumps(result))
+        results.append(result)
+    return results
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    results = run(args)
+    report = {
+        'machine': {'python': platform.python_version(), 'system': platform.system(),
+                    'machine': platform.machine(), 'cpus': os.cpu_count()},
+        'settings': {'repeats': args.repeats, 'epochs': args.epochs, 'points': args.points,
+                     'tolerance': args.tolerance},
+        'benchmarks': results
+    }
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=4)
+    if not all(result['within_tolerance'] for result in results):
+        raise SystemExit('the NumPy predictions differ from Keras by more than the tolerance')
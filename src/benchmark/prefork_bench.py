@@ -0,0 +1,168 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import numpy as np
+import requests
+from http.server import ThreadingHTTPServer
+
+from harness import SRC_DIR, free_port, wait_for_port
+from ml_startup_bench import ML_DIR, StubHandler, build_tree
+
+sys.path.insert(0, os.path.join(SRC_DIR, 'client'))
+sys.path.insert(0, ML_DIR)
+from histogram import LatencyHistogram
+
+# throughput and memory of the pre-forked ML service (app.py --workers N): for every worker count the service
+# serves batched price predictions with the NumPy engine from memory mapped weights (random weights of the
+# shape of the trained LSTM) and the benchmark reports requests/s, latencies and, per process, the resident
+# memory (rss) and the proportional set size (pss, shared pages split between the processes sharing them)
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+parser.add_argument('--clients', type=int, default=16, help='concurrent client threads')
+parser.add_argument('--duration', type=float, default=10.0, help='seconds of load per worker count')
+parser.add_argument('--symbols', type=int, default=32, help='symbols per prediction request')
+parser.add_argument('--output', help='optional path to write the json report')
+
+# function to write random weights with the shapes of the StockPricePredictor network as memory mappable files
+def write_weights(path, units=50, dense_units=25, sequence_length=60):
+    from models.numpy_lstm import save_weights
+    rng = np.random.default_rng(1)
+
+    def matrix(*shape):
+        return rng.normal(0, 0.1, shape).astype(np.float32)
+
+    weights = {
+        'sequence_length': np.array(sequence_length),
+        'version': np.array(1),
+        'scaler_scale': np.array([0.1]),
+        'scaler_min': np.array([-9.5]),
+        'layer_0_lstm_kernel': matrix(1, 4 * units),
+        'layer_0_lstm_recurrent_kernel': matrix(units, 4 * units),
+        'layer_0_lstm_bias': matrix(4 * units),
+        'layer_1_lstm_kernel': matrix(units, 4 * units),
+        'layer_1_lstm_recurrent_kernel': matrix(units, 4 * units),
+        'layer_1_lstm_bias': matrix(4 * units),
+        'layer_2_dense_kernel': matrix(units, dense_units),
+        'layer_2_dense_bias': matrix(dense_units),
+        'layer_3_dense_kernel': matrix(dense_units, 1),
+        'layer_3_dense_bias': matrix(1)
+    }
+    save_weights(weights, path)
+
+# function to read the memory of a process from /proc (Linux only), in kB
+def memory(pid):
+    values = {}
+    try:
+        with open('/proc/'+str(pid)+'/smaps_rollup', 'r') as file:
+            for line in file:
+                parts = line.split()
+                if parts[0] in ('Rss:', 'Pss:', 'Shared_Clean:', 'Shared_Dirty:', 'Private_Clean:', 'Private_Dirty:'):
+                    values[parts[0][:-1].lower() + '_kb'] = int(parts[1])
+    except OSError:
+        return None
+    return values
+
+def children(pid):
+    try:
+        with open('/proc/'+str(pid)+'/task/'+str(pid)+'/children', 'r') as file:
+            return [int(child) for child in file.read().split()]
+    except OSError:
+        return []
+
+# function to send prediction requests from the client threads for the given duration
+def load(base_url, clients, duration, symbols):
+    histogram = LatencyHistogram()
+    lock = threading.Lock()
+    counts = {'ok': 0, 'errors': 0}
+    deadline = time.perf_counter() + duration
+
+    def worker(index):
+        session = requests.Session()
+        sent = 0
+        while time.perf_counter() < deadline:
+            payload = {'symbols': ['S'+str(index)+'_'+str(sent)+'_'+str(i) for i in range(symbols)]}
+            sent += 1
+            start_time = time.perf_counter()
+            try:
+                ok = session.post(base_url+'/ml/predictions', json=payload, timeout=30).status_code == 200
+            except requests.RequestException:
+                ok = False
+            latency = time.perf_counter() - start_time
+            with lock:
+                counts['ok' if ok else 'errors'] += 1
+                if ok:
+                    histogram.record(latency)
+        session.close()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(clients)]
+    start_time = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start_time
+    return {'requests': counts['ok'], 'errors': counts['errors'], 'throughput_rps': round(counts['ok'] / elapsed, 2),
+            'predictions_per_s': round(counts['ok'] * symbols / elapsed, 1), 'latency': histogram.summary()}
+
+def run_workers(workers, cwd, args):
+    port = free_port()
+    process = subprocess.Popen([sys.executable, os.path.join(ML_DIR, 'app.py'), '--port', str(port),
+                                '--workers', str(workers)], cwd=cwd,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(port, process, 'ml-service', 60)
+        base_url = 'http://127.0.0.1:'+str(port)
+        # warming every worker before measuring
+        load(base_url, args.clients, 1.0, args.symbols)
+        result = {'workers': workers}
+        result.update(load(base_url, args.clients, args.duration, args.symbols))
+        worker_pids = children(process.pid) if workers > 1 else [process.pid]
+        result['parent'] = memory(process.pid) if workers > 1 else None
+        result['worker_memory'] = [memory(pid) for pid in worker_pids]
+        measured = [item for item in result['worker_memory'] if item]
+        result['worker_rss_kb_mean'] = sum(item['rss_kb'] for item in measured) // max(1, len(measured))
+        result['worker_private_kb_mean'] = sum(item['private_clean_kb'] + item['private_dirty_kb']
+                                               for item in measured) // max(1, len(measured))
+        result['total_pss_kb'] = sum(item['pss_kb'] for item in [result['parent']] + measured if item)
+        return result
+    finally:
+        process.terminate()
+        process.wait()
+
+def run(args):
+    server = ThreadingHTTPServer(('127.0.0.1', free_port()), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as work_dir:
+            weights_dir = os.path.join(work_dir, 'price_predictor_weights')
+            write_weights(weights_dir)
+            # every request misses the prediction cache so that the workers run the forward pass
+            cwd = build_tree(work_dir, server.server_address[1],
+                             {'numpy_weights': weights_dir, 'prediction_cache': {'max_size': 1, 'ttl': 0}})
+            for workers in args.workers:
+                result = run_workers(workers, cwd, args)
+                print(json.dumps({key: value for key, value in result.items() if key != 'worker_memory'}))
+                results.append(result)
+    finally:
+        server.shutdown()
+    return results
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    report = {
+        'machine': {'python': platform.python_version(), 'system': platform.system(),
+                    'machine': platform.machine(), 'cpus': os.cpu_count()},
+        'settings': {'clients': args.clients, 'duration': args.duration, 'symbols': args.symbols},
+        'results': run(args)
+    }
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=4)
@@ -0,0 +1,64 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# stub upstream used by the benchmarks, it answers every GET/POST/PUT with a small json body
+# after an optional delay so that the cost of the gateway itself can be measured in isolation
+class StubHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so that clients can keep the connection alive
+    protocol_version = 'HTTP/1.1'
+    # headers and body are written separately, so Nagle would delay the body on a reused connection
+    disable_nagle_algorithm = True
+
+    def _reply(self):
+        if self.server.dead:
+            # a killed server drops the kept alive connections without answering
+            self.close_connection = True
+            return
+        # draining the request body (if any) so that the connection can be reused
+        length = int(self.headers.get('Content-Length', 0))
+        if length:
+            self.rfile.read(length)
+        if self.server.delay:
+            time.sleep(self.server.delay)
+        # a bytes body is sent as is, so that an upstream answering with something else than json can be stubbed
+        body = self.server.body if isinstance(self.server.body, bytes) else json.dumps(self.server.body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = _reply
+    do_POST = _reply
+    do_PUT = _reply
+
+    def log_message(self, format, *args):
+        # keeping the benchmark output clean
+        pass
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # a deep accept backlog so that bursts of new connections are not refused
+    request_queue_size = 128
+    dead = False
+
+    def handle_error(self, request, client_address):
+        # clients that gave up (timeouts) close the socket before the reply, which is expected here
+        pass
+
+    # function to simulate a crash: stop accepting connections and drop the open ones
+    def kill(self):
+        self.dead = True
+        self.shutdown()
+        self.server_close()
+
+# function to start a stub server on an ephemeral port in a daemon thread
+def start_stub_server(delay=0.0, body=None):
+    server = StubServer(('127.0.0.1', 0), StubHandler)
+    server.delay = delay
+    server.body = body if body is not None else {'name': 'GameStart', 'price': 100, 'quantity': 100}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
@@ -0,0 +1,121 @@
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+
+from harness import SRC_DIR
+
+# memory and throughput of the training input of the price predictor over many symbols: a market data store of
+# --symbols symbols of --rows daily closes is generated, then the windows of every symbol are built the former
+# way (every symbol read into pandas, its windows materialized and concatenated, as model.fit needs them) and
+# streamed by WindowDataset (chunked reads, shuffle buffer, prefetching thread), with the peak traced memory of
+# both and the windows per second of the stream. --train-epochs also trains the model with train_stream
+sys.path.insert(0, os.path.join(SRC_DIR, 'ml-service'))
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--symbols', type=int, default=500)
+parser.add_argument('--rows', type=int, default=2520, help='closes per symbol, 10 years of trading days by default')
+parser.add_argument('--sequence-length', type=int, default=60)
+parser.add_argument('--batch-size', type=int, default=32)
+parser.add_argument('--chunk-rows', type=int, default=5000)
+parser.add_argument('--shuffle-buffer', type=int, default=20000)
+parser.add_argument('--train-epochs', type=int, default=0, help='epochs of train_stream, 0 to skip training')
+parser.add_argument('--output', help='optional path to write the json report')
+
+# function to write the synthetic store with the stock_prices table of the data pipeline
+def create_store(path, symbols, rows):
+    rng = np.random.default_rng(1)
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE stock_prices (date TEXT, symbol TEXT, open REAL, high REAL, low REAL, close REAL, '
+                 'volume INTEGER, PRIMARY KEY (date, symbol))')
+    dates = [str(np.datetime64('2010-01-01') + i) for i in range(rows)]
+    for i in range(symbols):
+        closes = 50 + 50 * rng.random() + np.cumsum(rng.normal(0, 0.5, rows))
+        conn.executemany('INSERT INTO stock_prices (date, symbol, close) VALUES (?, ?, ?)',
+                         zip(dates, ['S'+str(i)] * rows, closes.tolist()))
+    conn.commit()
+    conn.close()
+
+# the training input before WindowDataset: every symbol loaded whole and all the windows in memory
+def in_memory_windows(path, symbols, sequence_length, scaler):
+    import pandas as pd
+    from models.price_predictor import make_windows
+    conn = sqlite3.connect(path)
+    X, y = [], []
+    for symbol in symbols:
+        prices = pd.read_sql_query('SELECT * FROM stock_prices WHERE symbol = ? ORDER BY date', conn, params=[symbol])
+        scaled = scaler.transform(prices[['close']].values).astype(np.float32)[:, 0]
+        windows, targets = make_windows(scaled, sequence_length)
+        X.append(np.ascontiguousarray(windows))
+        y.append(targets)
+    conn.close()
+    return np.concatenate(X)[:, :, None], np.concatenate(y)
+
+def streamed_windows(dataset):
+    count = 0
+    for X, y in dataset:
+        count += len(y)
+    return count
+
+# function to measure the time and the peak traced memory of a call
+def measure(func):
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    start_time = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start_time
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+def run(args):
+    from data.window_dataset import WindowDataset
+    with tempfile.TemporaryDirectory() as work_dir:
+        path = os.path.join(work_dir, 'market_data.db')
+        create_store(path, args.symbols, args.rows)
+        dataset = WindowDataset(path, sequence_length=args.sequence_length, batch_size=args.batch_size,
+                                chunk_rows=args.chunk_rows, shuffle_buffer=args.shuffle_buffer, seed=0)
+        results = []
+
+        (X, y), elapsed, peak = measure(lambda: in_memory_windows(path, dataset.symbols, args.sequence_length,
+                                                                  dataset.scaler))
+        windows = len(y)
+        del X, y
+        results.append({'method': 'in_memory', 'windows': windows, 'seconds': round(elapsed, 3),
+                        'peak_mb': round(peak / 2**20, 2), 'windows_per_s': round(windows / elapsed)})
+        print(json.dumps(results[-1]))
+
+        count, elapsed, peak = measure(lambda: streamed_windows(dataset))
+        results.append({'method': 'stream', 'windows': count, 'seconds': round(elapsed, 3),
+                        'peak_mb': round(peak / 2**20, 2), 'windows_per_s': round(count / elapsed)})
+        print(json.dumps(results[-1]))
+
+        if args.train_epochs:
+            from models.price_predictor import StockPricePredictor
+            predictor = StockPricePredictor()
+            predictor.sequence_length = args.sequence_length
+            start_time = time.perf_counter()
+            losses = predictor.train_stream(dataset, epochs=args.train_epochs)
+            elapsed = time.perf_counter() - start_time
+            results.append({'method': 'train_stream', 'epochs': args.train_epochs, 'seconds': round(elapsed, 3),
+                            'windows_per_s': round(count * args.train_epochs / elapsed), 'losses': losses})
+            print(json.dumps(results[-1]))
+    return results
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    report = {
+        'machine': {'python': platform.python_version(), 'numpy': np.__version__, 'system': platform.system(),
+                    'machine': platform.machine(), 'cpus': os.cpu_count()},
+        'settings': vars(args),
+        'benchmarks': run(args)
+    }
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=4)
@@ -0,0 +1,81 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+from stub_server import start_stub_server
+
+# making the frontend modules importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'frontend'))
+from upstream import UpstreamClient
+
+# benchmark comparing a fresh connection per request (module level requests.get) with the pooled
+# keep-alive client used by the frontend for its upstream calls
+parser = argparse.ArgumentParser()
+parser.add_argument('--requests', type=int, default=2000, help='number of requests per run')
+parser.add_argument('--threads', type=int, default=10, help='number of concurrent callers')
+parser.add_argument('--delay', type=float, default=0.0, help='upstream service time in seconds')
+parser.add_argument('--output', help='optional path to write the json report')
+
+# function to compute latency percentiles in milliseconds
+def summarize(latencies, elapsed):
+    latencies = sorted(latencies)
+    count = len(latencies)
+
+    def percentile(p):
+        return latencies[min(count - 1, int(p * count))] * 1000
+
+    return {
+        'requests': count,
+        'throughput_rps': count / elapsed,
+        'mean_ms': sum(latencies) / count * 1000,
+        'p50_ms': percentile(0.50),
+        'p90_ms': percentile(0.90),
+        'p99_ms': percentile(0.99)
+    }
+
+# function to run the given call function with the given number of threads
+def run(call, total, threads):
+    def worker(count):
+        latencies = []
+        for i in range(count):
+            start_time = time.perf_counter()
+            call()
+            latencies.append(time.perf_counter() - start_time)
+        return latencies
+
+    per_thread = total // threads
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(worker, [per_thread] * threads))
+    elapsed = time.perf_counter() - start_time
+    return summarize([latency for result in results for latency in result], elapsed)
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    server = start_stub_server(delay=args.delay)
+    host, port = server.server_address
+    url = 'http://'+host+':'+str(port)+'/catalog/GameStart'
+    headers = {'Content-Type': 'application/json'}
+
+    # before: a new TCP connection for every request and no timeout
+    before = run(lambda: requests.get(url, headers=headers), args.requests, args.threads)
+
+    # after: pooled keep-alive client with the pool sized to the number of threads
+    client = UpstreamClient('catalog', host, port, pool_size=args.threads)
+    after = run(lambda: client.get('/catalog/GameStart', headers=headers), args.requests, args.threads)
+
+    report = {
+        'config': vars(args),
+        'before': before,
+        'after': after,
+        'upstream_stats': client.stats()
+    }
+    print(json.dumps(report, indent=4))
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=4)
+    server.shutdown()
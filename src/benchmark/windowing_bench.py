@@ -0,0 +1,92 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+from harness import SRC_DIR
+
+# time and peak memory of building the training windows of the price predictor: the former Python loop
+# (one slice per window copied into a new array) against the strided views of make_windows, on minute bars
+# (10 years of 252 days of 390 minutes by default) and on several symbols with several features at once
+sys.path.insert(0, os.path.join(SRC_DIR, 'ml-service'))
+
+MINUTES_PER_YEAR = 252 * 390
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--years', type=float, default=10.0, help='years of minute bars of the single series')
+parser.add_argument('--symbols', type=int, default=5, help='symbols of the multi symbol case')
+parser.add_argument('--features', type=int, default=5, help='features per step of the multi symbol case')
+parser.add_argument('--symbol-years', type=float, default=1.0, help='years of minute bars per symbol')
+parser.add_argument('--sequence-length', type=int, default=60)
+parser.add_argument('--output', help='optional path to write the json report')
+
+# the windowing of StockPricePredictor.prepare_data before make_windows
+def loop_windows(data, sequence_length):
+    X, y = [], []
+    for i in range(sequence_length, len(data)):
+        X.append(data[i-sequence_length:i])
+        y.append(data[i, 0] if data.ndim > 1 else data[i])
+    return np.array(X), np.array(y)
+
+def loop_windows_multi(data, sequence_length):
+    windows = [loop_windows(series, sequence_length) for series in data]
+    return np.stack([X for X, y in windows]), np.stack([y for X, y in windows])
+
+# function to measure the time of a call, then its peak traced memory in a second call
+def measure(func):
+    start_time = time.perf_counter()
+    X, y = func()
+    elapsed = time.perf_counter() - start_time
+    shape = list(X.shape)
+    del X, y
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    X, y = func()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'seconds': round(elapsed, 4), 'peak_mb': round(peak / 2**20, 2), 'shape': shape}
+
+def run(args):
+    from models.price_predictor import make_windows
+    rng = np.random.default_rng(1)
+    length = args.sequence_length
+    results = []
+
+    series = np.cumsum(rng.normal(0, 0.01, int(args.years * MINUTES_PER_YEAR))) + 100
+    multi = np.cumsum(rng.normal(0, 0.01, (args.symbols, int(args.symbol_years * MINUTES_PER_YEAR), args.features)),
+                      axis=1) + 100
+    cases = [
+        ('single_series', series.nbytes, {
+            'loop': lambda: loop_windows(series, length),
+            'views': lambda: make_windows(series, length),
+            'views_materialized': lambda: tuple(np.ascontiguousarray(a) for a in make_windows(series, length))
+        }),
+        ('multi_symbol', multi.nbytes, {
+            'loop': lambda: loop_windows_multi(multi, length),
+            'views': lambda: make_windows(multi, length),
+            'views_materialized': lambda: tuple(np.ascontiguousarray(a) for a in make_windows(multi, length))
+        })
+    ]
+    for case, input_bytes, methods in cases:
+        for method, func in methods.items():
+            result = {'case': case, 'method': method, 'input_mb': round(input_bytes / 2**20, 2)}
+            result.update(measure(func))
+            print(json.dumps(result))
+            results.append(result)
+    return results
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    report = {
+        'machine': {'python': platform.python_version(), 'numpy': np.__version__, 'system': platform.system(),
+                    'machine': platform.machine(), 'cpus': os.cpu_count()},
+        'settings': vars(args),
+        'benchmarks': run(args)
+    }
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=4)
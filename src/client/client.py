@@ -3,13 +3,36 @@ import time
 import requests
 import json
 import argparse
+import itertools
+import threading
+
+from histogram import LatencyHistogram
 
 # defining stocks list to randomly pick one stock from the list
 stocks = ["GameStart", "FishCo", "MenhirCo", "BoarCo", "Google", "Netflix", "Amazon", "Apple", "Tesla", "Meta"]
 
+# operations sent by the load generator
+OPERATIONS = ['lookup', 'trade', 'order_read']
+
 # Parser to extract the command line arguments
 parser = argparse.ArgumentParser()
-parser.add_argument('--probability')
+parser.add_argument('--probability',
+                    help='probability of a trade after a lookup, used for the operation mix when --mix is not given')
+parser.add_argument('--workers', type=int, default=1, help='number of concurrent workers (connections)')
+parser.add_argument('--loop', choices=['closed', 'open'], default='closed',
+                    help='closed: every worker sends its next request when the previous one returned, '
+                         'open: requests are started at a fixed arrival rate')
+parser.add_argument('--rate', type=float, default=100.0, help='requests per second in open loop')
+parser.add_argument('--duration', type=float, help='seconds to run, instead of a number of iterations')
+parser.add_argument('--iterations', type=int, default=50, help='number of requests per worker (closed loop) '
+                                                               'or in total (open loop) when no duration is given')
+parser.add_argument('--mix', help='operation weights, for example lookup=0.7,trade=0.2,order_read=0.1')
+parser.add_argument('--skew', type=float, default=0.0,
+                    help='zipf exponent of the symbol popularity, 0 picks the symbols uniformly')
+parser.add_argument('--think-time', type=float, default=0.0, help='seconds a closed loop worker waits between requests')
+parser.add_argument('--seed', type=int, help='random seed to replay the same workload')
+parser.add_argument('--skip-validation', action='store_true', help='do not validate the trades against the order info')
+parser.add_argument('--output', help='optional path to write the json report')
 args = parser.parse_args()
 
 # reading the config file to get the environment variables
@@ -19,123 +42,180 @@ with open('../config.json', 'r') as file:
 config = json.loads(config_file_data)
 
 frontend_config = config['frontend']
+base_url = 'http://'+frontend_config['host']+':'+str(frontend_config['port'])
 
 # Read the probability from command line arguments and set the probability "p" for sending another order request
 p = 0.5 if args.probability == None else float(args.probability)
 
-# variables to maintain all the aggregate latencies
-lookup_sum = 0
-trade_sum = 0
-order_info_sum = 0
+# function to read the operation weights, by default a lookup is followed by a trade with probability p
+def parse_mix(mix):
+    if mix is None:
+        return {'lookup': 1.0, 'trade': p, 'order_read': 0.0}
+    weights = {operation: 0.0 for operation in OPERATIONS}
+    for part in mix.split(','):
+        operation, weight = part.split('=')
+        if operation not in weights:
+            raise ValueError('unknown operation '+operation)
+        weights[operation] = float(weight)
+    return weights
 
+weights = parse_mix(args.mix)
+operation_weights = [weights[operation] for operation in OPERATIONS]
 
-# initiating session object using requests module
-session = requests.Session()
-# setting a flag to check if a session is closed or not
-is_session_closed = False
+# cumulative zipf weights of the stocks, the first stock of the list is the most popular
+stock_weights = list(itertools.accumulate(1.0 / (rank ** args.skew) for rank in range(1, len(stocks) + 1)))
 
+# trades done so far, used for the order reads and the validation (list append is thread safe)
 trade_data = []
 
-# method to pick a random stock from the stocks list
-def pick_random_stock():
+# event set on ctrl+c to stop the workers, what was sent so far is still reported and validated
+stop_event = threading.Event()
+
+# content type headers for the trade requests
+headers = {
+    'Content-Type': 'application/json'
+}
+
+# class holding the per operation counters and latency histograms of one worker
+class WorkerStats:
+    def __init__(self):
+        self.histograms = {operation: LatencyHistogram() for operation in OPERATIONS}
+        self.errors = {operation: 0 for operation in OPERATIONS}
+        self.status_codes = {operation: {} for operation in OPERATIONS}
+
+    def record(self, operation, status_code, latency):
+        codes = self.status_codes[operation]
+        codes[str(status_code)] = codes.get(str(status_code), 0) + 1
+        if status_code == 200:
+            self.histograms[operation].record(latency)
+        else:
+            self.errors[operation] += 1
+
+    def merge(self, other):
+        for operation in OPERATIONS:
+            self.histograms[operation].merge(other.histograms[operation])
+            self.errors[operation] += other.errors[operation]
+            for code, count in other.status_codes[operation].items():
+                self.status_codes[operation][code] = self.status_codes[operation].get(code, 0) + count
+
+# method to pick a random stock from the stocks list following the symbol skew
+def pick_random_stock(rng):
     # pick a random stock
-    stock = random.choice(stocks)
-    return stock
-
-def start(iterations):
-    global is_session_closed
-    global session
-    global lookup_sum
-    global trade_sum
-    # while True:
-    for i in range(iterations):
-        print("iteration ", i)
-        if is_session_closed:
-            session = requests.Session()
-            is_session_closed = False
-
-        # pick a random stock
-        stock_name = pick_random_stock()
-
-        host = frontend_config['host']
-        port = str(frontend_config['port'])
-
-        start_time = time.time()
-
-        # calling the lookup method with the previous session created
-        response = session.get('http://'+host+':'+port+'/catalog/' + stock_name)
-
-        lookup_latency = time.time() - start_time
-
-        # aggregating the latency sum 
-        lookup_sum += lookup_latency
-
-        # decoding the response into JSON format and deserializing the response
-        response_data = response.json()
-        print('response_data: ', response_data)
-
-        # checking for the positive quantity
-        if response_data["data"]["quantity"] > 0:
-            # Randomly decide whether to send another order request based on probability "p"
-            if random.random() < p:
-                # construct the payload object for order request with required fields
-                payload = {
-                    'name': stock_name,
-                    'type': random.choice(['sell', 'buy']),
-                    'quantity': random.randint(1, 100)
-                }
-                # add content-type as json in headers
-                headers = {
-                    'Content-Type': 'application/json'
-                }
-
-                start_time = time.time()
-
-                # Send another order request using the same HTTP connection (same session)
-                order_response = session.post('http://'+host+':'+port+'/orders', json=payload, headers=headers)
-
-                trade_latency = time.time() - start_time
-
-                trade_sum += trade_latency
-                
-                # decoding the response into JSON format and deserializing the response
-                order_response_data = order_response.json()
-                print('order_response_data: ', order_response_data)
-                if order_response.status_code == 200:
-                    # print(order_response_data)
-                    item = {}
-                    item['number'] = order_response_data['data']['transaction_number']
-                    item.update(payload)
-                    # item['order_payload'] = payload
-                    trade_data.append(item)
+    return rng.choices(stocks, cum_weights=stock_weights)[0]
+
+# function to send one operation with the given session, returns the operation actually sent and the status code
+def send(session, rng, operation):
+    if operation == 'order_read' and not trade_data:
+        # no order to read yet, looking up a stock instead
+        operation = 'lookup'
+
+    if operation == 'lookup':
+        response = session.get(base_url+'/catalog/'+pick_random_stock(rng))
+    elif operation == 'trade':
+        # construct the payload object for order request with required fields
+        payload = {
+            'name': pick_random_stock(rng),
+            'type': rng.choice(['sell', 'buy']),
+            'quantity': rng.randint(1, 100)
+        }
+        response = session.post(base_url+'/orders', json=payload, headers=headers)
+        if response.status_code == 200:
+            item = {}
+            item['number'] = response.json()['data']['transaction_number']
+            item.update(payload)
+            trade_data.append(item)
+    else:
+        order_number = rng.choice(trade_data)['number']
+        response = session.get(base_url+'/orders/'+str(order_number))
+    # reading the body so that the connection can be reused
+    response.content
+    return operation, response.status_code
+
+# function to send one operation and record its latency from the given start time
+# (in open loop the start time is the time the request was scheduled, so queueing in the client is counted)
+def run_operation(session, rng, stats, start_time):
+    operation = rng.choices(OPERATIONS, weights=operation_weights)[0]
+    try:
+        operation, status_code = send(session, rng, operation)
+    except requests.RequestException:
+        status_code = 'connection_error'
+    stats.record(operation, status_code, time.perf_counter() - start_time)
+
+# closed loop worker, sending the next request when the previous one returned
+def closed_loop_worker(stats, rng, deadline):
+    # initiating session object using requests module, the connection is reused by the worker
+    session = requests.Session()
+    sent = 0
+    while not stop_event.is_set() and ((time.perf_counter() < deadline) if deadline else (sent < args.iterations)):
+        run_operation(session, rng, stats, time.perf_counter())
+        sent += 1
+        if args.think_time:
+            time.sleep(args.think_time)
+    session.close()
+
+# open loop worker, the workers share the arrival schedule and each takes the next free arrival
+def open_loop_worker(stats, rng, schedule, deadline):
+    session = requests.Session()
+    while not stop_event.is_set():
+        with schedule['lock']:
+            index = next(schedule['counter'])
+        scheduled_time = schedule['start'] + index / args.rate
+        if (scheduled_time >= deadline) if deadline else (index >= args.iterations):
+            break
+        delay = scheduled_time - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        run_operation(session, rng, stats, scheduled_time)
+    session.close()
+
+# function to run the workers and merge their stats
+def start():
+    seed = args.seed if args.seed is not None else random.randrange(1 << 30)
+    start_time = time.perf_counter()
+    deadline = start_time + args.duration if args.duration else None
+    schedule = {'lock': threading.Lock(), 'counter': itertools.count(), 'start': start_time}
+
+    workers = []
+    for i in range(args.workers):
+        stats = WorkerStats()
+        rng = random.Random(seed + i)
+        if args.loop == 'closed':
+            thread = threading.Thread(target=closed_loop_worker, args=(stats, rng, deadline))
         else:
-            print("session closed")
-            is_session_closed = True
-            session.close()
-        
+            thread = threading.Thread(target=open_loop_worker, args=(stats, rng, schedule, deadline))
+        workers.append((thread, stats))
+        thread.start()
+
+    try:
+        for thread, stats in workers:
+            thread.join()
+    except KeyboardInterrupt:
+        stop_event.set()
+        for thread, stats in workers:
+            thread.join()
+
+    total = WorkerStats()
+    for thread, stats in workers:
+        total.merge(stats)
+    return total, time.perf_counter() - start_time, seed
+
 # fucntion to validate its data and server data
 def validate():
-    global order_info_sum
     success = 0
     failed = 0
-    host = frontend_config['host']
-    port = str(frontend_config['port'])
+    session = requests.Session()
     # looping through the order response data
     for item in trade_data:
         # reading ther order number for get order info API
         order_number = item['number']
-        start_time = time.time()
         # construting the url for get order info api
-        url = 'http://'+host+':'+port+'/orders/'+str(order_number)
+        url = base_url+'/orders/'+str(order_number)
 
         # calling API with requests module
-        response = requests.get(url=url)
+        response = session.get(url=url)
 
-        order_latency = time.time() - start_time
-        
-        order_info_sum += order_latency
         if response.status_code == 200:
-            # if status is 200, 
+            # if status is 200,
             # reading json response
             order_info = response.json()
             # if the local data matched witht the server then incrementing the success otherwise failed
@@ -143,23 +223,36 @@ def validate():
                 success += 1
             else:
                 failed += 1
-    
+        else:
+            failed += 1
+
     return success, failed
 
+# function to build the json report
+def build_report(stats, elapsed, seed):
+    operations = {}
+    completed = 0
+    for operation in OPERATIONS:
+        result = stats.histograms[operation].summary()
+        result['errors'] = stats.errors[operation]
+        result['status_codes'] = stats.status_codes[operation]
+        operations[operation] = result
+        completed += result['count']
+    return {
+        'config': dict(vars(args), seed=seed, mix=weights),
+        'elapsed_s': elapsed,
+        'throughput_rps': completed / elapsed if elapsed else 0.0,
+        'operations': operations
+    }
+
 if __name__ == "__main__":
-    try:
-        # starting the cloent main process
-        iterations = 50
-        start(iterations)
-        # validating the local data and server data
-        success, failed = validate()
-        print("succesful validations: ", success)
-        print("failed validations: ", failed)
-        print('lookup_sum: ', lookup_sum/iterations)
-        print('order_info_sum: ', order_info_sum/len(trade_data))
-        print('trade_sum: ', trade_sum/len(trade_data))
-    except KeyboardInterrupt:
+    stats, elapsed, seed = start()
+    report = build_report(stats, elapsed, seed)
+    if not args.skip_validation:
         # validating the local data and server data
         success, failed = validate()
-        print("succesful validations: ", success)
-        print("failed validations: ", failed)
\ No newline at end of file
+        report['validation'] = {'success': success, 'failed': failed}
+    print(json.dumps(report, indent=4))
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=4)
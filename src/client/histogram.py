@@ -0,0 +1,69 @@
+import math
+
+# number of sub buckets per power of two, the recorded values are kept with a relative error below 1/128
+SUB_BUCKET_BITS = 7
+
+# class to record latencies in log-linear buckets (in the style of an HDR histogram)
+# values are recorded in microseconds, every power of two range is split in 2^SUB_BUCKET_BITS linear buckets
+# so the memory does not grow with the number of recorded values and two histograms can be merged
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    # function to find the lowest value of the bucket of the given value
+    def _bucket(self, value):
+        shift = max(0, value.bit_length() - SUB_BUCKET_BITS)
+        return (value >> shift) << shift, shift
+
+    # function to record a latency given in seconds
+    def record(self, seconds):
+        value = max(0, int(seconds * 1000000))
+        bucket, shift = self._bucket(value)
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    # function to add the values recorded by another histogram
+    def merge(self, other):
+        for bucket, count in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    # function to read the value (in microseconds) below which the given percentage of values fall
+    # the highest value of the bucket is returned, capped by the largest recorded value
+    def percentile(self, percentage):
+        if self.count == 0:
+            return None
+        rank = max(1, int(math.ceil(percentage / 100.0 * self.count)))
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                bucket, shift = self._bucket(bucket)
+                return min(bucket + (1 << shift) - 1, self.max)
+        return self.max
+
+    # function to summarize the histogram in milliseconds for the json report
+    def summary(self):
+        if self.count == 0:
+            return {'count': 0}
+        return {
+            'count': self.count,
+            'mean_ms': self.total / self.count / 1000.0,
+            'min_ms': self.min / 1000.0,
+            'max_ms': self.max / 1000.0,
+            'p50_ms': self.percentile(50) / 1000.0,
+            'p90_ms': self.percentile(90) / 1000.0,
+            'p99_ms': self.percentile(99) / 1000.0,
+            'p99_9_ms': self.percentile(99.9) / 1000.0
+        }
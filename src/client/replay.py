@@ -0,0 +1,186 @@
+import time
+import requests
+import json
+import argparse
+import itertools
+import threading
+
+from histogram import LatencyHistogram
+
+# routes found in a trace recorded by the frontend (--trace)
+ROUTES = ['lookup', 'trade', 'order_read']
+
+# percentiles compared between the recorded and the replayed latencies
+PERCENTILES = ['p50_ms', 'p90_ms', 'p99_ms', 'p99_9_ms', 'mean_ms']
+
+# Parser to extract the command line arguments
+parser = argparse.ArgumentParser()
+parser.add_argument('trace', help='trace file recorded by the frontend with --trace')
+parser.add_argument('--speed', type=float, default=1.0,
+                    help='replay speed, 1 keeps the recorded timing, 10 is ten times faster, 0 is as fast as possible')
+parser.add_argument('--workers', type=int, default=32, help='number of concurrent connections')
+parser.add_argument('--limit', type=int, help='replay only the first requests of the trace')
+parser.add_argument('--output', help='optional path to write the json report')
+parser.add_argument('--url', help='base url of the frontend to replay against, instead of the one of the config')
+
+# base url of the frontend the trace is replayed against, set from --url or from the config file
+base_url = None
+
+# function to read the frontend url from the config file
+def config_base_url():
+    with open('../config.json', 'r') as file:
+        config_file_data = file.read()
+
+    config = json.loads(config_file_data)
+
+    frontend_config = config['frontend']
+    return 'http://'+frontend_config['host']+':'+str(frontend_config['port'])
+
+# content type headers for the trade requests
+headers = {
+    'Content-Type': 'application/json'
+}
+
+# function to read the requests of a trace file ordered by arrival time
+def load_trace(path, limit=None):
+    events = []
+    with open(path, 'r') as file:
+        for line in file:
+            line = line.strip()
+            if line:
+                events.append(json.loads(line))
+    events.sort(key=lambda event: event['t'])
+    return events[:limit] if limit else events
+
+# seconds an order read waits for the replay of the trade it reads
+TRADE_WAIT_TIMEOUT = 5.0
+
+# class to replay a trace, the transaction numbers of the recorded trades are mapped to the numbers
+# returned by the replayed trades so that the order reads ask for orders that exist on the target stack
+# (when the replay is sped up, an order read waits until the trade it reads was replayed)
+class Replayer:
+    def __init__(self, events, speed, workers):
+        self.events = events
+        self.speed = speed
+        self.workers = workers
+        self.counter = itertools.count()
+        self.lock = threading.Lock()
+        self.traded = threading.Condition(self.lock)
+        self.numbers = {}
+        # recorded transaction numbers of the trades that were not replayed yet
+        self.pending = {str(event['n']) for event in events if event['r'] == 'trade' and 'n' in event}
+        self.recorded = {route: LatencyHistogram() for route in ROUTES}
+        self.replayed = {route: LatencyHistogram() for route in ROUTES}
+        self.lag = LatencyHistogram()
+        self.errors = {route: 0 for route in ROUTES}
+        self.status_mismatches = {route: 0 for route in ROUTES}
+
+    # function to send one recorded request, returns the status code
+    def send(self, session, event):
+        route = event['r']
+        if route == 'lookup':
+            response = session.get(base_url+'/catalog/'+str(event['s']))
+        elif route == 'trade':
+            try:
+                response = session.post(base_url+'/orders', json=event['p'], headers=headers)
+                if response.status_code == 200 and 'n' in event:
+                    with self.lock:
+                        self.numbers[str(event['n'])] = response.json()['data']['transaction_number']
+            finally:
+                with self.traded:
+                    self.pending.discard(str(event.get('n')))
+                    self.traded.notify_all()
+        else:
+            with self.traded:
+                self.traded.wait_for(lambda: str(event['s']) not in self.pending, TRADE_WAIT_TIMEOUT)
+                order_number = self.numbers.get(str(event['s']), event['s'])
+            response = session.get(base_url+'/orders/'+str(order_number))
+        # reading the body so that the connection can be reused
+        response.content
+        return response.status_code
+
+    def worker(self, start_time):
+        session = requests.Session()
+        first_arrival = self.events[0]['t']
+        while True:
+            with self.lock:
+                index = next(self.counter)
+            if index >= len(self.events):
+                break
+            event = self.events[index]
+            if self.speed > 0:
+                # keeping the recorded inter-arrival time, scaled by the speed
+                scheduled_time = start_time + (event['t'] - first_arrival) / self.speed
+                delay = scheduled_time - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            else:
+                scheduled_time = time.perf_counter()
+            send_time = time.perf_counter()
+            try:
+                status_code = self.send(session, event)
+            except requests.RequestException:
+                status_code = None
+            latency = time.perf_counter() - send_time
+            self.record(event, status_code, latency, send_time - scheduled_time)
+        session.close()
+
+    def record(self, event, status_code, latency, lag):
+        route = event['r']
+        with self.lock:
+            self.lag.record(max(0.0, lag))
+            if status_code != event['c']:
+                self.status_mismatches[route] += 1
+            if status_code == 200:
+                self.replayed[route].record(latency)
+            else:
+                self.errors[route] += 1
+            if event['c'] == 200:
+                self.recorded[route].record(event['l'] / 1000.0)
+
+    # function to replay the whole trace with the worker threads
+    def run(self):
+        start_time = time.perf_counter()
+        threads = [threading.Thread(target=self.worker, args=(start_time,)) for i in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - start_time
+
+    # function to build the json report with the latency deltas (replayed minus recorded) per route
+    # the recorded latencies are measured inside the frontend, the replayed ones include the client network hop
+    def report(self, elapsed):
+        routes = {}
+        for route in ROUTES:
+            recorded = self.recorded[route].summary()
+            replayed = self.replayed[route].summary()
+            deltas = {}
+            if recorded['count'] and replayed['count']:
+                deltas = {key: replayed[key] - recorded[key] for key in PERCENTILES}
+            routes[route] = {'recorded': recorded, 'replayed': replayed, 'delta_ms': deltas,
+                             'errors': self.errors[route], 'status_mismatches': self.status_mismatches[route]}
+        trace_duration = self.events[-1]['t'] - self.events[0]['t'] if self.events else 0.0
+        return {
+            'requests': len(self.events),
+            'speed': self.speed,
+            'trace_duration_s': trace_duration,
+            'elapsed_s': elapsed,
+            'throughput_rps': len(self.events) / elapsed if elapsed else 0.0,
+            'schedule_lag': self.lag.summary(),
+            'routes': routes
+        }
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    # the config file is only needed when no url is given
+    base_url = args.url.rstrip('/') if args.url else config_base_url()
+    events = load_trace(args.trace, args.limit)
+    if not events:
+        raise SystemExit('the trace is empty')
+    replayer = Replayer(events, args.speed, args.workers)
+    report = replayer.report(replayer.run())
+    print(json.dumps(report, indent=4))
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=4)
@@ -0,0 +1,200 @@
+import asyncio
+import itertools
+import threading
+from contextlib import contextmanager, asynccontextmanager
+
+# route classes with their priority, a lower number is admitted first when a slot frees up
+ROUTE_PRIORITIES = {'trade': 0, 'order_read': 1, 'lookup': 2}
+
+# default concurrency limits per route class and for the whole frontend
+DEFAULT_LIMITS = {'trade': 16, 'order_read': 16, 'lookup': 32}
+DEFAULT_TOTAL_LIMIT = 48
+DEFAULT_QUEUE_SIZE = 64
+DEFAULT_QUEUE_TIMEOUT = 1.0
+DEFAULT_RETRY_AFTER = 1
+
+# exception raised when a request is shed, the frontend turns it into a 503 with a Retry-After header
+class AdmissionRejected(Exception):
+    def __init__(self, route_class, reason, retry_after):
+        super().__init__(route_class+' request shed: '+reason)
+        self.route_class = route_class
+        self.reason = reason
+        self.retry_after = retry_after
+
+# waiting request, woken up by the controller when it is granted a slot or evicted from the queue
+class Waiter:
+    def __init__(self, route_class, seq):
+        self.route_class = route_class
+        self.priority = ROUTE_PRIORITIES[route_class]
+        self.seq = seq
+        self.granted = False
+        self.evicted = False
+
+    def sort_key(self):
+        return (self.priority, self.seq)
+
+class ThreadWaiter(Waiter):
+    def __init__(self, route_class, seq):
+        super().__init__(route_class, seq)
+        self.event = threading.Event()
+
+    def wake(self):
+        self.event.set()
+
+class AsyncWaiter(Waiter):
+    def __init__(self, route_class, seq):
+        super().__init__(route_class, seq)
+        self.loop = asyncio.get_running_loop()
+        self.future = self.loop.create_future()
+
+    def wake(self):
+        self.loop.call_soon_threadsafe(self._resolve)
+
+    def _resolve(self):
+        if not self.future.done():
+            self.future.set_result(None)
+
+# class to limit the number of concurrent requests per route class with a bounded priority wait queue
+class AdmissionController:
+    def __init__(self, limits=None, total_limit=DEFAULT_TOTAL_LIMIT, queue_size=DEFAULT_QUEUE_SIZE,
+                 queue_timeout=DEFAULT_QUEUE_TIMEOUT, retry_after=DEFAULT_RETRY_AFTER):
+        self.limits = dict(DEFAULT_LIMITS)
+        self.limits.update(limits or {})
+        self.total_limit = total_limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+
+        self.lock = threading.Lock()
+        self.seq = itertools.count()
+        self.waiters = []
+        self.in_flight = {route_class: 0 for route_class in ROUTE_PRIORITIES}
+        self.admitted = {route_class: 0 for route_class in ROUTE_PRIORITIES}
+        self.shed = {route_class: 0 for route_class in ROUTE_PRIORITIES}
+        self.queue_peak = 0
+
+    # function to check if a request of the given class can run now, must be called with the lock held
+    def _has_slot(self, route_class):
+        return (self.in_flight[route_class] < self.limits[route_class]
+                and sum(self.in_flight.values()) < self.total_limit)
+
+    def _start(self, route_class):
+        self.in_flight[route_class] += 1
+        self.admitted[route_class] += 1
+
+    # function to admit the request right away or to queue it, returns the waiter or None if it can run
+    # must be called with the lock held
+    def _enter(self, waiter):
+        route_class = waiter.route_class
+        # a request runs right away if there is a slot and no request of its class is waiting (fifo per class),
+        # waiting requests of other classes are only blocked by their own class limit at this point
+        if self._has_slot(route_class) and all(w.route_class != route_class for w in self.waiters):
+            self._start(route_class)
+            return None
+
+        if len(self.waiters) >= self.queue_size:
+            # the queue is full: the new request is shed unless it has a higher priority than the
+            # last request in the queue, in which case that one is shed instead (trades over lookups)
+            lowest = max(self.waiters, key=Waiter.sort_key)
+            if lowest.priority <= waiter.priority:
+                self.shed[route_class] += 1
+                raise AdmissionRejected(route_class, 'queue full', self.retry_after)
+            self.waiters.remove(lowest)
+            lowest.evicted = True
+            self.shed[lowest.route_class] += 1
+            lowest.wake()
+
+        self.waiters.append(waiter)
+        self.queue_peak = max(self.queue_peak, len(self.waiters))
+        return waiter
+
+    # function to hand out the free slots to the waiting requests in priority order
+    # must be called with the lock held
+    def _dispatch(self):
+        for waiter in sorted(self.waiters, key=Waiter.sort_key):
+            if self._has_slot(waiter.route_class):
+                self.waiters.remove(waiter)
+                waiter.granted = True
+                self._start(waiter.route_class)
+                waiter.wake()
+
+    # function called when a waiter gave up, returns True if it was granted in the meantime
+    def _abandon(self, waiter):
+        with self.lock:
+            if waiter.granted:
+                return True
+            if waiter in self.waiters:
+                self.waiters.remove(waiter)
+                self.shed[waiter.route_class] += 1
+            return False
+
+    def _check(self, waiter):
+        if waiter.evicted:
+            raise AdmissionRejected(waiter.route_class, 'evicted by a higher priority request', self.retry_after)
+
+    # function to block the calling thread until the request is admitted
+    def acquire(self, route_class):
+        with self.lock:
+            waiter = self._enter(ThreadWaiter(route_class, next(self.seq)))
+        if waiter is None:
+            return
+        waiter.event.wait(self.queue_timeout)
+        self._check(waiter)
+        if not self._abandon(waiter):
+            raise AdmissionRejected(route_class, 'queue timeout', self.retry_after)
+
+    # function to wait on the event loop until the request is admitted
+    async def acquire_async(self, route_class):
+        with self.lock:
+            waiter = self._enter(AsyncWaiter(route_class, next(self.seq)))
+        if waiter is None:
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.queue_timeout)
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            # the client went away while waiting, giving back the slot if it was granted meanwhile
+            if self._abandon(waiter):
+                self.release(route_class)
+            raise
+        self._check(waiter)
+        if not self._abandon(waiter):
+            raise AdmissionRejected(route_class, 'queue timeout', self.retry_after)
+
+    def release(self, route_class):
+        with self.lock:
+            self.in_flight[route_class] -= 1
+            self._dispatch()
+
+    @contextmanager
+    def admit(self, route_class):
+        self.acquire(route_class)
+        try:
+            yield
+        finally:
+            self.release(route_class)
+
+    @asynccontextmanager
+    async def admit_async(self, route_class):
+        await self.acquire_async(route_class)
+        try:
+            yield
+        finally:
+            self.release(route_class)
+
+    # function to read the admission state for the metrics endpoint
+    def stats(self):
+        with self.lock:
+            queued = {route_class: 0 for route_class in ROUTE_PRIORITIES}
+            for waiter in self.waiters:
+                queued[waiter.route_class] += 1
+            return {
+                'in_flight': dict(self.in_flight),
+                'queued': queued,
+                'queue_depth': len(self.waiters),
+                'queue_peak': self.queue_peak,
+                'admitted': dict(self.admitted),
+                'shed': dict(self.shed),
+                'limits': dict(self.limits, total=self.total_limit)
+            }
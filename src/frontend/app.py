@@ -1,13 +1,27 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g
 import threading
-import json
-import requests
 import time
+import json
 import argparse
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from upstream import UpstreamClient, DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT
+from leader import LeaderMonitor, LeaderStateFile, DEFAULT_HEARTBEAT_INTERVAL, DEFAULT_HEARTBEAT_TIMEOUT, DEFAULT_MAX_MISSES
+from cache import LRUCache, CacheSnapshotFile, DEFAULT_SNAPSHOT_INTERVAL, parse_version
+from tracing import TraceRecorder, TRACED_ROUTES, trade_number
+from responses import lookup_response, trade_response, order_info_response, no_replicas_response, shed_response, \
+    upstream_error_response
+from admission import AdmissionController, AdmissionRejected, DEFAULT_TOTAL_LIMIT, DEFAULT_QUEUE_SIZE, \
+    DEFAULT_QUEUE_TIMEOUT, DEFAULT_RETRY_AFTER
 
 # reading the port number from the arguments
 parser = argparse.ArgumentParser()
 parser.add_argument('--port', type=int, help='port number')
+parser.add_argument('--mode', choices=['threaded', 'async'], default='threaded',
+                    help='threaded flask server or asyncio gateway')
+parser.add_argument('--warm-up', action='store_true',
+                    help='fill the cache on start with the most popular symbols of the last snapshot')
+parser.add_argument('--trace', help='optional path of a file to append a trace of the served requests to')
 args = parser.parse_args()
 
 # reading the config file to get the environment variables
@@ -18,68 +32,130 @@ config = json.loads(data)
 
 app = Flask(__name__)
 
-# initializing the cache
-caching = {}
 # intitalizing the max cache size
 MAX_CACHE_SIZE = 6
-leader_node = {}
-
-# initializing the locks
-read_lock = threading.Lock()
-write_lock = threading.Lock()
+# initializing the cache
+caching = LRUCache(MAX_CACHE_SIZE)
+# initializing the cache snapshot file, the cached keys and access counts are written periodically
+# so that a restarted frontend knows which symbols to warm up
+cache_snapshot_file = CacheSnapshotFile('../cache_snapshot.json', caching,
+                                        config.get('cache_snapshot_interval', DEFAULT_SNAPSHOT_INTERVAL))
+
+# initializing the admission control, limiting the concurrent requests per route class
+# (lookups, trades and order reads) with a bounded wait queue where trades go first
+admission_config = config.get('admission', {})
+admission = AdmissionController(limits=admission_config.get('limits'),
+                                total_limit=admission_config.get('total_limit', DEFAULT_TOTAL_LIMIT),
+                                queue_size=admission_config.get('queue_size', DEFAULT_QUEUE_SIZE),
+                                queue_timeout=admission_config.get('queue_timeout', DEFAULT_QUEUE_TIMEOUT),
+                                retry_after=admission_config.get('retry_after', DEFAULT_RETRY_AFTER))
+
+# reading the upstream settings
+upstream_config = config.get('upstream', {})
+connect_timeout = upstream_config.get('connect_timeout', DEFAULT_CONNECT_TIMEOUT)
+read_timeout = upstream_config.get('read_timeout', DEFAULT_READ_TIMEOUT)
+
+# sizing the connection pools with the concurrency the admission control lets through (the flask server
+# itself starts a thread per request), so that every admitted request keeps its connection alive under load:
+# the catalog serves the lookups, the order leader the trades and order reads plus the background heartbeat
+# and leader notification
+catalog_pool_size = min(admission.limits['lookup'], admission.total_limit)
+order_pool_size = min(admission.limits['trade'] + admission.limits['order_read'], admission.total_limit) + 2
+
+# initializing one pooled client for the catalog and one for each order node (keyed by node id)
+catalog_client = UpstreamClient('catalog', config['catalog']['host'], config['catalog']['port'],
+                                catalog_pool_size, connect_timeout, read_timeout)
+order_clients = {}
+for node in config['order']['nodes']:
+    order_clients[node['id']] = UpstreamClient('order-'+str(node['id']), node['host'], node['port'],
+                                               order_pool_size, connect_timeout, read_timeout)
+
+# initializing the leader state file, the leader state is kept in memory and only persisted here
+# (instead of rewriting the shared config file on every election)
+leader_state_file = LeaderStateFile('../leader_state.json')
+leader_state = leader_state_file.load() or {}
+# initializing the threadpool used to notify all the order nodes in parallel
+notify_pool = ThreadPoolExecutor(max_workers=len(config['order']['nodes']))
+
+# initializing the leader monitor that heartbeats all the order nodes in the background
+leader_monitor = LeaderMonitor(config['order']['nodes'], order_clients,
+                               interval=upstream_config.get('heartbeat_interval', DEFAULT_HEARTBEAT_INTERVAL),
+                               timeout=upstream_config.get('heartbeat_timeout', DEFAULT_HEARTBEAT_TIMEOUT),
+                               max_misses=upstream_config.get('heartbeat_misses', DEFAULT_MAX_MISSES),
+                               on_change=lambda leader_node, epoch: on_leader_change(leader_node, epoch),
+                               epoch=leader_state.get('epoch', 0))
+
+# initializing the request trace recorder if a trace file is given
+trace_recorder = TraceRecorder(args.trace) if args.trace else None
+
+# function to note the arrival time of a request for the trace
+@app.before_request
+def start_trace():
+    if trace_recorder is not None:
+        g.arrival_time = time.time()
+        g.start_time = time.perf_counter()
+
+# function to record a served lookup, trade or order info request in the trace
+@app.after_request
+def record_trace(response):
+    route = TRACED_ROUTES.get(request.endpoint)
+    if trace_recorder is None or route is None:
+        return response
+    latency = time.perf_counter() - g.start_time
+    if route == 'trade':
+        payload = request.get_json(silent=True)
+        number = trade_number(response.get_json(silent=True)) if response.status_code == 200 else None
+        trace_recorder.record(g.arrival_time, route, (payload or {}).get('name'), response.status_code, latency,
+                              payload, number)
+    else:
+        subject = request.view_args.get('stock_name', request.view_args.get('order_number'))
+        trace_recorder.record(g.arrival_time, route, subject, response.status_code, latency)
+    return response
+
+# error handler to answer the shed requests fast with 503 and a Retry-After header
+@app.errorhandler(AdmissionRejected)
+def request_shed(error):
+    return shed_response(), 503, {'Retry-After': str(error.retry_after)}
+
+# error handler to answer with 504 when an upstream accepted the call but did not answer in time
+# (the call may have been applied, so it is not sent again)
+@app.errorhandler(requests.Timeout)
+def upstream_timeout(error):
+    return upstream_error_response(504, 'Upstream service timed out'), 504
+
+# error handler to answer with 502 when an upstream could not be reached or sent an invalid response
+@app.errorhandler(requests.RequestException)
+def upstream_failed(error):
+    return upstream_error_response(502, 'Upstream service unavailable'), 502
 
 # API endpoint to handle lookup requests
 @app.get("/catalog/<stock_name>")
 def catalog_lookup(stock_name):
-
-    # acquring read lock as we are reading the caching data as its a shared DS
-    with read_lock:
-        if stock_name in caching and config['cache']:
-            # if stock name is in cache, then reading it from the cache and directly returning it
-            # whenever reading the cache, we are updating time for LRU eviction policy
-            caching[stock_name]['last_access'] = time.time()
-            response = caching[stock_name]['value']
+    if config['cache']:
+        # if stock name is in cache, then reading it from the cache and directly returning it
+        response = caching.get(stock_name)
+        if response is not None:
             return response
-    
-    # reading catalog config
-    catalog_host = config['catalog']['host']
-    catalog_port = str(config['catalog']['port'])
 
     # setting content type headers
     headers = {
         'Content-Type': 'application/json'
     }
 
-    # constructing the url
-    url = 'http://'+catalog_host+':'+catalog_port+'/catalog/'+stock_name
-
-    # calling the catalog API with requests module
-    result = requests.get(url, headers=headers)
+    # calling the catalog API with the pooled catalog client, cache misses go through admission control
+    with admission.admit('lookup'):
+        result = catalog_client.get('/catalog/'+stock_name, headers=headers)
     # reading the json response
-    res_json = result.json()
-    response = {}
+    response = lookup_response(result.status_code, result.json())
 
     # reading the status code
     if result.status_code == 200:
-        # constructing the response with top level data object
-        response['data'] = res_json
-        # acquiring write lock as we are updating the cache
-        with write_lock:
-            if len(caching) >= MAX_CACHE_SIZE:
-                # if the length of the cache is more than the max size, then we are evicting a key that is 
-                # least recently used (LRU policy)
-                lru_key = min(caching, key=lambda k: caching[k]['last_access'])
-                del caching[lru_key]
-            # updating the cache value for the stock name
-            caching[stock_name] = {'value': response, 'last_access': time.time()}
+        # updating the cache value for the stock name, unless a newer version was pushed meanwhile
+        if config['cache']:
+            caching.put(stock_name, response, catalog_version(result.headers))
         # returning response
         return response
     else:
-        # if there is error, then constructing error object with top level error field
-        error = {}
-        error['message'] = res_json['error']
-        error['code'] = result.status_code
-        response['error'] = error
         return response, result.status_code
 
 # API endpoint to handle the trade requests
@@ -87,8 +163,15 @@ def catalog_lookup(stock_name):
 def trade_API():
     # reading the json data from request payload
     data = request.get_json()
+    with admission.admit('trade'):
+        return handle_trade(data)
+
+# function to handle a trade request once it is admitted
+def handle_trade(data):
+    # reading the leader currently chosen by the background leader monitor
+    leader_node, epoch = leader_monitor.current()
     # reading response from trade function call
-    response, error = trade(data)
+    response, error = trade(data, leader_node)
 
     if not error:
         # if not error, returning 200 ok response
@@ -98,10 +181,12 @@ def trade_API():
         return response, status_code
     else:
         # if there is any error, that means leader node is crashed, so re-electing the leader again
-        voting_result = elect_order_leader()
+        voting_result = elect_order_leader(leader_node)
         if voting_result:
             # if voting result is successful, then calling the trade function again with the same trade data
-            response, error = trade(data) 
+            leader_node, epoch = leader_monitor.current()
+            response, error = trade(data, leader_node)
+        if voting_result and not error:
             # returning the response received from the trade
             status_code = response['code']
             del response['code']
@@ -109,53 +194,44 @@ def trade_API():
         else:
             # if error occurs then there is no order node avaiable to handle the trade requests
             # so returning with 500 error code and appropriate message
-            error = {}
-            error['message'] = 'No Order replicas found to handle trade requests'
-            error['code'] = 500
-            response['error'] = error
-            return response, 500
+            return no_replicas_response(), 500
 
 # function to hanlde trade API calls
-def trade(payload):
+def trade(payload, leader_node):
+    if leader_node is None:
+        # no order node is alive at the moment
+        return {}, True
     # reading the leader details
-    host = leader_node['host']
     port = str(leader_node['port'])
+    client = order_clients[leader_node['id']]
     # setting the content type headers
     headers = {
         'Content-Type': 'application/json'
     }
-    # constructing the url
-    url = 'http://'+host+':'+port+'/orders'
 
-    response = {}
     try:
-        # calling the API with requests module
-        result = requests.post(url, json=payload,headers=headers)
-        # reading the json response
-        res_json = result.json()
-        if result.status_code == 200:
-            # if 200 response, then returning it
-            response['data'] = res_json
-            response['code'] = 200
-            return response, False
-        else:
-            # if not 200, then returning with error field at top level
-            error = {}
-            error['message'] = res_json['error']
-            error['code'] = result.status_code
-            response['error'] = error
-            response['code'] = result.status_code
-            return response, False
-    except:
-        # if a request fails, then throwing error to retry on other nodes
+        # calling the API with the pooled client of the leader node
+        result = client.post('/orders', json=payload, headers=headers)
+    except requests.ConnectionError:
+        # only a failed connection means the leader is down, then the trade is retried on other nodes
+        # (a read timeout propagates: the leader may have stored the order, so it is not sent again)
         print("leader order request failed running on", port)
-        return response, True
+        return {}, True
+    # reading the json response
+    return trade_response(result.status_code, result.json()), False
 
 # API endpoint to get order info by order number
 @app.get("/orders/<order_number>")
 def order_info_API(order_number):
+    with admission.admit('order_read'):
+        return handle_order_info(order_number)
+
+# function to handle an order info request once it is admitted
+def handle_order_info(order_number):
+    # reading the leader currently chosen by the background leader monitor
+    leader_node, epoch = leader_monitor.current()
     # getting the rwsponse from the order info function
-    response, error = get_order_info(order_number)
+    response, error = get_order_info(order_number, leader_node)
     if not error:
         # if no error, then returning the order response received
         status_code = response['code']
@@ -164,10 +240,12 @@ def order_info_API(order_number):
         return response, status_code
     else:
         # if error, then the leader node is crashed, so re-elect the leader again
-        voting_result = elect_order_leader()
+        voting_result = elect_order_leader(leader_node)
         if voting_result:
             # if voting result is successful, then calling the order info function again with the same order id
-            response, error = get_order_info(order_number) 
+            leader_node, epoch = leader_monitor.current()
+            response, error = get_order_info(order_number, leader_node)
+        if voting_result and not error:
             status_code = response['code']
             # returning the response as received
             del response['code']
@@ -175,104 +253,65 @@ def order_info_API(order_number):
         else:
             # if error occurs then there is no order node avaiable to handle the get order info requests
             # so returning with 500 error code and appropriate message
-            error = {}
-            error['message'] = 'No Order replicas found to handle trade requests'
-            error['code'] = 500
-            response['error'] = error
-            return response, 500
+            return no_replicas_response(), 500
 
 # function to handle the order info API calls
-def get_order_info(order_number):
+def get_order_info(order_number, leader_node):
+    if leader_node is None:
+        # no order node is alive at the moment
+        return {}, True
     # reading the leader node details
-    host = leader_node['host']
-    port = str(leader_node['port'])
-
-    # constructing the url
-    url = 'http://'+host+':'+port+'/orders/'+order_number
-    result = {}
+    client = order_clients[leader_node['id']]
 
     try:
-        # calling the API with requests module
-        response = requests.get(url)
-        # reading the json data from the response
-        res_json = response.json()
-
-        if response.status_code == 200:
-            # if 200 success, then constructing the response as given in the lab readme
-            del res_json['trading_volume']
-            res_json['number'] = res_json['transaction_number']
-            del res_json['transaction_number']
-            result['data'] = res_json
-            result['code'] = response.status_code
-            return result, False
-        else:
-            # if error occurs, then constructing the error object as told
-            status_code = res_json['code']
-            result['error'] = res_json
-            result['code'] = status_code
-            return result, False
-    except:
-        # if a request fails, then throwing error to retry on other nodes
-        return result, True
-
-# API endpoint to invalidate the cache
+        # calling the API with the pooled client of the leader node
+        response = client.get('/orders/'+order_number)
+    except requests.ConnectionError:
+        # if the leader is down, then throwing error to retry on other nodes
+        return {}, True
+    # reading the json data from the response
+    return order_info_response(response.status_code, response.json()), False
+
+# function to read the catalog version of a lookup response, None if the catalog does not send it
+def catalog_version(headers):
+    return parse_version(headers.get('X-Catalog-Version'))
+
+# API endpoint to refresh or invalidate the cache
 @app.post("/cache")
 def invalidate_cache():
     # reding the json data from the request payload
     data = request.get_json()
     stock_name = data['name']
-    # reading the stock name
-    print("caching before deletion: ", caching)
-    # acquiring the write lock as we are accessing the shared DS
-    with write_lock:
-        # if stock name is found then deleting it from the cache
-        if stock_name in caching:
-            print("deleting ", stock_name, " from cache")
-            del caching[stock_name]
-    
-    print("caching after deletion: ", caching)
+    if 'version' in data:
+        # the catalog pushed the updated item, replacing the cached entry if the version is newer
+        refreshed = caching.refresh(stock_name, lookup_response(200, data['data']), parse_version(data['version']))
+        return jsonify({'status': 'ok', 'refreshed': refreshed})
+    # if stock name is found then deleting it from the cache
+    if caching.delete(stock_name):
+        print("deleting ", stock_name, " from cache")
+    print("caching after deletion: ", caching.keys())
     # return json 200 ok response
     return jsonify({'status': 'ok'})
 
-# function to hanlde leader election
-def elect_order_leader():
-    # reading order nodes from the config
-    order_nodes = config['order']['nodes']
-    # soritng the nodes based on the id
-    order_nodes = sorted(order_nodes, key=lambda x: x["id"], reverse=True)
-    found = None
-    global leader_node
-
-    # looping through the order nodes
-    for node in order_nodes:
-        # reading the host and port
-        host = node['host']
-        port = str(node['port'])
-
-        # constructing the url
-        url = 'http://'+host+':'+port+'/ping'
-        try:
-            # calling API with requests module
-            result = requests.get(url)
-            # stroign the leader node info if found
-            leader_node_id = node['id']
-            found = True
-            leader_node = node
-            # notifying the other nodes if a leader is elected
-            notify_nodes(order_nodes,leader_node_id)
-
-            # updating the leader id in the config
-            config['order']['leader_id'] = leader_node_id
-            # acquring write lock
-            with write_lock:
-                # updating the config file
-                with open('../config.json', 'w') as file:
-                    json.dump(config, file)
-            break
-        except:
-            # if the request to a node failed
-            print("request failed for order service on ", node['port'])
-    
+# API endpoint to expose the per upstream latency and error counters and the leader state
+@app.get("/metrics")
+def metrics():
+    upstreams = {}
+    upstreams[catalog_client.name] = catalog_client.stats()
+    for client in order_clients.values():
+        upstreams[client.name] = client.stats()
+    result = {'upstreams': upstreams, 'leader': leader_monitor.stats(), 'admission': admission.stats()}
+    if trace_recorder is not None:
+        result['trace'] = trace_recorder.stats()
+    return jsonify(result)
+
+# function to hanlde leader election when a request to the given leader failed
+# the background leader monitor usually switched leaders already, otherwise it fails over
+# to the next node known to be alive without pinging the nodes one by one
+def elect_order_leader(failed_node):
+    if failed_node is not None:
+        print("request failed for order service on ", failed_node['port'])
+    found = leader_monitor.report_failure(failed_node['id'] if failed_node else None)
     if not found:
         # if no node is found, then retrning 
         print("No order services available")
@@ -280,39 +319,110 @@ def elect_order_leader():
     else:
         return True
 
+# function called by the leader monitor (on its own thread) whenever a new leader is chosen
+def on_leader_change(leader_node, epoch):
+    print("order leader elected: ", leader_node['id'], " epoch: ", epoch)
+    # updating the leader id in the in memory config
+    config['order']['leader_id'] = leader_node['id']
+    # persisting the leader state asynchronously
+    leader_state_file.save(leader_node['id'], epoch)
+    # notifying the other nodes about the elected leader
+    notify_nodes(config['order']['nodes'], leader_node['id'], epoch)
+
 # function to notify the nodes about the leader
-def notify_nodes(order_nodes, leader_node_id):
+def notify_nodes(order_nodes, leader_node_id, epoch):
     data = {}
     # constructing the json payload
     data['leader_id'] = leader_node_id
+    data['epoch'] = epoch
     # setting content type headers
     headers = {
         'Content-Type': 'application/json'
     }
 
-    # looping throught the order nodes
-    for node in order_nodes:
-        # reading the host , port
-        host = node['host']
-        port = str(node['port'])
-
-        # constructing the url
-        url = 'http://'+host+':'+port+'/notify_leader'
+    # function to notify a single node
+    def notify(node):
         try:
-            # calling API with requests module
-            result = requests.post(url, json=data, headers=headers)
+            # calling API with the pooled client of the node
+            result = order_clients[node['id']].post('/notify_leader', json=data, headers=headers)
         except:
             # if a request failed on the current node
             print("request failed for notify leader on ", node['port'])
-        
+            return
+        # a node that knows a newer epoch ignores the notification, the leader is announced again above it
+        reply = result.json()
+        if reply.get('status') == 'stale':
+            print("stale leader notification on ", node['port'], " node epoch: ", reply['epoch'])
+            leader_monitor.reannounce(reply['epoch'])
+
+    # notifying all the order nodes in parallel and waiting for all of them
+    list(notify_pool.map(notify, order_nodes))
+
+# function to fill the cache with the most popular symbols of the last snapshot before serving requests
+# the symbols are read with a single bulk lookup to the catalog along with their versions
+def warm_up_cache():
+    snapshot = cache_snapshot_file.load()
+    if snapshot is None:
+        print("no cache snapshot found, skipping warm-up")
+        return 0
+    # restoring the access counts so that the popularity survives the restart
+    caching.restore(snapshot)
+    stock_names = caching.popular(MAX_CACHE_SIZE)
+
+    if not stock_names:
+        return 0
+
+    try:
+        result = catalog_client.post('/catalog/lookup', json={'names': stock_names})
+    except:
+        print("warm-up lookup failed")
+        return 0
+    if result.status_code != 200:
+        print("warm-up lookup failed with status ", result.status_code)
+        return 0
+    data = result.json()
+    versions = data.get('versions', {})
+    loaded = 0
+    for stock_name, item in data['data'].items():
+        # an entry already replaced by a newer version (cache update during the warm-up) is kept
+        if caching.put(stock_name, lookup_response(200, item), parse_version(versions.get(stock_name)), access=False):
+            loaded += 1
+    print("cache warmed up with ", loaded, " symbols: ", caching.keys())
+    return loaded
+
 # function to run the flask application on given port and listen on given host
 def run_flask_app(host, port):
     app.run(host=host, port=port)
 
 if __name__ == '__main__':
-    # electing the leaders on start
-    elect_order_leader()
-    # submitting each request to thread with target as run flask app
-    thread = threading.Thread(target=run_flask_app, args=('0.0.0.0',args.port,))
-    # starting the thread
-    thread.start()
\ No newline at end of file
+    # continuing from the epoch known by the order nodes (the state file may be missing or older), then
+    # electing the leader on start with a first heartbeat round and heartbeating in the background
+    leader_monitor.adopt_epoch()
+    leader_monitor.heartbeat()
+    leader_monitor.start()
+    if config['cache']:
+        if args.warm_up:
+            warm_up_cache()
+        cache_snapshot_file.start()
+    if args.mode == 'async':
+        # running the asyncio gateway with the same cache and leader monitor
+        from async_app import run_async_app
+        run_async_app('0.0.0.0', args.port, config, caching, leader_monitor, admission, trace_recorder)
+    else:
+        # submitting each request to thread with target as run flask app
+        # (as a daemon thread so that ctrl+c in the main thread stops the server)
+        thread = threading.Thread(target=run_flask_app, args=('0.0.0.0',args.port,), daemon=True)
+        # starting the thread
+        thread.start()
+        # keeping the main thread alive, the thread pools used by the leader monitor and the
+        # notifications refuse new work once the main thread has exited
+        try:
+            thread.join()
+        except KeyboardInterrupt:
+            pass
+    if config['cache']:
+        # writing a last snapshot on shutdown
+        cache_snapshot_file.stop()
+    if trace_recorder is not None:
+        # writing the requests still queued for the trace
+        trace_recorder.flush()
\ No newline at end of file
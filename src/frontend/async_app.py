@@ -0,0 +1,188 @@
+import asyncio
+import json
+import time
+import aiohttp
+from aiohttp import web
+from upstream import AsyncUpstreamClient, DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT
+from responses import lookup_response, trade_response, order_info_response, no_replicas_response, shed_response, \
+    upstream_error_response
+from admission import AdmissionRejected
+from tracing import trade_number
+from cache import parse_version
+
+# asyncio gateway mode of the frontend: same routes, cache and leader failover as the flask app,
+# but every in-flight request is a coroutine waiting on a non blocking upstream call instead of a thread
+
+# default number of connections kept per upstream in async mode
+DEFAULT_ASYNC_CONNECTIONS = 100
+
+# errors meaning that the leader could not be reached, aiohttp only tells connect timeouts apart from 3.10
+CONNECT_ERRORS = (aiohttp.ClientConnectorError, aiohttp.ServerDisconnectedError) + \
+    ((aiohttp.ConnectionTimeoutError,) if hasattr(aiohttp, 'ConnectionTimeoutError') else ())
+
+# function to build the aiohttp application around the shared cache, leader monitor and admission control
+# (and the optional request trace recorder)
+def create_app(config, caching, leader_monitor, admission, trace_recorder=None):
+    upstream_config = config.get('upstream', {})
+    connections = upstream_config.get('async_connections', DEFAULT_ASYNC_CONNECTIONS)
+    connect_timeout = upstream_config.get('connect_timeout', DEFAULT_CONNECT_TIMEOUT)
+    read_timeout = upstream_config.get('read_timeout', DEFAULT_READ_TIMEOUT)
+
+    # initializing one non blocking client for the catalog and one for each order node (keyed by node id)
+    catalog_client = AsyncUpstreamClient('catalog', config['catalog']['host'], config['catalog']['port'],
+                                         connections, connect_timeout, read_timeout)
+    order_clients = {}
+    for node in config['order']['nodes']:
+        order_clients[node['id']] = AsyncUpstreamClient('order-'+str(node['id']), node['host'], node['port'],
+                                                        connections, connect_timeout, read_timeout)
+    clients = [catalog_client] + list(order_clients.values())
+
+    # function to call the current leader and to fail over once to the next leader if it cannot be reached
+    # (a read timeout propagates: the leader may have applied the call, so it is not sent again)
+    async def call_leader(method, path, **kwargs):
+        for attempt in range(2):
+            leader_node, epoch = leader_monitor.current()
+            if leader_node is None:
+                break
+            try:
+                return await order_clients[leader_node['id']].request(method, path, **kwargs)
+            except CONNECT_ERRORS as e:
+                print("leader order request failed running on", leader_node['port'], e)
+                # reporting the failure may run a heartbeat round, so it runs off the event loop
+                loop = asyncio.get_running_loop()
+                found = await loop.run_in_executor(None, leader_monitor.report_failure, leader_node['id'])
+                if not found:
+                    print("No order services available")
+                    break
+        return None
+
+    # API endpoint to handle lookup requests
+    async def catalog_lookup(request):
+        stock_name = request.match_info['stock_name']
+        if config['cache']:
+            # if stock name is in cache, then reading it from the cache and directly returning it
+            response = caching.get(stock_name)
+            if response is not None:
+                return web.json_response(response)
+
+        # cache misses go through admission control
+        async with admission.admit_async('lookup'):
+            status_code, res_json, headers = await catalog_client.get('/catalog/'+stock_name)
+        version = parse_version(headers.get('X-Catalog-Version'))
+        response = lookup_response(status_code, res_json)
+        if status_code == 200 and config['cache']:
+            # updating the cache value for the stock name, unless a newer version was pushed meanwhile
+            caching.put(stock_name, response, version)
+        return web.json_response(response, status=status_code)
+
+    # API endpoint to handle the trade requests
+    async def trade_API(request):
+        data = await request.json()
+        async with admission.admit_async('trade'):
+            result = await call_leader('POST', '/orders', json=data)
+        if result is None:
+            # there is no order node avaiable to handle the trade requests
+            return web.json_response(no_replicas_response(), status=500)
+        response = trade_response(result[0], result[1])
+        status_code = response.pop('code')
+        return web.json_response(response, status=status_code)
+
+    # API endpoint to get order info by order number
+    async def order_info_API(request):
+        order_number = request.match_info['order_number']
+        async with admission.admit_async('order_read'):
+            result = await call_leader('GET', '/orders/'+order_number)
+        if result is None:
+            return web.json_response(no_replicas_response(), status=500)
+        response = order_info_response(result[0], result[1])
+        status_code = response.pop('code')
+        return web.json_response(response, status=status_code)
+
+    # API endpoint to refresh or invalidate the cache
+    async def invalidate_cache(request):
+        data = await request.json()
+        if 'version' in data:
+            # the catalog pushed the updated item, replacing the cached entry if the version is newer
+            refreshed = caching.refresh(data['name'], lookup_response(200, data['data']),
+                                        parse_version(data['version']))
+            return web.json_response({'status': 'ok', 'refreshed': refreshed})
+        if caching.delete(data['name']):
+            print("deleting ", data['name'], " from cache")
+        return web.json_response({'status': 'ok'})
+
+    # API endpoint to expose the per upstream latency and error counters and the leader state
+    async def metrics(request):
+        upstreams = {client.name: client.stats() for client in clients}
+        result = {'upstreams': upstreams, 'leader': leader_monitor.stats(), 'admission': admission.stats()}
+        if trace_recorder is not None:
+            result['trace'] = trace_recorder.stats()
+        return web.json_response(result)
+
+    # middleware to answer the shed requests fast with 503 and a Retry-After header
+    @web.middleware
+    async def shed_requests(request, handler):
+        try:
+            return await handler(request)
+        except AdmissionRejected as error:
+            return web.json_response(shed_response(), status=503,
+                                     headers={'Retry-After': str(error.retry_after)})
+
+    # middleware to answer with 504 when an upstream did not answer in time and with 502 when it could not be
+    # reached or sent an invalid response (a body that is not json raises ValueError when it is decoded)
+    @web.middleware
+    async def upstream_errors(request, handler):
+        try:
+            return await handler(request)
+        except asyncio.TimeoutError:
+            return web.json_response(upstream_error_response(504, 'Upstream service timed out'), status=504)
+        except (aiohttp.ClientError, ValueError):
+            return web.json_response(upstream_error_response(502, 'Upstream service unavailable'), status=502)
+
+    # routes recorded in the trace, keyed by handler
+    traced_routes = {catalog_lookup: 'lookup', trade_API: 'trade', order_info_API: 'order_read'}
+
+    # middleware to record the served lookup, trade and order info requests in the trace
+    @web.middleware
+    async def record_trace(request, handler):
+        route = traced_routes.get(request.match_info.handler)
+        if route is None:
+            return await handler(request)
+        arrival_time = time.time()
+        start_time = time.perf_counter()
+        response = await handler(request)
+        latency = time.perf_counter() - start_time
+        if route == 'trade':
+            payload = await request.json()
+            number = trade_number(json.loads(response.body)) if response.status == 200 else None
+            trace_recorder.record(arrival_time, route, payload.get('name'), response.status, latency, payload, number)
+        else:
+            subject = request.match_info.get('stock_name', request.match_info.get('order_number'))
+            trace_recorder.record(arrival_time, route, subject, response.status, latency)
+        return response
+
+    async def open_clients(app):
+        for client in clients:
+            await client.open()
+
+    async def close_clients(app):
+        for client in clients:
+            await client.close()
+
+    middlewares = [shed_requests, upstream_errors]
+    if trace_recorder is not None:
+        # the trace middleware runs first so that the shed requests are recorded too
+        middlewares.insert(0, record_trace)
+    app = web.Application(middlewares=middlewares)
+    app.router.add_get('/catalog/{stock_name}', catalog_lookup)
+    app.router.add_post('/orders', trade_API)
+    app.router.add_get('/orders/{order_number}', order_info_API)
+    app.router.add_post('/cache', invalidate_cache)
+    app.router.add_get('/metrics', metrics)
+    app.on_startup.append(open_clients)
+    app.on_cleanup.append(close_clients)
+    return app
+
+# function to run the asyncio gateway on given port and listen on given host
+def run_async_app(host, port, config, caching, leader_monitor, admission, trace_recorder=None):
+    web.run_app(create_app(config, caching, leader_monitor, admission, trace_recorder), host=host, port=port,
+                print=None)
@@ -0,0 +1,157 @@
+import json
+import os
+import threading
+import time
+
+# default seconds between two snapshots of the cache and the number of access counts kept in a snapshot
+DEFAULT_SNAPSHOT_INTERVAL = 30.0
+DEFAULT_SNAPSHOT_ENTRIES = 100
+
+# function to read a catalog version: "<start id>:<counter>" (header) or [start id, counter] (push),
+# or a plain counter from an older catalog; returns None when there is no version
+# the start id of the catalog process comes first, so the versions of a restarted catalog are newer
+def parse_version(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.split(':')
+    if isinstance(value, (list, tuple)):
+        return tuple(int(part) for part in value) if len(value) == 2 else (0, int(value[0]))
+    return (0, int(value))
+
+# class to hold the lookup cache of the frontend with the LRU eviction policy
+# it is shared between the request threads (threaded mode) and the event loop (async mode)
+# every entry carries the catalog version of the item, an entry is only replaced by a newer version
+class LRUCache:
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.items = {}
+        # highest version seen per key, also for keys that are not cached (or were evicted) so that
+        # a lookup that raced with a trade cannot install an older item afterwards
+        self.versions = {}
+        # number of lookups served per key (cache hits and fills), kept after eviction so that the
+        # most popular symbols can be warmed up after a restart
+        self.access_counts = {}
+        self.lock = threading.Lock()
+
+    # function to check if the given version is older than what was already seen, must be called with the lock held
+    def _is_stale(self, key, version):
+        return version is not None and key in self.versions and version < self.versions[key]
+
+    # function to read a value, returns None if the key is not cached
+    def get(self, key):
+        with self.lock:
+            if key not in self.items:
+                return None
+            # whenever reading the cache, we are updating time for LRU eviction policy
+            self.items[key]['last_access'] = time.time()
+            self.access_counts[key] = self.access_counts.get(key, 0) + 1
+            return self.items[key]['value']
+
+    # function to add or replace a value, returns False if a newer version was already seen
+    # a value without version (older catalog) is always installed, a warm-up fill is not counted as an access
+    def put(self, key, value, version=None, access=True):
+        with self.lock:
+            if self._is_stale(key, version):
+                return False
+            if key not in self.items and len(self.items) >= self.max_size:
+                # if the length of the cache is more than the max size, then we are evicting a key that is
+                # least recently used (LRU policy)
+                lru_key = min(self.items, key=lambda k: self.items[k]['last_access'])
+                del self.items[lru_key]
+            self.items[key] = {'value': value, 'last_access': time.time(), 'version': version}
+            if version is not None:
+                self.versions[key] = version
+            if access:
+                self.access_counts[key] = self.access_counts.get(key, 0) + 1
+            return True
+
+    # function to replace the value of a cached key with a newer version pushed by the catalog
+    # the key is not added if it is not cached, but its version is recorded
+    def refresh(self, key, value, version):
+        with self.lock:
+            if self._is_stale(key, version):
+                return False
+            self.versions[key] = version
+            if key not in self.items:
+                return False
+            self.items[key]['value'] = value
+            self.items[key]['version'] = version
+            return True
+
+    # function to delete a value, returns True if the key was cached
+    def delete(self, key):
+        with self.lock:
+            if key in self.items:
+                del self.items[key]
+                return True
+            return False
+
+    def keys(self):
+        with self.lock:
+            return list(self.items.keys())
+
+    # function to read the given number of most accessed keys, most popular first
+    def popular(self, count):
+        with self.lock:
+            return sorted(self.access_counts, key=lambda k: self.access_counts[k], reverse=True)[:count]
+
+    # function to read the cached keys and the access counts of the most popular keys
+    def snapshot(self, max_entries=DEFAULT_SNAPSHOT_ENTRIES):
+        with self.lock:
+            top = sorted(self.access_counts, key=lambda k: self.access_counts[k], reverse=True)[:max_entries]
+            return {'keys': list(self.items.keys()), 'access_counts': {k: self.access_counts[k] for k in top}}
+
+    # function to add the access counts read from a snapshot to the current counts
+    def restore(self, snapshot):
+        with self.lock:
+            for key, count in snapshot.get('access_counts', {}).items():
+                self.access_counts[key] = self.access_counts.get(key, 0) + count
+
+# class to periodically write the cache snapshot (keys and access counts) to disk on a background thread
+class CacheSnapshotFile:
+    def __init__(self, path, cache, interval=DEFAULT_SNAPSHOT_INTERVAL):
+        self.path = path
+        self.cache = cache
+        self.interval = interval
+        self.last_written = None
+        self.stopped = threading.Event()
+        self.thread = None
+
+    # function to read the persisted snapshot, returns None if there is no snapshot file yet
+    def load(self):
+        try:
+            with open(self.path, 'r') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    # function to write the current snapshot, skipped when nothing changed since the last write
+    def write(self):
+        snapshot = self.cache.snapshot()
+        if snapshot == self.last_written:
+            return False
+        try:
+            # writing to a temporary file and renaming it so readers never see a partial file
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w') as file:
+                json.dump(dict(snapshot, saved_at=time.time()), file)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print("writing cache snapshot failed: ", e)
+            return False
+        self.last_written = snapshot
+        return True
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            self.write()
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    # function to stop the background thread and write a last snapshot
+    def stop(self):
+        self.stopped.set()
+        self.write()
@@ -0,0 +1,201 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# default heartbeat settings (in seconds), a node is considered down after max_misses failed heartbeats
+DEFAULT_HEARTBEAT_INTERVAL = 0.25
+DEFAULT_HEARTBEAT_TIMEOUT = 0.25
+DEFAULT_MAX_MISSES = 2
+
+# class to track the health of the order replicas in the background and to keep the leader choice up to date
+class LeaderMonitor:
+    def __init__(self, nodes, clients, interval=DEFAULT_HEARTBEAT_INTERVAL,
+                 timeout=DEFAULT_HEARTBEAT_TIMEOUT, max_misses=DEFAULT_MAX_MISSES, on_change=None, epoch=0):
+        # nodes are sorted based on the id, the alive node with the highest id is elected as leader
+        self.nodes = sorted(nodes, key=lambda x: x['id'], reverse=True)
+        self.clients = clients
+        self.interval = interval
+        self.timeout = timeout
+        self.max_misses = max_misses
+        # callback called with (leader node, epoch) whenever a new leader is chosen
+        self.on_change = on_change
+
+        self.lock = threading.Lock()
+        self.misses = {node['id']: max_misses for node in self.nodes}
+        self.last_seen = {node['id']: 0.0 for node in self.nodes}
+        self.leader = None
+        # the epoch can be seeded from the persisted state so that it keeps increasing across restarts
+        self.epoch = epoch
+        self.failovers = 0
+        self.last_failover_ms = None
+
+        # one thread per node so that all the replicas are pinged concurrently
+        self.ping_pool = ThreadPoolExecutor(max_workers=len(self.nodes))
+        # callbacks run in order on a separate thread so that they never delay a heartbeat or a request
+        self.notify_pool = ThreadPoolExecutor(max_workers=1)
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    # function to ping a single node with the heartbeat timeout
+    def _ping(self, node):
+        try:
+            response = self.clients[node['id']].get('/ping', timeout=(self.timeout, self.timeout))
+            return response.status_code == 200
+        except Exception:
+            return False
+
+    # function to read the epoch a node was last notified with, None if the node cannot be reached
+    def _read_epoch(self, node):
+        try:
+            response = self.clients[node['id']].get('/leader', timeout=(self.timeout, self.timeout))
+            return response.json()['epoch']
+        except Exception:
+            return None
+
+    # function to raise the epoch to the highest one known by the nodes before the first election, so that
+    # a frontend restarted without its state file is not ignored by the nodes as an older election
+    def adopt_epoch(self):
+        futures = [self.ping_pool.submit(self._read_epoch, node) for node in self.nodes]
+        epochs = [future.result() for future in futures]
+        with self.lock:
+            self.epoch = max([self.epoch] + [epoch for epoch in epochs if epoch is not None])
+            return self.epoch
+
+    # function called when a node rejected the notification of the current leader because it knows a newer
+    # epoch (it was not reachable when the epoch was adopted), the leader is announced again above that epoch
+    def reannounce(self, node_epoch):
+        with self.lock:
+            if self.leader is None or node_epoch < self.epoch:
+                return
+            self.epoch = node_epoch + 1
+            leader, epoch = self.leader, self.epoch
+        if self.on_change:
+            self.notify_pool.submit(self.on_change, leader, epoch)
+
+    def _is_alive(self, node_id):
+        return self.misses[node_id] < self.max_misses
+
+    # function to run one heartbeat round over all the nodes and update the leader choice
+    def heartbeat(self):
+        futures = [(node, self.ping_pool.submit(self._ping, node)) for node in self.nodes]
+        # the pings are awaited without the lock so that current() never waits on a slow node
+        results = [(node, future.result()) for node, future in futures]
+        now = time.time()
+        with self.lock:
+            for node, alive in results:
+                if alive:
+                    self.misses[node['id']] = 0
+                    self.last_seen[node['id']] = now
+                else:
+                    self.misses[node['id']] += 1
+            self._choose_leader()
+
+    # function to choose the leader, must be called with the lock held
+    def _choose_leader(self):
+        # the current leader is kept as long as it is alive, so a recovered node does not take over
+        if self.leader is not None and self._is_alive(self.leader['id']):
+            return
+        previous = self.leader
+        self.leader = None
+        for node in self.nodes:
+            if self._is_alive(node['id']):
+                self.leader = node
+                break
+
+        if self.leader is None or self.leader is previous:
+            return
+        self.epoch += 1
+        if previous is not None:
+            # failover time is measured from the last successful heartbeat of the previous leader
+            self.failovers += 1
+            self.last_failover_ms = (time.time() - self.last_seen[previous['id']]) * 1000
+        if self.on_change:
+            self.notify_pool.submit(self.on_change, self.leader, self.epoch)
+
+    # function to read the current leader and epoch
+    def current(self):
+        with self.lock:
+            return self.leader, self.epoch
+
+    # function called from the request path when a call to the given leader failed
+    # it switches to the next known alive node without any network call, and only if no node is
+    # known to be alive it runs a heartbeat round right away
+    def report_failure(self, node_id):
+        with self.lock:
+            if self.leader is not None and self.leader['id'] == node_id:
+                self.misses[node_id] = self.max_misses
+                self._choose_leader()
+            leader = self.leader
+        if leader is None:
+            self.heartbeat()
+            leader, epoch = self.current()
+        return leader is not None
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            self.heartbeat()
+
+    # function to start the background heartbeat thread
+    def start(self):
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.ping_pool.shutdown(wait=False)
+        self.notify_pool.shutdown(wait=True)
+
+    # function to read the monitor state for the metrics endpoint
+    def stats(self):
+        with self.lock:
+            return {
+                'leader_id': self.leader['id'] if self.leader else None,
+                'epoch': self.epoch,
+                'alive': {str(node_id): self._is_alive(node_id) for node_id in self.misses},
+                'failovers': self.failovers,
+                'last_failover_ms': self.last_failover_ms
+            }
+
+# class to persist the leader state (leader id and epoch) to a small json file in the background
+# so that an election never waits on disk I/O; only the latest state is written
+class LeaderStateFile:
+    def __init__(self, path):
+        self.path = path
+        self.condition = threading.Condition()
+        self.pending = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    # function to read the persisted state, returns None if there is no state file yet
+    def load(self):
+        try:
+            with open(self.path, 'r') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    # function to queue a state to be written, an older state that was not written yet is dropped
+    def save(self, leader_id, epoch):
+        with self.condition:
+            self.pending = {'leader_id': leader_id, 'epoch': epoch}
+            self.condition.notify()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while self.pending is None:
+                    self.condition.wait()
+                state = self.pending
+                self.pending = None
+            try:
+                # writing to a temporary file and renaming it so readers never see a partial file
+                tmp_path = self.path + '.tmp'
+                with open(tmp_path, 'w') as file:
+                    json.dump(state, file)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                print("writing leader state failed: ", e)
@@ -0,0 +1,69 @@
+# functions to build the frontend responses from the upstream responses
+# they are shared by the threaded (flask) and the async gateway so both return the same payloads
+
+# function to build the lookup response from the catalog status code and json body
+def lookup_response(status_code, res_json):
+    response = {}
+    if status_code == 200:
+        # constructing the response with top level data object
+        response['data'] = res_json
+    else:
+        # if there is error, then constructing error object with top level error field
+        error = {}
+        error['message'] = res_json['error']
+        error['code'] = status_code
+        response['error'] = error
+    return response
+
+# function to build the trade response from the order leader status code and json body
+def trade_response(status_code, res_json):
+    response = {}
+    if status_code == 200:
+        # if 200 response, then returning it
+        response['data'] = res_json
+        response['code'] = 200
+    else:
+        # if not 200, then returning with error field at top level
+        error = {}
+        error['message'] = res_json['error']
+        error['code'] = status_code
+        response['error'] = error
+        response['code'] = status_code
+    return response
+
+# function to build the order info response from the order leader status code and json body
+def order_info_response(status_code, res_json):
+    result = {}
+    if status_code == 200:
+        # if 200 success, then constructing the response as given in the lab readme
+        del res_json['trading_volume']
+        res_json['number'] = res_json['transaction_number']
+        del res_json['transaction_number']
+        result['data'] = res_json
+        result['code'] = status_code
+    else:
+        # if error occurs, then constructing the error object as told
+        result['error'] = res_json
+        result['code'] = res_json['code']
+    return result
+
+# function to build the response returned when no order replica is reachable
+def no_replicas_response():
+    error = {}
+    error['message'] = 'No Order replicas found to handle trade requests'
+    error['code'] = 500
+    return {'error': error}
+
+# function to build the response returned when a request is shed by the admission control
+def shed_response():
+    error = {}
+    error['message'] = 'Server overloaded, please retry later'
+    error['code'] = 503
+    return {'error': error}
+
+# function to build the response returned when an upstream call timed out (504) or failed (502)
+def upstream_error_response(status_code, message):
+    error = {}
+    error['message'] = message
+    error['code'] = status_code
+    return {'error': error}
@@ -0,0 +1,75 @@
+import json
+import queue
+import threading
+import time
+
+# maximum number of records waiting to be written, records are dropped (and counted) when the writer falls behind
+DEFAULT_TRACE_QUEUE_SIZE = 10000
+
+# routes of the frontend that are recorded, keyed by the flask view function name
+TRACED_ROUTES = {'catalog_lookup': 'lookup', 'trade_API': 'trade', 'order_info_API': 'order_read'}
+
+# class to record the requests served by the frontend to an append-only trace file (one json object per line)
+# every record has compact keys so that long traces stay small:
+#   t: arrival time (unix seconds), r: route (lookup, trade or order_read), s: stock name or order number,
+#   p: trade payload, c: status code, l: latency in milliseconds, n: transaction number returned by a trade
+# the requests only put the record on a queue, a background thread writes them in batches
+class TraceRecorder:
+    def __init__(self, path, queue_size=DEFAULT_TRACE_QUEUE_SIZE):
+        self.path = path
+        self.records = queue.Queue(queue_size)
+        self.recorded = 0
+        self.dropped = 0
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    # function to record a served request, never blocks the request
+    def record(self, arrival_time, route, subject, status_code, latency, payload=None, number=None):
+        item = {'t': round(arrival_time, 6), 'r': route, 's': subject, 'c': status_code, 'l': round(latency * 1000, 3)}
+        if payload is not None:
+            item['p'] = payload
+        if number is not None:
+            item['n'] = number
+        try:
+            self.records.put_nowait(item)
+            accepted = True
+        except queue.Full:
+            accepted = False
+        with self.lock:
+            if accepted:
+                self.recorded += 1
+            else:
+                self.dropped += 1
+
+    def _run(self):
+        with open(self.path, 'a') as file:
+            while True:
+                # waiting for a record and then writing everything queued meanwhile in one go
+                lines = [self.records.get()]
+                while True:
+                    try:
+                        lines.append(self.records.get_nowait())
+                    except queue.Empty:
+                        break
+                file.write(''.join(json.dumps(item, separators=(',', ':')) + '\n' for item in lines))
+                file.flush()
+                for item in lines:
+                    self.records.task_done()
+
+    # function to wait until the queued records are written, used on shutdown
+    def flush(self, timeout=5.0):
+        deadline = time.time() + timeout
+        while self.records.unfinished_tasks and time.time() < deadline:
+            time.sleep(0.01)
+
+    def stats(self):
+        with self.lock:
+            return {'path': self.path, 'recorded': self.recorded, 'dropped': self.dropped}
+
+# function to read the transaction number from the json body of a successful trade response
+def trade_number(body):
+    try:
+        return body['data']['transaction_number']
+    except (KeyError, TypeError):
+        return None
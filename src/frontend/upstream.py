@@ -0,0 +1,119 @@
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+
+# default connect and read timeouts (in seconds) used for every upstream call
+DEFAULT_CONNECT_TIMEOUT = 1.0
+DEFAULT_READ_TIMEOUT = 5.0
+
+# class to hold the per upstream latency and error counters
+class UpstreamCounters:
+    def __init__(self, name):
+        self.name = name
+        # counters are guarded by a lock as they are shared between the request threads
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+
+    # function to record the outcome of a single upstream call
+    def record(self, latency, failed):
+        with self.lock:
+            self.requests += 1
+            self.latency_sum += latency
+            self.latency_max = max(self.latency_max, latency)
+            if failed:
+                self.errors += 1
+
+    # function to read a snapshot of the counters
+    def stats(self):
+        with self.lock:
+            avg_latency = self.latency_sum / self.requests if self.requests else 0.0
+            return {
+                'requests': self.requests,
+                'errors': self.errors,
+                'avg_latency_ms': avg_latency * 1000,
+                'max_latency_ms': self.latency_max * 1000
+            }
+
+# class to hold a pooled keep-alive client towards a single upstream service (catalog or an order node)
+class UpstreamClient(UpstreamCounters):
+    def __init__(self, name, host, port, pool_size=10,
+                 connect_timeout=DEFAULT_CONNECT_TIMEOUT, read_timeout=DEFAULT_READ_TIMEOUT):
+        super().__init__(name)
+        self.base_url = 'http://'+host+':'+str(port)
+        # requests accepts a (connect, read) tuple as timeout
+        self.timeout = (connect_timeout, read_timeout)
+
+        # the pool is sized by the caller with the number of concurrent calls so that each one can hold a connection
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+
+    # function to call the upstream and record the latency and the errors
+    def request(self, method, path, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        start_time = time.time()
+        failed = True
+        try:
+            response = self.session.request(method, self.base_url+path, **kwargs)
+            # server side errors are counted as upstream errors, client errors (404, 400) are not
+            failed = response.status_code >= 500
+            return response
+        finally:
+            self.record(time.time() - start_time, failed)
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def put(self, path, **kwargs):
+        return self.request('PUT', path, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+# class to hold a non blocking pooled client towards a single upstream, used by the asyncio gateway
+class AsyncUpstreamClient(UpstreamCounters):
+    def __init__(self, name, host, port, pool_size=100,
+                 connect_timeout=DEFAULT_CONNECT_TIMEOUT, read_timeout=DEFAULT_READ_TIMEOUT):
+        super().__init__(name)
+        self.base_url = 'http://'+host+':'+str(port)
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.session = None
+
+    # function to create the session, it has to be called from the running event loop
+    async def open(self):
+        # aiohttp is only needed by the async gateway, so it is imported here
+        import aiohttp
+        connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=30)
+        timeout = aiohttp.ClientTimeout(sock_connect=self.connect_timeout, sock_read=self.read_timeout)
+        self.session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+    # function to call the upstream, returns the status code, the decoded json body and the headers
+    async def request(self, method, path, **kwargs):
+        start_time = time.time()
+        failed = True
+        try:
+            async with self.session.request(method, self.base_url+path, **kwargs) as response:
+                body = await response.json(content_type=None)
+                failed = response.status >= 500
+                return response.status, body, response.headers
+        finally:
+            self.record(time.time() - start_time, failed)
+
+    async def get(self, path, **kwargs):
+        return await self.request('GET', path, **kwargs)
+
+    async def post(self, path, **kwargs):
+        return await self.request('POST', path, **kwargs)
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
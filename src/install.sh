@@ -12,4 +12,5 @@ sudo apt-get install python3.7
 
 sudo update-alternatives --install /usr/bin/python3 python3 /usr/bin/python3.7 1
 
-pip3 install Flask
\ No newline at end of file
+pip3 install Flask
+pip3 install requests aiohttp
\ No newline at end of file
@@ -1,23 +1,104 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
+import argparse
 import json
+import time
 import requests
 import numpy as np
-import pandas as pd
-from models.price_predictor import StockPricePredictor
-from models.recommender import StockRecommender
-from models.anomaly_detector import TradingAnomalyDetector
+from serving.lazy import LazyModel
+from serving.prediction_cache import PredictionCache
+from serving.micro_batcher import MicroBatcher
+from serving.model_manager import ModelManager
+from serving.prefork import PreforkServer
+from serving.recommendation_store import RecommendationStore
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--port', type=int, default=6000, help='port number')
+parser.add_argument('--warm-up', action='store_true',
+                    help='import the frameworks and build the models before serving instead of on first use')
+parser.add_argument('--workers', type=int, default=1,
+                    help='number of forked worker processes sharing the models loaded before forking')
+args = parser.parse_args()
 
 app = Flask(__name__)
 
-# Initialize ML models
-price_predictor = StockPricePredictor()
-stock_recommender = StockRecommender()
-anomaly_detector = TradingAnomalyDetector()
+# The models import TensorFlow, scikit-learn and pandas, so they are only built on first use
+def create_price_predictor():
+    # Weights exported with models/numpy_lstm.py are served by the NumPy forward pass, without TensorFlow
+    numpy_weights = config.get('ml_service', {}).get('numpy_weights')
+    if numpy_weights:
+        from models.numpy_lstm import NumpyLSTMPredictor
+        return NumpyLSTMPredictor.from_file(numpy_weights)
+    from models.price_predictor import StockPricePredictor
+    return StockPricePredictor()
+
+def create_recommender():
+    from models.recommender import StockRecommender
+    return StockRecommender()
+
+def create_anomaly_detector():
+    from models.anomaly_detector import TradingAnomalyDetector
+    return TradingAnomalyDetector()
+
+price_predictor = LazyModel('price_predictor', create_price_predictor)
+stock_recommender = LazyModel('recommender', create_recommender)
+anomaly_detector = LazyModel('anomaly_detector', create_anomaly_detector)
+lazy_models = [price_predictor, stock_recommender, anomaly_detector]
 
 # Load configuration
 with open('../config.json', 'r') as file:
     config = json.load(file)
 
+# Cache of price predictions keyed by symbol, input window and model version
+cache_config = config.get('ml_service', {}).get('prediction_cache', {})
+prediction_cache = PredictionCache(max_size=cache_config.get('max_size', 1024),
+                                   ttl=cache_config.get('ttl', 60.0))
+
+# Concurrent single symbol predictions are run together in one forward pass
+batch_config = config.get('ml_service', {}).get('micro_batch', {})
+# Confidence comes from Monte Carlo dropout, mc_dropout_samples stochastic passes run as one batch
+mc_dropout_samples = config.get('ml_service', {}).get('mc_dropout_samples', 10)
+
+def predict_windows(predictor, windows):
+    # (prediction, samples mean, samples standard deviation) of every window, the prediction is the deterministic
+    # forward pass; no samples when Monte Carlo dropout is disabled or the model has no dropout layer to sample
+    predictions = predictor.predict_batch(windows)
+    if mc_dropout_samples > 1 and predictor.has_dropout():
+        means, deviations = predictor.predict_with_uncertainty(windows, mc_dropout_samples)
+        return list(zip(predictions, means, deviations))
+    return [(prediction, None, None) for prediction in predictions]
+
+def prediction_result(stock_name, window, prediction, mean, deviation):
+    result = {
+        'stock_name': stock_name,
+        'predicted_price': float(prediction),
+        'confidence': None,
+        'uncertainty': None,
+        'interval': None
+    }
+    if deviation is not None:
+        # 95% interval of the stochastic passes, the confidence is one minus its half width relative to the
+        # price range of the input window, so that it does not depend on the price level of the symbol
+        half_width = 1.96 * float(deviation)
+        price_range = float(np.max(window) - np.min(window))
+        result['uncertainty'] = float(deviation)
+        result['interval'] = [float(mean) - half_width, float(mean) + half_width]
+        result['confidence'] = max(0.0, 1.0 - half_width / price_range) if price_range > 0 else None
+    return result
+
+prediction_batcher = MicroBatcher(lambda windows: predict_windows(price_predictor.get(), windows),
+                                  max_batch_size=batch_config.get('max_batch_size', 32),
+                                  max_wait=batch_config.get('max_wait_ms', 5) / 1000.0)
+
+# Trained model versions are loaded from the registry in the background and swapped in while serving
+def create_registry():
+    from models.model_registry import ModelRegistry
+    return ModelRegistry(config.get('ml_service', {}).get('model_registry_path', 'model_registry'))
+
+model_manager = ModelManager({model.name: model for model in lazy_models}, create_registry)
+
+# With --workers every worker has its own copy of the models, the swaps are relayed to all of them
+prefork_server = None
+
 # API endpoint for price predictions
 @app.get("/ml/predictions/<stock_name>")
 def get_price_prediction(stock_name):
@@ -34,79 +115,327 @@ def get_price_prediction(stock_name):
         stock_data = response.json()
         historical_prices = np.array(stock_data['data']['prices'])
         
-        # Make prediction
-        prediction = price_predictor.predict(historical_prices)
+        predictor = price_predictor.get()
+        if len(historical_prices) < predictor.sequence_length:
+            return jsonify({'error': f'at least {predictor.sequence_length} prices are required'}), 400
+
+        # Reuse the prediction if the input window and the model did not change
+        window = historical_prices[-predictor.sequence_length:]
+        cache_key = prediction_cache.key(stock_name, window, (price_predictor.generation, predictor.version))
+        result = prediction_cache.get(cache_key)
+        if result is None:
+            # Make prediction, batched with the other requests in flight
+            prediction, mean, deviation = prediction_batcher.submit(window)
+            result = prediction_result(stock_name, window, prediction, mean, deviation)
+            prediction_cache.put(cache_key, result)
         
-        return jsonify({
-            'stock_name': stock_name,
-            'predicted_price': float(prediction),
-            'confidence': 0.85  # This could be calculated based on model metrics
-        })
+        return jsonify(result)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-# API endpoint for stock recommendations
-@app.get("/ml/recommendations")
-def get_recommendations():
+# API endpoint for batched price predictions of many symbols
+@app.post("/ml/predictions")
+def get_batch_price_predictions():
     try:
-        user_id = request.args.get('user_id')
-        if not user_id:
-            return jsonify({'error': 'user_id is required'}), 400
-            
-        # Get user history from order service
-        order_host = config['order']['nodes'][0]['host']
-        order_port = str(config['order']['nodes'][0]['port'])
-        url = f'http://{order_host}:{order_port}/orders/user/{user_id}'
-        
-        response = requests.get(url)
-        if response.status_code != 200:
-            return jsonify({'error': 'Failed to fetch user history'}), 400
-            
-        user_history = response.json()
-        
-        # Get stock data from catalog service
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'error': 'request body must be a json object'}), 400
+        symbols = data.get('symbols')
+        if not isinstance(symbols, list) or not symbols:
+            return jsonify({'error': 'symbols must be a non empty list'}), 400
+        max_symbols = config.get('ml_service', {}).get('max_batch_symbols', 1000)
+        if len(symbols) > max_symbols:
+            return jsonify({'error': f'at most {max_symbols} symbols per request'}), 400
+        symbols = list(dict.fromkeys(symbols))
+
+        # Get the inputs of all the symbols with one bulk catalog call
         catalog_host = config['catalog']['host']
         catalog_port = str(config['catalog']['port'])
-        url = f'http://{catalog_host}:{catalog_port}/catalog/all'
-        
-        response = requests.get(url)
+        url = f'http://{catalog_host}:{catalog_port}/catalog/lookup'
+
+        response = requests.post(url, json={'names': symbols})
         if response.status_code != 200:
             return jsonify({'error': 'Failed to fetch stock data'}), 400
-            
+
         stock_data = response.json()
-        
-        # Get recommendations
-        recommendations = stock_recommender.get_user_recommendations(user_id)
-        
+        predictor = price_predictor.get()
+        errors = {name: 'Stock not found' for name in stock_data['not_found']}
+        predictions = {}
+        pending = []
+        for stock_name, item in stock_data['data'].items():
+            historical_prices = np.array(item.get('prices', []), dtype=float)
+            if len(historical_prices) < predictor.sequence_length:
+                errors[stock_name] = f'at least {predictor.sequence_length} prices are required'
+                continue
+            window = historical_prices[-predictor.sequence_length:]
+            cache_key = prediction_cache.key(stock_name, window, (price_predictor.generation, predictor.version))
+            result = prediction_cache.get(cache_key)
+            if result is None:
+                pending.append((stock_name, window, cache_key))
+            else:
+                predictions[stock_name] = result
+
+        if pending:
+            # One forward pass for all the symbols that are not cached
+            batch = predict_windows(predictor, [window for stock_name, window, cache_key in pending])
+            for (stock_name, window, cache_key), (prediction, mean, deviation) in zip(pending, batch):
+                result = prediction_result(stock_name, window, prediction, mean, deviation)
+                prediction_cache.put(cache_key, result)
+                predictions[stock_name] = result
+
         return jsonify({
-            'user_id': user_id,
-            'recommendations': recommendations
+            'predictions': predictions,
+            'errors': errors
         })
-        
+
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-# API endpoint for anomaly detection
-@app.post("/ml/anomalies")
-def detect_anomalies():
+# function to compute the recommendations of a user from their order history and the catalog
+def compute_recommendations(user_id):
+    # Get user history from order service, every replica holds the full history so the next one is
+    # asked when a node is down
+    response = None
+    for node in config['order']['nodes']:
+        url = f"http://{node['host']}:{node['port']}/orders/user/{user_id}"
+        try:
+            response = requests.get(url, timeout=5)
+            break
+        except requests.ConnectionError:
+            continue
+    if response is None or response.status_code != 200:
+        raise ValueError('Failed to fetch user history')
+
+    user_history = response.json()
+
+    # Get stock data from catalog service
+    catalog_host = config['catalog']['host']
+    catalog_port = str(config['catalog']['port'])
+    url = f'http://{catalog_host}:{catalog_port}/catalog/all'
+
+    response = requests.get(url, timeout=5)
+    if response.status_code != 200:
+        raise ValueError('Failed to fetch stock data')
+
+    stock_data = response.json()
+
+    return stock_recommender.get().recommend(user_history, stock_data, recommendation_config.get('top_n', 5))
+
+# Top N recommendations per user, recomputed in the background when the user trades or the catalog changes
+recommendation_config = config.get('ml_service', {}).get('recommendations', {})
+recommendation_store = RecommendationStore(compute_recommendations,
+                                           max_staleness=recommendation_config.get('max_staleness', 300.0),
+                                           max_users=recommendation_config.get('max_users', 10000))
+
+# API endpoint for stock recommendations, refresh=true recomputes them
+@app.get("/ml/recommendations")
+def get_recommendations():
     try:
-        trading_data = request.json
-        if not trading_data:
-            return jsonify({'error': 'Trading data is required'}), 400
-            
-        # Convert to DataFrame
-        df = pd.DataFrame(trading_data)
+        user_id = request.args.get('user_id')
+        if not user_id:
+            return jsonify({'error': 'user_id is required'}), 400
+        force = request.args.get('refresh', 'false').lower() == 'true'
         
-        # Detect anomalies
-        anomaly_details = anomaly_detector.get_anomaly_details(df)
+        entry = recommendation_store.get(user_id, force=force)
         
         return jsonify({
-            'anomalies': anomaly_details
+            'user_id': user_id,
+            'recommendations': entry['recommendations'],
+            'computed_at': entry['computed_at'],
+            'stale': entry['dirty']
         })
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# API endpoint to report a trade of a user or a catalog change, the affected recommendations are recomputed
+@app.post("/ml/recommendations/invalidate")
+def invalidate_recommendations():
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({'error': 'request body must be a json object'}), 400
+    if data.get('catalog'):
+        recommendation_store.catalog_changed()
+    elif data.get('user_id'):
+        recommendation_store.user_changed(str(data['user_id']))
+    else:
+        return jsonify({'error': 'user_id or catalog is required'}), 400
+    return jsonify(recommendation_store.stats()), 202
+
+# Large anomaly submissions are scored in chunks of at most anomaly_chunk_rows trades
+anomaly_chunk_rows = config.get('ml_service', {}).get('anomaly_chunk_rows', 10000)
+
+ARROW_STREAM = 'application/vnd.apache.arrow.stream'
+NDJSON = 'application/x-ndjson'
+
+# function to split column arrays into DataFrames of at most chunk_rows rows
+def column_chunks(columns, chunk_rows):
+    import pandas as pd
+    rows = len(next(iter(columns.values()), []))
+    for start in range(0, rows, chunk_rows):
+        yield pd.DataFrame({name: values[start:start + chunk_rows] for name, values in columns.items()})
+
+# function to read the trades of the request as DataFrames of at most chunk_rows rows:
+# JSON rows or column arrays, NDJSON lines of rows or of column arrays, or an Arrow IPC stream
+def anomaly_chunks(chunk_rows):
+    import pandas as pd
+    if request.mimetype == ARROW_STREAM:
+        import pyarrow.ipc
+        for batch in pyarrow.ipc.open_stream(request.stream):
+            for start in range(0, batch.num_rows, chunk_rows):
+                yield batch.slice(start, chunk_rows).to_pandas()
+    elif request.mimetype == NDJSON:
+        rows = []
+        for line in request.stream:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if isinstance(item, dict) and item and all(isinstance(value, list) for value in item.values()):
+                if rows:
+                    yield pd.DataFrame(rows)
+                    rows = []
+                yield from column_chunks(item, chunk_rows)
+            else:
+                rows.append(item)
+                if len(rows) >= chunk_rows:
+                    yield pd.DataFrame(rows)
+                    rows = []
+        if rows:
+            yield pd.DataFrame(rows)
+    else:
+        trading_data = request.json
+        if isinstance(trading_data, dict):
+            yield from column_chunks(trading_data, chunk_rows)
+        else:
+            for start in range(0, len(trading_data), chunk_rows):
+                yield pd.DataFrame(trading_data[start:start + chunk_rows])
+
+# function to score the chunks one after the other, yields the anomalies of every chunk
+def score_chunks(chunks):
+    detector = anomaly_detector.get()
+    offset = 0
+    for chunk in chunks:
+        yield offset, len(chunk), detector.get_anomaly_details(chunk, offset)
+        offset += len(chunk)
+
+# API endpoint for anomaly detection, NDJSON and Arrow submissions (or stream=true) are answered with one
+# NDJSON line per scored chunk as soon as it is scored
+@app.post("/ml/anomalies")
+def detect_anomalies():
+    if request.mimetype == ARROW_STREAM:
+        try:
+            import pyarrow
+        except ImportError:
+            return jsonify({'error': 'Arrow input requires pyarrow'}), 415
+    streamed = request.mimetype in (ARROW_STREAM, NDJSON) or request.args.get('stream', 'false').lower() == 'true'
+    if not streamed:
+        try:
+            trading_data = request.json
+            if not trading_data:
+                return jsonify({'error': 'Trading data is required'}), 400
+                
+            # Detect anomalies chunk by chunk
+            anomaly_details = []
+            for offset, rows, details in score_chunks(anomaly_chunks(anomaly_chunk_rows)):
+                anomaly_details.extend(details)
+            
+            return jsonify({
+                'anomalies': anomaly_details
+            })
+            
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+
+    def generate():
+        total_rows, total_anomalies = 0, 0
+        try:
+            for offset, rows, details in score_chunks(anomaly_chunks(anomaly_chunk_rows)):
+                total_rows += rows
+                total_anomalies += len(details)
+                yield json.dumps({'offset': offset, 'rows': rows, 'anomalies': details}) + '\n'
+        except Exception as e:
+            # The status line is already sent, the error is the last line of the stream
+            yield json.dumps({'error': str(e)}) + '\n'
+            return
+        yield json.dumps({'done': True, 'rows': total_rows, 'anomalies': total_anomalies}) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON)
+
+# API endpoint for serving metrics
+@app.get("/ml/metrics")
+def get_metrics():
+    return jsonify({
+        'prediction_cache': prediction_cache.stats(),
+        'micro_batcher': prediction_batcher.stats(),
+        'recommendation_store': recommendation_store.stats(),
+        'models': {model.name: model.stats() for model in lazy_models}
+    })
+
+# API endpoint to load a model version from the registry and swap it in, the latest version if none is given
+@app.post("/ml/models/<model_name>/swap")
+def swap_model(model_name):
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({'error': 'request body must be a json object'}), 400
+    if prefork_server is not None:
+        if model_name not in model_manager.models:
+            return jsonify({'error': 'Unknown model'}), 404
+        if model_manager.is_loading(model_name):
+            return jsonify({'error': f'a swap of {model_name} is already in progress'}), 409
+        prefork_server.broadcast({'model': model_name, 'version': data.get('version')})
+        return jsonify({'model': model_name, 'requested_version': data.get('version'), 'state': 'relayed',
+                        'workers': args.workers}), 202
+    try:
+        record = model_manager.swap(model_name, data.get('version'))
+    except KeyError:
+        return jsonify({'error': 'Unknown model'}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 409
+    return jsonify(record), 202
+
+# API endpoint for the served model versions and the recent swaps
+@app.get("/ml/models")
+def get_models():
+    return jsonify(model_manager.status())
+
+def warm_up():
+    # Build every model and import the frameworks now instead of on the first requests
+    import pandas
+    for model in lazy_models:
+        model.get()
+    price_predictor.get().warm_up()
+
+def preload():
+    # Load the models once in the parent so that the forked workers share their memory
+    import pandas
+    stock_recommender.get().warm_up()
+    anomaly_detector.get().warm_up()
+    # TensorFlow is not fork safe, so a Keras predictor is left to each worker, exported NumPy weights are shared
+    if config.get('ml_service', {}).get('numpy_weights'):
+        price_predictor.get().warm_up()
+
+def after_fork():
+    prediction_batcher.after_fork()
+    recommendation_store.after_fork()
+
+def apply_swap(message):
+    # Runs in every worker for every relayed swap, one after the other, once a running swap is done
+    while True:
+        try:
+            model_manager.swap(message['model'], message['version'], message['id'])
+            return
+        except ValueError:
+            time.sleep(0.05)
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=6000) 
\ No newline at end of file
+    if args.workers > 1:
+        preload()
+        prefork_server = PreforkServer(app, '0.0.0.0', args.port, args.workers, after_fork, apply_swap)
+        prefork_server.serve_forever()
+    else:
+        if args.warm_up:
+            warm_up()
+        app.run(host='0.0.0.0', port=args.port) 
\ No newline at end of file
@@ -47,6 +47,11 @@ class DataPipeline:
             )
         ''')
         
+        # Per symbol reads in date order (WindowDataset) would otherwise scan the whole table
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_stock_prices_symbol_date ON stock_prices (symbol, date)
+        ''')
+        
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS news_sentiment (
                 date TEXT,
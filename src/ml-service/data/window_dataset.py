@@ -0,0 +1,215 @@
+import logging
+import queue
+import sqlite3
+import threading
+from collections import deque
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+from sklearn.preprocessing import MinMaxScaler
+
+from models.price_predictor import make_windows
+
+class WindowDataset:
+    """Stream shuffled batches of training windows of many symbols from the market data store.
+
+    Rows are read per symbol in date order with fetchmany, so only chunk_rows closes per open symbol,
+    the shuffle buffer and the prefetched batches are in memory at any time, never a whole symbol or the
+    whole table. Windows cross chunk boundaries, so every symbol yields exactly the windows of
+    make_windows over its full history.
+    """
+
+    def __init__(self, db_path: str = "data/market_data.db", symbols: Optional[List[str]] = None,
+                 sequence_length: int = 60, batch_size: int = 32, start_date: Optional[str] = None,
+                 end_date: Optional[str] = None, chunk_rows: int = 5000, interleave: int = 8,
+                 shuffle_buffer: int = 20000, prefetch: int = 8, scaler: Optional[MinMaxScaler] = None,
+                 seed: Optional[int] = None):
+        self.logger = logging.getLogger(__name__)
+        self.db_path = db_path
+        self.sequence_length = sequence_length
+        self.batch_size = batch_size
+        self.start_date = start_date
+        self.end_date = end_date
+        self.chunk_rows = chunk_rows
+        self.interleave = interleave
+        self.shuffle_buffer = shuffle_buffer
+        self.prefetch = prefetch
+        self.seed = seed
+        self.epoch = 0
+        self._ensure_index()
+        self.symbols = symbols if symbols is not None else self._list_symbols()
+        self.scaler = scaler if scaler is not None else self.fit_scaler()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path)
+
+    def _ensure_index(self):
+        """Index the prices by symbol and date so that reading one symbol does not scan the table."""
+        conn = self._connect()
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_stock_prices_symbol_date ON stock_prices (symbol, date)"
+        )
+        conn.commit()
+        conn.close()
+
+    def _date_filter(self) -> Tuple[str, list]:
+        clause, params = "", []
+        if self.start_date is not None:
+            clause += " AND date >= ?"
+            params.append(self.start_date)
+        if self.end_date is not None:
+            clause += " AND date <= ?"
+            params.append(self.end_date)
+        return clause, params
+
+    def _list_symbols(self) -> List[str]:
+        """List every symbol of the store."""
+        conn = self._connect()
+        rows = conn.execute("SELECT DISTINCT symbol FROM stock_prices ORDER BY symbol").fetchall()
+        conn.close()
+        return [row[0] for row in rows]
+
+    def fit_scaler(self) -> MinMaxScaler:
+        """Fit one MinMaxScaler on the closes of all the symbols from per symbol aggregates."""
+        clause, params = self._date_filter()
+        low, high = np.inf, -np.inf
+        conn = self._connect()
+        for symbol in self.symbols:
+            row = conn.execute(
+                "SELECT MIN(close), MAX(close) FROM stock_prices WHERE symbol = ?" + clause,
+                [symbol] + params
+            ).fetchone()
+            if row[0] is not None:
+                low, high = min(low, row[0]), max(high, row[1])
+        conn.close()
+        if low > high:
+            raise ValueError("no prices stored for the requested symbols and dates")
+        scaler = MinMaxScaler()
+        scaler.fit(np.array([[low], [high]]))
+        return scaler
+
+    def _symbol_windows(self, conn: sqlite3.Connection, symbol: str) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """Yield the scaled windows and targets of one symbol, one chunk of rows at a time."""
+        clause, params = self._date_filter()
+        cursor = conn.execute(
+            "SELECT close FROM stock_prices WHERE symbol = ?" + clause + " ORDER BY date",
+            [symbol] + params
+        )
+        tail = np.empty(0, dtype=np.float32)
+        while True:
+            rows = cursor.fetchmany(self.chunk_rows)
+            if not rows:
+                break
+            scaled = self.scaler.transform(np.array(rows, dtype=np.float64)).astype(np.float32)[:, 0]
+            # The last sequence_length closes of the previous chunk start the windows of this one
+            closes = np.concatenate([tail, scaled])
+            if len(closes) > self.sequence_length:
+                X, y = make_windows(closes, self.sequence_length)
+                yield np.ascontiguousarray(X), y
+            tail = closes[-self.sequence_length:]
+
+    def _batches(self, rng: np.random.Generator) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """Interleave the chunks of several symbols into a shuffle buffer and cut it into batches."""
+        symbols = list(rng.permutation(self.symbols))
+        conn = self._connect()
+        readers = deque()
+        pool_X, pool_y, pooled = [], [], 0
+        try:
+            while readers or symbols:
+                while symbols and len(readers) < self.interleave:
+                    readers.append(self._symbol_windows(conn, symbols.pop()))
+                reader = readers.popleft()
+                chunk = next(reader, None)
+                if chunk is None:
+                    continue
+                readers.append(reader)
+                pool_X.append(chunk[0])
+                pool_y.append(chunk[1])
+                pooled += len(chunk[1])
+                if pooled >= self.shuffle_buffer:
+                    pool_X, pool_y = yield from self._drain(pool_X, pool_y, rng, final=False)
+                    pooled = len(pool_y[0]) if pool_y else 0
+            if pool_y:
+                yield from self._drain(pool_X, pool_y, rng, final=True)
+        finally:
+            conn.close()
+
+    def _drain(self, pool_X, pool_y, rng, final):
+        X = np.concatenate(pool_X)
+        y = np.concatenate(pool_y)
+        order = rng.permutation(len(y))
+        full = len(y) - len(y) % self.batch_size
+        for start in range(0, full, self.batch_size):
+            batch = order[start:start + self.batch_size]
+            yield X[batch, :, None], y[batch]
+        if final:
+            if full < len(y):
+                yield X[order[full:], :, None], y[order[full:]]
+            return [], []
+        # The windows left over from the last full batch stay for the next buffer
+        rest = order[full:]
+        return ([X[rest]], [y[rest]]) if len(rest) else ([], [])
+
+    def __iter__(self) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """Iterate over one epoch of (batch, sequence_length, 1) windows and their targets.
+
+        The batches are produced by a background thread up to prefetch batches ahead, and every epoch
+        reads the symbols and shuffles the windows in a different order.
+        """
+        seed = None if self.seed is None else self.seed + self.epoch
+        self.epoch += 1
+        rng = np.random.default_rng(seed)
+        batches = queue.Queue(maxsize=self.prefetch)
+        stop = threading.Event()
+        done = object()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    batches.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def produce():
+            item = done
+            generator = self._batches(rng)
+            try:
+                for batch in generator:
+                    if not put(batch):
+                        break
+            except Exception as e:
+                self.logger.error(f"Error reading training windows: {str(e)}")
+                item = e
+            finally:
+                generator.close()
+            put(item)
+
+        producer = threading.Thread(target=produce, daemon=True)
+        producer.start()
+        try:
+            while True:
+                item = batches.get()
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            # Stops the producer when the consumer leaves the epoch early
+            stop.set()
+            producer.join()
+
+    def count_windows(self) -> int:
+        """Count the windows of one epoch from the number of rows of every symbol."""
+        clause, params = self._date_filter()
+        total = 0
+        conn = self._connect()
+        for symbol in self.symbols:
+            rows = conn.execute(
+                "SELECT COUNT(*) FROM stock_prices WHERE symbol = ?" + clause, [symbol] + params
+            ).fetchone()[0]
+            total += max(0, rows - self.sequence_length)
+        conn.close()
+        return total
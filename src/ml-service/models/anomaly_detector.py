@@ -3,12 +3,16 @@ import pandas as pd
 from sklearn.ensemble import IsolationForest
 from sklearn.preprocessing import StandardScaler
 
+def native(value):
+    # NumPy scalars to Python values for the JSON responses
+    return value.item() if isinstance(value, np.generic) else value
+
 class TradingAnomalyDetector:
     def __init__(self):
         self.model = IsolationForest(contamination=0.1, random_state=42)
         self.scaler = StandardScaler()
         
-    def prepare_features(self, trading_data):
+    def prepare_features(self, trading_data, fit=False):
         # Extract relevant features
         features = pd.DataFrame({
             'volume': trading_data['volume'],
@@ -17,13 +21,17 @@ class TradingAnomalyDetector:
             'order_size': trading_data['order_size']
         })
         
-        # Scale features
-        scaled_features = self.scaler.fit_transform(features)
-        return scaled_features
+        # Scale features, the scaler is only fitted by training (and restored with the trained detector), so that
+        # every request and every chunk of a large submission is scaled the same way; scoring never changes it
+        if fit:
+            return self.scaler.fit_transform(features)
+        if not hasattr(self.scaler, 'mean_'):
+            raise ValueError('the anomaly detector is not trained')
+        return self.scaler.transform(features)
         
     def train(self, historical_trading_data):
         # Prepare features
-        X = self.prepare_features(historical_trading_data)
+        X = self.prepare_features(historical_trading_data, fit=True)
         
         # Train the model
         self.model.fit(X)
@@ -46,23 +54,29 @@ class TradingAnomalyDetector:
             'anomaly_score': scores
         }
         
-    def get_anomaly_details(self, trading_data):
+    def warm_up(self):
+        # One dummy inference, without touching the fitted scaler
+        if hasattr(self.model, 'estimators_'):
+            self.model.score_samples(np.zeros((1, 4)))
+        
+    def get_anomaly_details(self, trading_data, offset=0):
         results = self.detect_anomalies(trading_data)
         
-        # Get details of anomalous trades
+        # Get details of anomalous trades, row is the position in the whole submission when scored in chunks
         anomaly_details = []
-        for i, is_anomaly in enumerate(results['is_anomaly']):
-            if is_anomaly:
-                anomaly_details.append({
-                    'trade_id': trading_data.iloc[i]['trade_id'],
-                    'timestamp': trading_data.iloc[i]['timestamp'],
-                    'score': results['anomaly_score'][i],
-                    'details': {
-                        'volume': trading_data.iloc[i]['volume'],
-                        'price_change': trading_data.iloc[i]['price_change'],
-                        'trade_frequency': trading_data.iloc[i]['trade_frequency'],
-                        'order_size': trading_data.iloc[i]['order_size']
-                    }
-                })
+        for i in np.flatnonzero(results['is_anomaly']):
+            row = trading_data.iloc[i]
+            anomaly_details.append({
+                'row': offset + int(i),
+                'trade_id': native(row['trade_id']),
+                'timestamp': native(row['timestamp']),
+                'score': float(results['anomaly_score'][i]),
+                'details': {
+                    'volume': native(row['volume']),
+                    'price_change': native(row['price_change']),
+                    'trade_frequency': native(row['trade_frequency']),
+                    'order_size': native(row['order_size'])
+                }
+            })
                 
         return anomaly_details 
\ No newline at end of file
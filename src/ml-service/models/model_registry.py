@@ -13,6 +13,11 @@ class ModelRegistry:
         
     def log_model(self, model, model_name, metrics, params):
         with mlflow.start_run():
+            # Tag the run so that the versions of a model can be found and loaded
+            version = len(self.list_versions(model_name)) + 1
+            flavor = "tensorflow" if isinstance(model, mlflow.tensorflow.Model) else "sklearn"
+            mlflow.set_tags({"model_name": model_name, "version": version, "flavor": flavor})
+            
             # Log parameters
             mlflow.log_params(params)
             
@@ -20,15 +25,17 @@ class ModelRegistry:
             mlflow.log_metrics(metrics)
             
             # Log model
-            if isinstance(model, mlflow.tensorflow.Model):
+            if flavor == "tensorflow":
                 mlflow.tensorflow.log_model(model, model_name)
             else:
-                mlflow.sklearn.log_model(model, model_name)
+                # The serving wrappers (scaler plus model) are not plain estimators, so they are pickled
+                mlflow.sklearn.log_model(model, model_name, serialization_format="cloudpickle")
                 
             # Save metadata
             metadata = {
                 "timestamp": datetime.now().isoformat(),
                 "model_name": model_name,
+                "version": version,
                 "metrics": metrics,
                 "parameters": params
             }
@@ -44,6 +51,29 @@ class ModelRegistry:
         best_run = runs.loc[runs[f"metrics.{metric}"].idxmax()]
         return mlflow.sklearn.load_model(f"runs:/{best_run.run_id}/{model_name}")
         
+    def list_versions(self, model_name):
+        runs = mlflow.search_runs(filter_string=f"tags.model_name = '{model_name}'")
+        if runs.empty or "tags.version" not in runs:
+            return []
+        return sorted(int(version) for version in runs["tags.version"].dropna())
+        
+    def load_model(self, model_name, version=None):
+        # Load the given version of a model, the latest one if no version is given
+        filter_string = f"tags.model_name = '{model_name}'"
+        if version is not None:
+            filter_string += f" and tags.version = '{version}'"
+        runs = mlflow.search_runs(filter_string=filter_string)
+        if runs.empty:
+            return None
+            
+        run = runs.loc[runs["tags.version"].astype(int).idxmax()]
+        uri = f"runs:/{run.run_id}/{model_name}"
+        if run["tags.flavor"] == "tensorflow":
+            model = mlflow.tensorflow.load_model(uri)
+        else:
+            model = mlflow.sklearn.load_model(uri)
+        return model, int(run["tags.version"])
+        
     def get_model_metadata(self, model_name):
         try:
             with open(f"{self.registry_path}/{model_name}_metadata.json", "r") as f:
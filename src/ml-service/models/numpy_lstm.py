@@ -0,0 +1,146 @@
+import os
+import numpy as np
+
+def export_weights(predictor):
+    # Extract the LSTM and Dense weights of a trained StockPricePredictor and the parameters of its scaler
+    weights = {
+        'sequence_length': np.array(predictor.sequence_length),
+        'version': np.array(predictor.version),
+        'scaler_scale': np.asarray(predictor.scaler.scale_, dtype=np.float64),
+        'scaler_min': np.asarray(predictor.scaler.min_, dtype=np.float64)
+    }
+    index = 0
+    for layer in predictor.model.layers:
+        kind = layer.__class__.__name__
+        if kind == 'LSTM':
+            kernel, recurrent_kernel, bias = layer.get_weights()
+            weights[f'layer_{index}_lstm_kernel'] = kernel
+            weights[f'layer_{index}_lstm_recurrent_kernel'] = recurrent_kernel
+            weights[f'layer_{index}_lstm_bias'] = bias
+            index += 1
+        elif kind == 'Dense':
+            kernel, bias = layer.get_weights()
+            weights[f'layer_{index}_dense_kernel'] = kernel
+            weights[f'layer_{index}_dense_bias'] = bias
+            index += 1
+        elif kind == 'Dropout':
+            # Only applied by the Monte Carlo dropout passes, a no-op for plain predictions
+            weights[f'layer_{index}_dropout_rate'] = np.array(layer.rate)
+            index += 1
+        else:
+            raise ValueError(f'unsupported layer {kind}')
+    return weights
+
+def save_weights(weights, path):
+    # A .npz archive, or a directory of .npy files that can be memory mapped
+    if path.endswith('.npz'):
+        np.savez(path, **weights)
+        return
+    os.makedirs(path, exist_ok=True)
+    for name, value in weights.items():
+        np.save(os.path.join(path, name + '.npy'), value)
+
+def load_weights(path):
+    if os.path.isdir(path):
+        # Mapped read only, every process serving the same files shares their pages
+        return {file[:-len('.npy')]: np.load(os.path.join(path, file), mmap_mode='r')
+                for file in os.listdir(path) if file.endswith('.npy')}
+    with np.load(path) as data:
+        return {name: data[name] for name in data.files}
+
+def sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+class NumpyLSTMPredictor:
+    def __init__(self, weights):
+        self.sequence_length = int(weights['sequence_length'])
+        self.version = int(weights['version'])
+        self.scaler_scale = weights['scaler_scale']
+        self.scaler_min = weights['scaler_min']
+        self.layers = []
+        count = len({name.split('_')[1] for name in weights if name.startswith('layer_')})
+        for index in range(count):
+            prefix = f'layer_{index}_'
+            if prefix + 'lstm_kernel' in weights:
+                self.layers.append(('lstm', weights[prefix + 'lstm_kernel'], weights[prefix + 'lstm_recurrent_kernel'],
+                                    weights[prefix + 'lstm_bias']))
+            elif prefix + 'dropout_rate' in weights:
+                self.layers.append(('dropout', float(weights[prefix + 'dropout_rate'])))
+            else:
+                self.layers.append(('dense', weights[prefix + 'dense_kernel'], weights[prefix + 'dense_bias']))
+
+    @classmethod
+    def from_file(cls, path):
+        return cls(load_weights(path))
+
+    def lstm(self, X, kernel, recurrent_kernel, bias, return_sequences):
+        # Keras gate order in the kernels is input, forget, cell, output
+        batch_size, steps, _ = X.shape
+        units = recurrent_kernel.shape[0]
+        # The input projection of every time step is computed at once, only the recurrence is sequential
+        projected = X @ kernel + bias
+        h = np.zeros((batch_size, units), dtype=X.dtype)
+        c = np.zeros((batch_size, units), dtype=X.dtype)
+        outputs = np.empty((batch_size, steps, units), dtype=X.dtype) if return_sequences else None
+        for t in range(steps):
+            z = projected[:, t] + h @ recurrent_kernel
+            i = sigmoid(z[:, :units])
+            f = sigmoid(z[:, units:2 * units])
+            g = np.tanh(z[:, 2 * units:3 * units])
+            o = sigmoid(z[:, 3 * units:])
+            c = f * c + i * g
+            h = o * np.tanh(c)
+            if return_sequences:
+                outputs[:, t] = h
+        return outputs if return_sequences else h
+
+    def forward(self, X, rng=None):
+        # Dropout is only applied when a random generator is given (Monte Carlo dropout)
+        lstm_count = sum(1 for layer in self.layers if layer[0] == 'lstm')
+        seen = 0
+        for layer in self.layers:
+            if layer[0] == 'lstm':
+                seen += 1
+                # Every LSTM but the last one returns its whole sequence
+                X = self.lstm(X, layer[1], layer[2], layer[3], return_sequences=seen < lstm_count)
+            elif layer[0] == 'dropout':
+                if rng is not None and layer[1] > 0:
+                    keep = rng.random(X.shape, dtype=np.float32) >= layer[1]
+                    X = X * keep / np.float32(1.0 - layer[1])
+            else:
+                X = X @ layer[1] + layer[2]
+        return X
+
+    def warm_up(self):
+        self.predict_batch([np.zeros(self.sequence_length)])
+
+    def predict(self, recent_data):
+        return self.predict_batch([recent_data])[0]
+
+    def prepare_windows(self, recent_data_list):
+        windows = np.stack([np.asarray(data, dtype=float)[-self.sequence_length:] for data in recent_data_list])
+        if windows.shape[1] != self.sequence_length:
+            raise ValueError(f'at least {self.sequence_length} prices are required')
+
+        # Same scaling as the MinMaxScaler of the trained predictor
+        scaled = windows * self.scaler_scale[0] + self.scaler_min[0]
+        return scaled.reshape(len(windows), self.sequence_length, 1).astype(np.float32)
+
+    def inverse_scale(self, scaled_prediction):
+        return (scaled_prediction.astype(np.float64) - self.scaler_min[0]) / self.scaler_scale[0]
+
+    def predict_batch(self, recent_data_list):
+        X = self.prepare_windows(recent_data_list)
+        return self.inverse_scale(self.forward(X))[:, 0]
+
+    def has_dropout(self):
+        # Weights exported before the dropout rates were recorded have no dropout layer
+        return any(layer[0] == 'dropout' and layer[1] > 0 for layer in self.layers)
+
+    def predict_with_uncertainty(self, recent_data_list, samples=10, rng=None):
+        # Monte Carlo dropout: samples stochastic passes, run as one batch of samples x windows
+        X = self.prepare_windows(recent_data_list)
+        tiled = np.tile(X, (samples, 1, 1))
+        scaled_prediction = self.forward(tiled, rng or np.random.default_rng())
+        prediction = self.inverse_scale(scaled_prediction).reshape(samples, len(X))
+        return prediction.mean(axis=0), prediction.std(axis=0)
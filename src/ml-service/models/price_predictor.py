@@ -1,16 +1,46 @@
 import numpy as np
-import pandas as pd
-from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import LSTM, Dense, Dropout
 from sklearn.preprocessing import MinMaxScaler
 
+def load_keras():
+    # TensorFlow takes seconds to import, so it is only imported when a model is built
+    from tensorflow.keras.models import Sequential
+    from tensorflow.keras.layers import LSTM, Dense, Dropout
+    return Sequential, LSTM, Dense, Dropout
+
+def make_windows(data, sequence_length, target=0):
+    # Windows of sequence_length steps and the value that follows each one, as strided views of data (no copy).
+    # data is (steps,), (steps, features) or (symbols, steps, features), the windows are (windows, sequence_length),
+    # (windows, sequence_length, features) or (symbols, windows, sequence_length, features) and the targets are
+    # the target feature of the step after each window
+    data = np.asarray(data)
+    if data.shape[-2 if data.ndim > 1 else 0] <= sequence_length:
+        raise ValueError(f'more than {sequence_length} steps are required')
+    if data.ndim == 1:
+        windows = np.lib.stride_tricks.sliding_window_view(data, sequence_length)
+        return windows[:-1], data[sequence_length:]
+    step_axis = data.ndim - 2
+    windows = np.lib.stride_tricks.sliding_window_view(data, sequence_length, axis=step_axis)
+    # sliding_window_view puts the window axis last, the features go back after the steps
+    windows = np.swapaxes(windows, -1, -2)
+    return windows[..., :-1, :, :], data[..., sequence_length:, target]
+
 class StockPricePredictor:
     def __init__(self):
         self.model = None
         self.scaler = MinMaxScaler()
         self.sequence_length = 60  # Number of time steps to look back
+        self.version = 0  # Bumped whenever the model or the scaler changes
+        self.trained_until = 0  # Number of points of the series the model was trained on
+        self.stochastic_forward = None
+        
+    def __getstate__(self):
+        # The compiled stochastic forward pass cannot be pickled, it is compiled again after loading
+        state = self.__dict__.copy()
+        state['stochastic_forward'] = None
+        return state
         
     def build_model(self, input_shape):
+        Sequential, LSTM, Dense, Dropout = load_keras()
         model = Sequential([
             LSTM(50, return_sequences=True, input_shape=input_shape),
             Dropout(0.2),
@@ -21,37 +51,115 @@ class StockPricePredictor:
         ])
         model.compile(optimizer='adam', loss='mse')
         self.model = model
+        self.stochastic_forward = None
         
     def prepare_data(self, data):
         # Scale the data
         scaled_data = self.scaler.fit_transform(data.reshape(-1, 1))
         
-        # Create sequences
-        X, y = [], []
-        for i in range(self.sequence_length, len(scaled_data)):
-            X.append(scaled_data[i-self.sequence_length:i, 0])
-            y.append(scaled_data[i, 0])
-            
-        return np.array(X), np.array(y)
+        # Create sequences, views of the scaled data instead of one copy per window
+        return make_windows(scaled_data[:, 0], self.sequence_length)
     
-    def train(self, historical_data):
+    def train(self, historical_data, epochs=50):
         # Prepare data
         X, y = self.prepare_data(historical_data)
         X = X.reshape((X.shape[0], X.shape[1], 1))
         
         # Build and train model
         self.build_model((X.shape[1], 1))
-        self.model.fit(X, y, epochs=50, batch_size=32, verbose=0)
+        self.model.fit(X, y, epochs=epochs, batch_size=32, verbose=0)
+        self.trained_until = len(historical_data)
+        self.version += 1
+        
+    def update(self, historical_data, epochs=5, learning_rate=1e-4):
+        # Warm start: fine-tune the current weights on the points added since the last training cutoff only,
+        # a model that was never trained is trained from scratch
+        if self.model is None:
+            self.train(historical_data)
+            return 0
+        historical_data = np.asarray(historical_data, dtype=float)
+        trained_until = getattr(self, 'trained_until', 0)
+        if len(historical_data) < trained_until:
+            raise ValueError('the series is shorter than the last training cutoff')
+        
+        # The new windows start sequence_length points before the cutoff so that every new point is a target
+        recent = historical_data[max(0, trained_until - self.sequence_length):]
+        if len(recent) <= self.sequence_length:
+            return 0
+        
+        # The scaler is kept as fitted so that the weights keep their meaning, new prices outside its range
+        # scale outside [0, 1] until the next full retrain
+        scaled_data = self.scaler.transform(recent.reshape(-1, 1))
+        X, y = make_windows(scaled_data[:, 0], self.sequence_length)
+        X = X.reshape((X.shape[0], X.shape[1], 1))
+        
+        # A smaller learning rate than the initial training keeps the update from overwriting what was learned
+        self.model.optimizer.learning_rate.assign(learning_rate)
+        self.model.fit(X, y, epochs=epochs, batch_size=32, verbose=0)
+        self.trained_until = len(historical_data)
+        self.version += 1
+        return len(y)
+        
+    def train_stream(self, dataset, epochs=5):
+        # Train on the batches of a WindowDataset (data/window_dataset.py), epoch by epoch, so the windows of
+        # the symbols are never all in memory. The scaler of the dataset becomes the scaler of the model
+        if dataset.sequence_length != self.sequence_length:
+            raise ValueError(f'the dataset windows must have {self.sequence_length} steps')
+        self.scaler = dataset.scaler
+        self.build_model((self.sequence_length, 1))
+        losses = []
+        for epoch in range(epochs):
+            total, count = 0.0, 0
+            for X, y in dataset:
+                loss = self.model.train_on_batch(X, y)
+                total += float(np.ravel(loss)[0]) * len(y)
+                count += len(y)
+            losses.append(total / count if count else None)
+        self.version += 1
+        return losses
+        
+    def warm_up(self):
+        # Import the framework and run one dummy inference so the first request does not pay for it
+        load_keras()
+        if self.model is not None:
+            self.predict_batch([np.zeros(self.sequence_length)])
         
     def predict(self, recent_data):
-        # Scale the data
-        scaled_data = self.scaler.transform(recent_data.reshape(-1, 1))
+        return self.predict_batch([recent_data])[0]
+        
+    def prepare_windows(self, recent_data_list):
+        # Stack the last sequence_length points of every series into one (N, sequence_length, 1) tensor
+        windows = np.stack([np.asarray(data, dtype=float)[-self.sequence_length:] for data in recent_data_list])
+        if windows.shape[1] != self.sequence_length:
+            raise ValueError(f'at least {self.sequence_length} prices are required')
         
-        # Prepare sequence
-        X = scaled_data[-self.sequence_length:].reshape(1, self.sequence_length, 1)
+        # Scale all the windows at once
+        scaled = self.scaler.transform(windows.reshape(-1, 1))
+        return scaled.reshape(len(windows), self.sequence_length, 1)
         
-        # Make prediction
-        scaled_prediction = self.model.predict(X)
+    def predict_batch(self, recent_data_list):
+        X = self.prepare_windows(recent_data_list)
+        
+        # One forward pass for the whole batch
+        scaled_prediction = self.model.predict(X, batch_size=len(X), verbose=0)
         prediction = self.scaler.inverse_transform(scaled_prediction)
         
-        return prediction[0][0] 
\ No newline at end of file
+        return prediction[:, 0]
+        
+    def has_dropout(self):
+        # Monte Carlo dropout needs at least one dropout layer to spread the stochastic passes
+        return self.model is not None and any(layer.__class__.__name__ == 'Dropout' and layer.rate > 0
+                                              for layer in self.model.layers)
+        
+    def predict_with_uncertainty(self, recent_data_list, samples=10):
+        # Monte Carlo dropout: samples stochastic passes with dropout active, run as one batch of samples x windows
+        X = self.prepare_windows(recent_data_list)
+        tiled = np.tile(X, (samples, 1, 1)).astype(np.float32)
+        if getattr(self, 'stochastic_forward', None) is None:
+            # Calling the model eagerly with dropout active is much slower than a compiled function
+            import tensorflow as tf
+            self.stochastic_forward = tf.function(lambda X: self.model(X, training=True), reduce_retracing=True)
+        scaled_prediction = np.asarray(self.stochastic_forward(tiled))
+        prediction = self.scaler.inverse_transform(scaled_prediction).reshape(samples, len(X))
+        
+        return prediction.mean(axis=0), prediction.std(axis=0)
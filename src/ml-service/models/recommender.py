@@ -18,6 +18,11 @@ class StockRecommender:
                             for data in stock_data]
         self.stock_features = self.vectorizer.fit_transform(stock_descriptions)
         
+    def warm_up(self):
+        # One dummy similarity computation
+        if self.stock_features is not None:
+            cosine_similarity(self.stock_features[:1], self.stock_features)
+        
     def get_user_recommendations(self, user_id, n_recommendations=5):
         if user_id not in self.user_stock_matrix.index:
             return []
@@ -34,7 +39,31 @@ class StockRecommender:
         recommendations = [self.user_stock_matrix.columns[i] for i in top_indices]
         
         return recommendations
-    
+
+    def recommend(self, user_history, stock_data, n_recommendations=5):
+        # Rank the stocks of stock_data by their similarity to the stocks traded in user_history,
+        # the features are built per call so that concurrent calls do not share the fitted vectorizer
+        if not user_history or not stock_data:
+            return []
+        names = [data['name'] for data in stock_data]
+        index = {name: i for i, name in enumerate(names)}
+        stock_descriptions = [' '.join(str(data.get(key, '')) for key in ('name', 'sector', 'industry', 'description'))
+                              for data in stock_data]
+        stock_features = TfidfVectorizer().fit_transform(stock_descriptions)
+
+        # User profile: the features of the traded stocks weighted by the traded quantity
+        weights = np.zeros(len(names))
+        for order in user_history:
+            if order.get('name') in index:
+                weights[index[order['name']]] += order.get('quantity', 1)
+        if not weights.any():
+            return []
+        user_vector = np.asarray(stock_features.T.dot(weights)).reshape(1, -1)
+        similarities = cosine_similarity(user_vector, stock_features)[0]
+
+        top_indices = np.argsort(-similarities, kind='stable')[:n_recommendations]
+        return [names[i] for i in top_indices]
+
     def get_similar_stocks(self, stock_id, n_recommendations=5):
         if stock_id not in self.user_stock_matrix.columns:
             return []
@@ -0,0 +1,42 @@
+import threading
+import time
+
+class LazyModel:
+    def __init__(self, name, factory):
+        self.name = name
+        self.factory = factory
+        self.instance = None
+        self.load_time = None
+        # Bumped on every swap so that results of the replaced model can be told apart
+        self.generation = 0
+        self.lock = threading.Lock()
+
+    def get(self):
+        # The model (and the framework it imports) is only created on first use
+        instance = self.instance
+        if instance is not None:
+            return instance
+        with self.lock:
+            if self.instance is None:
+                start_time = time.perf_counter()
+                self.instance = self.factory()
+                self.load_time = time.perf_counter() - start_time
+            return self.instance
+
+    def swap(self, instance):
+        # Requests that already got the old instance keep using it until they finish
+        with self.lock:
+            old_instance = self.instance
+            self.instance = instance
+            self.generation += 1
+            return old_instance
+
+    def loaded(self):
+        return self.instance is not None
+
+    def stats(self):
+        return {
+            'loaded': self.loaded(),
+            'generation': self.generation,
+            'load_time_ms': self.load_time * 1000 if self.load_time is not None else None
+        }
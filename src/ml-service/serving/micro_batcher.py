@@ -0,0 +1,99 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+class MicroBatcher:
+    def __init__(self, batch_fn, max_batch_size=32, max_wait=0.005, wait_samples=1024):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.requests = queue.Queue()
+        self.lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.failed_batches = 0
+        self.batch_sizes = {}
+        self.waits = deque(maxlen=wait_samples)
+        self.max_queue_wait = 0.0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def after_fork(self):
+        # Threads do not survive a fork, so a forked worker starts its own dispatcher
+        self.requests = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, item):
+        # Queue the item and block until its batch has run
+        future = Future()
+        self.requests.put((item, future, time.perf_counter()))
+        return future.result()
+
+    def _collect(self):
+        # Wait for a first request, then for more until the batch is full or the oldest request waited max_wait
+        batch = [self.requests.get()]
+        deadline = batch[0][2] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self.requests.get(timeout=timeout))
+            except queue.Empty:
+                break
+        # Take whatever is already queued without waiting
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self.requests.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            dispatched_at = time.perf_counter()
+            self._record(batch, dispatched_at)
+            try:
+                results = self.batch_fn([item for item, future, enqueued_at in batch])
+            except Exception as e:
+                with self.lock:
+                    self.failed_batches += 1
+                for item, future, enqueued_at in batch:
+                    future.set_exception(e)
+                continue
+            for (item, future, enqueued_at), result in zip(batch, results):
+                future.set_result(result)
+
+    def _record(self, batch, dispatched_at):
+        with self.lock:
+            self.batches += 1
+            self.items += len(batch)
+            self.batch_sizes[len(batch)] = self.batch_sizes.get(len(batch), 0) + 1
+            for item, future, enqueued_at in batch:
+                wait = dispatched_at - enqueued_at
+                self.waits.append(wait)
+                self.max_queue_wait = max(self.max_queue_wait, wait)
+
+    def stats(self):
+        with self.lock:
+            waits = sorted(self.waits)
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000,
+                'batches': self.batches,
+                'items': self.items,
+                'failed_batches': self.failed_batches,
+                'queue_depth': self.requests.qsize(),
+                'mean_batch_size': self.items / self.batches if self.batches else 0.0,
+                'batch_size_distribution': {str(size): count for size, count in sorted(self.batch_sizes.items())},
+                'queue_wait_ms': {
+                    'p50': waits[len(waits) // 2] * 1000 if waits else None,
+                    'p99': waits[min(len(waits) - 1, int(0.99 * len(waits)))] * 1000 if waits else None,
+                    'max': self.max_queue_wait * 1000
+                }
+            }
@@ -0,0 +1,90 @@
+import itertools
+import threading
+import time
+from collections import deque
+
+class ModelManager:
+    def __init__(self, models, registry_factory, history_size=20):
+        # models maps the registry name of every model to the LazyModel serving it
+        self.models = models
+        self.registry_factory = registry_factory
+        self.registry = None
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.swaps = deque(maxlen=history_size)
+        self.loading = {}
+        self.versions = {name: None for name in models}
+
+    def _registry(self):
+        # The registry imports mlflow, so it is only created by the first swap
+        with self.lock:
+            if self.registry is None:
+                self.registry = self.registry_factory()
+            return self.registry
+
+    def swap(self, name, version=None, swap_id=None):
+        # Start loading a model version in the background, the current model keeps serving meanwhile
+        # (swap_id is given when the swap is relayed to several worker processes, so they share the id)
+        if name not in self.models:
+            raise KeyError(name)
+        with self.lock:
+            if name in self.loading:
+                raise ValueError(f'a swap of {name} is already in progress')
+            record = {
+                'id': swap_id if swap_id is not None else next(self.ids),
+                'model': name,
+                'requested_version': version,
+                'version': None,
+                'state': 'loading',
+                'started_at': time.time(),
+                'load_ms': None,
+                'warm_up_ms': None,
+                'error': None
+            }
+            self.loading[name] = record
+            self.swaps.append(record)
+        threading.Thread(target=self._load, args=(record,), daemon=True).start()
+        return dict(record)
+
+    def _load(self, record):
+        name = record['model']
+        try:
+            start_time = time.perf_counter()
+            loaded = self._registry().load_model(name, record['requested_version'])
+            if loaded is None:
+                raise LookupError(f'no version {record["requested_version"]} of {name} in the registry'
+                                  if record['requested_version'] is not None else f'no version of {name} in the registry')
+            instance, version = loaded
+            record['load_ms'] = (time.perf_counter() - start_time) * 1000
+
+            # Run a dummy inference before serving so the first requests do not pay for it
+            start_time = time.perf_counter()
+            if hasattr(instance, 'warm_up'):
+                instance.warm_up()
+            record['warm_up_ms'] = (time.perf_counter() - start_time) * 1000
+
+            self.models[name].swap(instance)
+            with self.lock:
+                self.versions[name] = version
+                record['version'] = version
+                record['state'] = 'swapped'
+        except Exception as e:
+            with self.lock:
+                record['state'] = 'failed'
+                record['error'] = str(e)
+        finally:
+            with self.lock:
+                record['finished_at'] = time.time()
+                self.loading.pop(name, None)
+
+    def is_loading(self, name):
+        with self.lock:
+            return name in self.loading
+
+    def status(self):
+        with self.lock:
+            return {
+                'models': {name: {'version': self.versions[name], 'loading': name in self.loading,
+                                  'generation': model.generation} for name, model in self.models.items()},
+                'swaps': [dict(record) for record in reversed(self.swaps)]
+            }
@@ -0,0 +1,144 @@
+import gc
+import json
+import os
+import signal
+import socket
+import threading
+from werkzeug.serving import make_server
+
+class PreforkServer:
+    def __init__(self, app, host, port, workers, after_fork=lambda: None, on_message=None):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.after_fork = after_fork
+        # on_message(message) is called in every worker for every message broadcast by any worker
+        self.on_message = on_message
+        self.children = set()
+        self.stopping = False
+        self.sock = None
+        # Workers write their broadcasts to one pipe, the parent relays them to a pipe per worker
+        self.requests = None
+        self.pipes = {}
+        self.messages = []
+        self.lock = threading.Lock()
+
+    def broadcast(self, message):
+        # Called in a worker, the message reaches every worker (this one included) through the parent,
+        # a write below PIPE_BUF bytes is atomic so the broadcasts of several workers do not interleave
+        os.write(self.requests[1], (json.dumps(message) + '\n').encode())
+
+    def _spawn(self):
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid:
+            os.close(read_fd)
+            with self.lock:
+                self.children.add(pid)
+                self.pipes[pid] = write_fd
+                # A replaced worker starts from the state of the parent, so it gets every past message again
+                for message in self.messages:
+                    self._send(pid, message)
+            return
+        # Worker process: serve on the listening socket inherited from the parent
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        code = 0
+        try:
+            os.close(write_fd)
+            for fd in self.pipes.values():
+                os.close(fd)
+            self.after_fork()
+            if self.on_message is not None:
+                threading.Thread(target=self._listen, args=(read_fd,), daemon=True).start()
+            server = make_server(self.host, self.port, self.app, threaded=True, fd=self.sock.fileno())
+            server.serve_forever()
+        except BaseException:
+            code = 1
+        finally:
+            os._exit(code)
+
+    def _send(self, pid, message):
+        # Must be called with the lock held
+        try:
+            os.write(self.pipes[pid], (json.dumps(message) + '\n').encode())
+        except OSError:
+            pass
+
+    def _relay(self):
+        # Parent thread: number every broadcast and pass it to all the workers
+        buffer = b''
+        while True:
+            data = os.read(self.requests[0], 65536)
+            if not data:
+                return
+            buffer += data
+            *lines, buffer = buffer.split(b'\n')
+            for line in lines:
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    continue
+                with self.lock:
+                    message['id'] = len(self.messages) + 1
+                    self.messages.append(message)
+                    for pid in self.pipes:
+                        self._send(pid, message)
+
+    def _listen(self, read_fd):
+        # Worker thread: handle the relayed messages one after the other
+        buffer = b''
+        while True:
+            data = os.read(read_fd, 65536)
+            if not data:
+                return
+            buffer += data
+            *lines, buffer = buffer.split(b'\n')
+            for line in lines:
+                try:
+                    self.on_message(json.loads(line))
+                except Exception:
+                    pass
+
+    def _stop(self, signum, frame):
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def serve_forever(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((self.host, self.port))
+        self.sock.listen(128)
+        self.sock.set_inheritable(True)
+        self.requests = os.pipe()
+        threading.Thread(target=self._relay, daemon=True).start()
+
+        # Objects allocated so far are moved out of the collector, so that collections in the workers
+        # do not write to the pages they share with the parent (copy on write)
+        gc.freeze()
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        for i in range(self.workers):
+            self._spawn()
+
+        # Replace the workers that die until the server is stopped
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            with self.lock:
+                self.children.discard(pid)
+                fd = self.pipes.pop(pid, None)
+                if fd is not None:
+                    os.close(fd)
+            if not self.stopping:
+                self._spawn()
+        self.sock.close()
@@ -0,0 +1,147 @@
+import threading
+import time
+from collections import OrderedDict
+
+class RecommendationStore:
+    def __init__(self, compute_fn, max_staleness=300.0, max_users=10000):
+        # compute_fn(user_id) returns the top N recommendations of a user
+        self.compute_fn = compute_fn
+        self.max_staleness = max_staleness
+        self.max_users = max_users
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+        self.pending = OrderedDict()
+        # Inline computations in progress per user, concurrent misses of a user wait for the same one
+        self.inflight = {}
+        self.catalog_version = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale_served = 0
+        self.inline_computes = 0
+        self.shared_computes = 0
+        self.background_computes = 0
+        self.failed_computes = 0
+        self.evictions = 0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def after_fork(self):
+        # Threads do not survive a fork, so a forked worker starts its own background worker
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+        self.inflight = {}
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def get(self, user_id, force=False):
+        # Served from the store unless forced, missing or older than max_staleness
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is not None and not force:
+                if time.time() - entry['computed_at'] <= self.max_staleness:
+                    self.entries.move_to_end(user_id)
+                    self.hits += 1
+                    if entry['dirty']:
+                        # Waiting for the background recompute, still within the staleness bound
+                        self.stale_served += 1
+                    return entry
+            self.misses += 1
+            flight = self.inflight.get(user_id)
+            owner = flight is None
+            if owner:
+                flight = self.inflight[user_id] = {'done': threading.Event(), 'entry': None, 'error': None}
+            else:
+                self.shared_computes += 1
+        if not owner:
+            # Another request of the same user is computing the list, its result (or error) is shared
+            flight['done'].wait()
+            if flight['error'] is not None:
+                raise flight['error']
+            return flight['entry']
+        try:
+            flight['entry'] = self._compute(user_id, inline=True)
+            return flight['entry']
+        except Exception as e:
+            flight['error'] = e
+            raise
+        finally:
+            with self.lock:
+                self.inflight.pop(user_id, None)
+            flight['done'].set()
+
+    def _compute(self, user_id, inline):
+        with self.lock:
+            catalog_version = self.catalog_version
+        recommendations = self.compute_fn(user_id)
+        entry = {
+            'recommendations': recommendations,
+            'computed_at': time.time(),
+            'catalog_version': catalog_version,
+            'dirty': False
+        }
+        with self.lock:
+            # A trade or a catalog change seen during the computation keeps the entry dirty
+            if user_id in self.pending or catalog_version != self.catalog_version:
+                entry['dirty'] = True
+            self.entries[user_id] = entry
+            self.entries.move_to_end(user_id)
+            while len(self.entries) > self.max_users:
+                evicted, _ = self.entries.popitem(last=False)
+                self.pending.pop(evicted, None)
+                self.evictions += 1
+            if inline:
+                self.inline_computes += 1
+            else:
+                self.background_computes += 1
+        return entry
+
+    def user_changed(self, user_id):
+        # The user traded: their list is recomputed in the background if it is stored
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is None:
+                return
+            entry['dirty'] = True
+            self.pending[user_id] = True
+            self.changed.notify()
+
+    def catalog_changed(self):
+        # Every stored list depends on the catalog, they are all recomputed in the background
+        with self.lock:
+            self.catalog_version += 1
+            for user_id, entry in self.entries.items():
+                entry['dirty'] = True
+                self.pending[user_id] = True
+            self.changed.notify()
+
+    def _run(self):
+        while True:
+            with self.lock:
+                while not self.pending:
+                    self.changed.wait()
+                user_id, _ = self.pending.popitem(last=False)
+            try:
+                self._compute(user_id, inline=False)
+            except Exception:
+                with self.lock:
+                    self.failed_computes += 1
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'users': len(self.entries),
+                'max_staleness': self.max_staleness,
+                'catalog_version': self.catalog_version,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'stale_served': self.stale_served,
+                'inline_computes': self.inline_computes,
+                'shared_computes': self.shared_computes,
+                'background_computes': self.background_computes,
+                'failed_computes': self.failed_computes,
+                'pending': len(self.pending),
+                'evictions': self.evictions
+            }
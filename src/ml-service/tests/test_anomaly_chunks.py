@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+import pytest
+from models.anomaly_detector import TradingAnomalyDetector
+
+FEATURES = ['volume', 'price_change', 'trade_frequency', 'order_size']
+
+def test_anomaly_details_are_the_same_when_scored_in_chunks():
+    rng = np.random.default_rng(0)
+    detector = TradingAnomalyDetector()
+    detector.train({name: rng.normal(size=500) for name in FEATURES})
+
+    trades = pd.DataFrame({name: rng.normal(size=90) for name in FEATURES})
+    trades['trade_id'] = np.arange(90)
+    trades['timestamp'] = ['t' + str(i) for i in range(90)]
+
+    whole = detector.get_anomaly_details(trades)
+    chunked = []
+    for start in range(0, 90, 25):
+        chunked.extend(detector.get_anomaly_details(trades.iloc[start:start + 25], offset=start))
+    # The scaler fitted by training is reused, so every chunk is scaled like the whole submission
+    assert chunked == whole
+    assert [item['row'] for item in whole] == [item['trade_id'] for item in whole]
+    assert all(isinstance(item['trade_id'], int) for item in whole)
+
+def test_untrained_anomaly_detector_does_not_fit_on_requests():
+    detector = TradingAnomalyDetector()
+    trades = pd.DataFrame({name: np.ones(5) for name in FEATURES})
+    with pytest.raises(ValueError):
+        detector.detect_anomalies(trades)
+    # The scoring request did not fit the shared scaler
+    assert not hasattr(detector.scaler, 'mean_')
@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+
+def test_update_fine_tunes_on_the_points_after_the_cutoff():
+    pytest.importorskip('tensorflow')
+    from models.price_predictor import StockPricePredictor
+    predictor = StockPricePredictor()
+    series = 100 + 5 * np.sin(np.arange(200) / 5.0)
+
+    predictor.train(series[:120], epochs=1)
+    assert predictor.trained_until == 120 and predictor.version == 1
+    scale = predictor.scaler.scale_.copy()
+    weights = [w.copy() for w in predictor.model.get_weights()]
+    model = predictor.model
+
+    # Only the 80 new points are targets, the model and the scaler are kept
+    assert predictor.update(series, epochs=1) == 80
+    assert predictor.model is model
+    assert np.array_equal(predictor.scaler.scale_, scale)
+    assert any(not np.array_equal(a, b) for a, b in zip(weights, predictor.model.get_weights()))
+    assert predictor.trained_until == 200 and predictor.version == 2
+
+    # Nothing new since the cutoff, a shorter series is refused
+    assert predictor.update(series) == 0
+    assert predictor.version == 2
+    with pytest.raises(ValueError):
+        predictor.update(series[:150])
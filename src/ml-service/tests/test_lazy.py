@@ -0,0 +1,18 @@
+import threading
+from serving.lazy import LazyModel
+
+def test_lazy_model_builds_once_on_first_use():
+    calls = []
+    model = LazyModel('model', lambda: calls.append(1) or object())
+    assert not model.loaded()
+    assert model.stats()['load_time_ms'] is None
+
+    instances = []
+    threads = [threading.Thread(target=lambda: instances.append(model.get())) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert all(instance is instances[0] for instance in instances)
+    assert model.stats()['loaded']
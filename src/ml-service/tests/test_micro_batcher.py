@@ -0,0 +1,36 @@
+import threading
+import pytest
+from serving.micro_batcher import MicroBatcher
+
+def test_micro_batcher_groups_concurrent_requests():
+    sizes = []
+    def double(items):
+        sizes.append(len(items))
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher(double, max_batch_size=8, max_wait=0.05)
+    results = {}
+    def call(i):
+        results[i] = batcher.submit(i)
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == {i: i * 2 for i in range(20)}
+    assert max(sizes) <= 8
+    assert len(sizes) < 20
+    stats = batcher.stats()
+    assert stats['items'] == 20
+    assert sum(stats['batch_size_distribution'].values()) == stats['batches']
+
+def test_micro_batcher_propagates_errors():
+    def fail(items):
+        raise ValueError('model not loaded')
+
+    batcher = MicroBatcher(fail, max_batch_size=4, max_wait=0.001)
+    with pytest.raises(ValueError):
+        batcher.submit(1)
+    assert batcher.stats()['failed_batches'] == 1
@@ -0,0 +1,54 @@
+import threading
+import time
+import pytest
+from serving.lazy import LazyModel
+from serving.model_manager import ModelManager
+
+class SlowRegistry:
+    def __init__(self):
+        self.release = threading.Event()
+
+    def load_model(self, model_name, version=None):
+        self.release.wait(5)
+        if version == 99:
+            return None
+        return {'name': model_name, 'version': version or 3}, version or 3
+
+def wait_for_swap(manager, name):
+    for i in range(100):
+        if not manager.status()['models'][name]['loading']:
+            return
+        time.sleep(0.01)
+
+def test_model_manager_swaps_without_blocking_the_serving_model():
+    model = LazyModel('price_predictor', lambda: 'initial')
+    registry = SlowRegistry()
+    manager = ModelManager({'price_predictor': model}, lambda: registry)
+
+    in_flight = model.get()
+    record = manager.swap('price_predictor')
+    assert record['state'] == 'loading'
+    # The current model keeps serving while the new version loads
+    assert model.get() == 'initial'
+    with pytest.raises(ValueError):
+        manager.swap('price_predictor')
+
+    registry.release.set()
+    wait_for_swap(manager, 'price_predictor')
+    assert model.get() == {'name': 'price_predictor', 'version': 3}
+    assert in_flight == 'initial'
+    assert model.generation == 1
+    status = manager.status()
+    assert status['models']['price_predictor']['version'] == 3
+    assert status['swaps'][0]['state'] == 'swapped'
+
+def test_model_manager_records_failed_swaps():
+    model = LazyModel('anomaly_detector', lambda: 'initial')
+    registry = SlowRegistry()
+    registry.release.set()
+    manager = ModelManager({'anomaly_detector': model}, lambda: registry)
+
+    manager.swap('anomaly_detector', 99)
+    wait_for_swap(manager, 'anomaly_detector')
+    assert model.get() == 'initial'
+    assert manager.status()['swaps'][0]['state'] == 'failed'
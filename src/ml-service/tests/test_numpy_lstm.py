@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from models.numpy_lstm import NumpyLSTMPredictor, export_weights, load_weights, save_weights
+
+def test_numpy_lstm_matches_keras(tmp_path):
+    pytest.importorskip('tensorflow')
+    from models.price_predictor import StockPricePredictor
+    predictor = StockPricePredictor()
+    series = 100 + 5 * np.sin(np.arange(90) / 5.0)
+    predictor.scaler.fit(series.reshape(-1, 1))
+    predictor.build_model((predictor.sequence_length, 1))
+
+    path = str(tmp_path / 'weights.npz')
+    save_weights(export_weights(predictor), path)
+    numpy_predictor = NumpyLSTMPredictor(load_weights(path))
+
+    windows = [series[i:i + 60] for i in range(0, 30, 3)]
+    np.testing.assert_allclose(numpy_predictor.predict_batch(windows), predictor.predict_batch(windows), atol=1e-3)
+    assert numpy_predictor.predict(series) == pytest.approx(float(predictor.predict(series)), abs=1e-3)
+    with pytest.raises(ValueError):
+        numpy_predictor.predict(series[:10])
+
+    # Monte Carlo dropout: the exported dropout layers make the stochastic passes of both engines spread
+    for engine in [predictor, numpy_predictor]:
+        assert engine.has_dropout()
+        mean, deviation = engine.predict_with_uncertainty(windows, samples=20)
+        assert mean.shape == deviation.shape == (len(windows),)
+        assert np.all(deviation > 0)
+
+def test_numpy_lstm_weights_directory_is_memory_mapped(tmp_path):
+    rng = np.random.default_rng(0)
+    weights = {
+        'sequence_length': np.array(5),
+        'version': np.array(2),
+        'scaler_scale': np.array([0.1]),
+        'scaler_min': np.array([-9.5]),
+        'layer_0_lstm_kernel': rng.normal(0, 0.1, (1, 16)).astype(np.float32),
+        'layer_0_lstm_recurrent_kernel': rng.normal(0, 0.1, (4, 16)).astype(np.float32),
+        'layer_0_lstm_bias': np.zeros(16, dtype=np.float32),
+        'layer_1_dense_kernel': rng.normal(0, 0.1, (4, 1)).astype(np.float32),
+        'layer_1_dense_bias': np.zeros(1, dtype=np.float32)
+    }
+    save_weights(weights, str(tmp_path / 'weights.npz'))
+    save_weights(weights, str(tmp_path / 'weights'))
+
+    mapped = load_weights(str(tmp_path / 'weights'))
+    assert isinstance(mapped['layer_0_lstm_kernel'], np.memmap)
+    windows = [np.arange(5, dtype=float) + 95, np.arange(8, dtype=float) + 90]
+    np.testing.assert_allclose(NumpyLSTMPredictor(mapped).predict_batch(windows),
+                               NumpyLSTMPredictor.from_file(str(tmp_path / 'weights.npz')).predict_batch(windows))
+    assert NumpyLSTMPredictor(mapped).version == 2
+    # Weights without dropout layers (exported before the rates were recorded) cannot be sampled
+    assert not NumpyLSTMPredictor(mapped).has_dropout()
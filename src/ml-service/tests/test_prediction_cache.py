@@ -0,0 +1,30 @@
+import time
+import numpy as np
+from serving.prediction_cache import PredictionCache
+
+def test_prediction_cache_keys_on_window_and_model_version():
+    cache = PredictionCache(max_size=10, ttl=60.0)
+    window = np.arange(60, dtype=float)
+    cache.put(cache.key('AAPL', window, 1), {'predicted_price': 101.0})
+
+    assert cache.get(cache.key('AAPL', window.copy(), 1)) == {'predicted_price': 101.0}
+    # A new price in the window or a retrained model is a miss
+    changed = window.copy()
+    changed[-1] += 1
+    assert cache.get(cache.key('AAPL', changed, 1)) is None
+    assert cache.get(cache.key('AAPL', window, 2)) is None
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 2
+
+def test_prediction_cache_lru_eviction_and_ttl():
+    cache = PredictionCache(max_size=2, ttl=0.05)
+    for symbol in ['AAPL', 'MSFT']:
+        cache.put((symbol, 'h', 0), symbol)
+    cache.get(('AAPL', 'h', 0))
+    cache.put(('GOOG', 'h', 0), 'GOOG')
+    assert cache.get(('MSFT', 'h', 0)) is None
+    assert cache.stats()['evictions'] == 1
+
+    time.sleep(0.06)
+    assert cache.get(('AAPL', 'h', 0)) is None
+    assert cache.stats()['expirations'] == 1
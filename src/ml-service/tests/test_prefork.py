@@ -0,0 +1,68 @@
+import os
+import socket
+import subprocess
+import sys
+import time
+import requests
+
+# Two workers that record the messages relayed to them and answer with their pid
+SERVER = '''
+import os, sys
+sys.path.insert(0, %r)
+from flask import Flask, jsonify
+from serving.prefork import PreforkServer
+
+app = Flask(__name__)
+received = []
+
+@app.post('/broadcast')
+def broadcast():
+    server.broadcast({'model': 'anomaly_detector'})
+    return jsonify({'pid': os.getpid()})
+
+@app.get('/received')
+def get_received():
+    return jsonify({'pid': os.getpid(), 'received': received})
+
+server = PreforkServer(app, '127.0.0.1', %d, 2, on_message=received.append)
+server.serve_forever()
+'''
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def test_prefork_server_relays_broadcasts_to_every_worker():
+    port = free_port()
+    ml_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    process = subprocess.Popen([sys.executable, '-c', SERVER % (ml_dir, port)],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = 'http://127.0.0.1:' + str(port)
+    try:
+        for i in range(100):
+            try:
+                requests.get(base_url + '/received', timeout=1)
+                break
+            except requests.ConnectionError:
+                time.sleep(0.1)
+        requests.post(base_url + '/broadcast', timeout=1)
+        time.sleep(0.2)
+
+        # Every worker got the message once, with the id given by the parent
+        seen = {}
+        for i in range(200):
+            answer = requests.get(base_url + '/received', timeout=1).json()
+            seen[answer['pid']] = answer['received']
+        assert len(seen) == 2
+        assert all(received == [{'model': 'anomaly_detector', 'id': 1}] for received in seen.values())
+
+        # A replaced worker gets the past messages again
+        os.kill(next(iter(seen)), 9)
+        time.sleep(1)
+        for i in range(50):
+            answer = requests.get(base_url + '/received', timeout=1).json()
+            assert answer['received'] == [{'model': 'anomaly_detector', 'id': 1}]
+    finally:
+        process.terminate()
+        process.wait(5)
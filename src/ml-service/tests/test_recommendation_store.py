@@ -0,0 +1,67 @@
+import threading
+import time
+from serving.recommendation_store import RecommendationStore
+
+def wait_for(condition):
+    for i in range(200):
+        if condition():
+            return
+        time.sleep(0.01)
+
+def test_recommendation_store_serves_lookups_and_recomputes_changed_users():
+    calls = []
+    store = RecommendationStore(lambda user_id: calls.append(user_id) or [user_id + '-' + str(len(calls))])
+
+    assert store.get('u1')['recommendations'] == ['u1-1']
+    assert store.get('u1')['recommendations'] == ['u1-1']
+    assert calls == ['u1']
+
+    # A trade of the user is recomputed in the background, the old list is served meanwhile
+    store.user_changed('u1')
+    wait_for(lambda: store.stats()['background_computes'] == 1)
+    assert store.get('u1')['recommendations'] == ['u1-2']
+    assert not store.get('u1')['dirty']
+
+    # A catalog change recomputes every stored user, a forced refresh recomputes inline
+    store.get('u2')
+    store.catalog_changed()
+    wait_for(lambda: store.stats()['background_computes'] == 3)
+    assert store.get('u2', force=True)['recommendations'] == ['u2-6']
+    assert store.stats()['inline_computes'] == 3
+
+def test_recommendation_store_staleness_bound():
+    release = threading.Event()
+    store = RecommendationStore(lambda user_id: release.wait(5) and ['AAPL'], max_staleness=0.05)
+    release.set()
+    first = store.get('u1')
+    time.sleep(0.06)
+    # Older than max_staleness: recomputed on the request instead of served
+    assert store.get('u1') is not first
+    assert store.stats()['misses'] == 2
+
+def test_recommendation_store_shares_concurrent_misses():
+    release = threading.Event()
+    calls = []
+    store = RecommendationStore(lambda user_id: calls.append(user_id) or release.wait(5) and ['AAPL'])
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(store.get('u1'))) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    wait_for(lambda: store.stats()['shared_computes'] == 3)
+    release.set()
+    for thread in threads:
+        thread.join()
+    # One computation for the four misses, all of them get its entry
+    assert calls == ['u1']
+    assert all(entry is results[0] for entry in results)
+    assert store.stats()['inline_computes'] == 1
+
+def test_recommender_ranks_the_catalog_by_the_user_history():
+    from models.recommender import StockRecommender
+    stock_data = [{'name': 'GameStart', 'sector': 'gaming'}, {'name': 'BoarCo', 'sector': 'farming'},
+                  {'name': 'RottenFishCo', 'sector': 'fishing'}, {'name': 'MenhirCo', 'sector': 'gaming'}]
+    user_history = [{'name': 'GameStart', 'quantity': 5, 'type': 'buy'}]
+    recommender = StockRecommender()
+    assert recommender.recommend(user_history, stock_data, 2) == ['GameStart', 'MenhirCo']
+    assert recommender.recommend([], stock_data) == []
+    assert recommender.recommend([{'name': 'missing', 'quantity': 1}], stock_data) == []
@@ -0,0 +1,53 @@
+import sqlite3
+import numpy as np
+import pytest
+from data.window_dataset import WindowDataset
+from models.price_predictor import make_windows
+
+def create_store(path, prices):
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE stock_prices (date TEXT, symbol TEXT, open REAL, high REAL, low REAL, close REAL, '
+                 'volume INTEGER, PRIMARY KEY (date, symbol))')
+    for symbol, closes in prices.items():
+        conn.executemany('INSERT INTO stock_prices (date, symbol, close) VALUES (?, ?, ?)',
+                         [('2020-01-01T%05d' % i, symbol, close) for i, close in enumerate(closes)])
+    conn.commit()
+    conn.close()
+
+def test_window_dataset_streams_every_window_once(tmp_path):
+    rng = np.random.default_rng(0)
+    prices = {'S' + str(i): 100 + np.cumsum(rng.normal(size=length)) for i, length in enumerate([250, 90, 60, 400])}
+    path = str(tmp_path / 'market_data.db')
+    create_store(path, prices)
+
+    # Chunks smaller than the windows and a small buffer exercise the carried over closes and the draining
+    dataset = WindowDataset(path, sequence_length=20, batch_size=16, chunk_rows=7, interleave=2,
+                            shuffle_buffer=50, prefetch=2, seed=1)
+    assert dataset.symbols == ['S0', 'S1', 'S2', 'S3']
+    low = min(closes.min() for closes in prices.values())
+    assert dataset.scaler.data_min_[0] == pytest.approx(low)
+
+    batches = list(dataset)
+    assert all(X.shape[1:] == (20, 1) and len(X) == len(y) for X, y in batches)
+    assert all(len(y) == 16 for X, y in batches[:-1])
+    X = np.concatenate([X for X, y in batches])[:, :, 0]
+    y = np.concatenate([y for X, y in batches])
+    assert len(y) == dataset.count_windows() == 230 + 70 + 40 + 380
+
+    # The same windows as make_windows over the full history of every symbol, in a shuffled order
+    expected = []
+    for closes in prices.values():
+        scaled = dataset.scaler.transform(closes.reshape(-1, 1)).astype(np.float32)[:, 0]
+        windows, targets = make_windows(scaled, 20)
+        expected.append(np.column_stack([windows, targets]))
+    expected = np.concatenate(expected)
+    streamed = np.column_stack([X, y])
+    assert not np.array_equal(streamed, expected)
+    assert np.array_equal(streamed[np.lexsort(streamed.T[::-1])], expected[np.lexsort(expected.T[::-1])])
+
+    # Another epoch is shuffled differently, leaving an epoch early stops the producer
+    assert not np.array_equal(np.concatenate([y for X, y in dataset]), y)
+    for X, y in dataset:
+        break
+    with pytest.raises(ValueError):
+        WindowDataset(path, symbols=['missing'])
@@ -0,0 +1,20 @@
+import numpy as np
+import pytest
+from models.price_predictor import make_windows
+
+def test_make_windows_matches_the_loop_without_copying():
+    data = np.arange(100, dtype=float)
+    X, y = make_windows(data, 60)
+    assert np.array_equal(X, np.array([data[i - 60:i] for i in range(60, 100)]))
+    assert np.array_equal(y, data[60:])
+    assert np.shares_memory(X, data)
+
+    # Several symbols with several features, the target is the chosen feature of the next step
+    bars = np.random.default_rng(0).normal(size=(3, 100, 4))
+    X, y = make_windows(bars, 60, target=2)
+    assert X.shape == (3, 40, 60, 4) and y.shape == (3, 40)
+    assert np.array_equal(X[1, 5], bars[1, 5:65])
+    assert y[1, 5] == bars[1, 65, 2]
+
+    with pytest.raises(ValueError):
+        make_windows(data[:60], 60)
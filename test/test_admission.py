@@ -0,0 +1,90 @@
+import os
+import sys
+import threading
+import time
+import pytest
+
+# making the frontend modules importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'frontend'))
+
+from admission import AdmissionController, AdmissionRejected
+
+# function to start a thread that acquires a slot and records the order in which requests were admitted
+def start_waiting(admission, route_class, admitted):
+    def run():
+        try:
+            admission.acquire(route_class)
+            admitted.append(route_class)
+        except AdmissionRejected as e:
+            admitted.append('shed:'+e.reason)
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+# function to wait until the given number of requests are queued
+def wait_queued(admission, depth):
+    deadline = time.time() + 2
+    while admission.stats()['queue_depth'] < depth and time.time() < deadline:
+        time.sleep(0.005)
+    assert admission.stats()['queue_depth'] == depth
+
+# Function to test that the per class limit is enforced and that a full queue sheds new requests
+def test_admission_limit_and_queue_full():
+    admission = AdmissionController(limits={'lookup': 1}, queue_size=1, queue_timeout=2)
+    admission.acquire('lookup')
+    admitted = []
+    thread = start_waiting(admission, 'lookup', admitted)
+    wait_queued(admission, 1)
+
+    with pytest.raises(AdmissionRejected) as error:
+        admission.acquire('lookup')
+    assert error.value.reason == 'queue full'
+
+    admission.release('lookup')
+    thread.join()
+    assert admitted == ['lookup']
+    stats = admission.stats()
+    assert stats['shed']['lookup'] == 1
+    assert stats['in_flight']['lookup'] == 1
+    assert stats['queue_peak'] == 1
+
+# Function to test that a freed slot goes to a waiting trade before an earlier waiting lookup
+def test_admission_trade_priority():
+    admission = AdmissionController(total_limit=1, queue_size=4, queue_timeout=2)
+    admission.acquire('lookup')
+    admitted = []
+    threads = [start_waiting(admission, 'lookup', admitted)]
+    wait_queued(admission, 1)
+    threads.append(start_waiting(admission, 'trade', admitted))
+    wait_queued(admission, 2)
+
+    admission.release('lookup')
+    threads[1].join()
+    admission.release('trade')
+    threads[0].join()
+    assert admitted == ['trade', 'lookup']
+
+# Function to test that a trade evicts a queued lookup when the queue is full
+def test_admission_trade_evicts_lookup():
+    admission = AdmissionController(total_limit=1, queue_size=1, queue_timeout=2)
+    admission.acquire('lookup')
+    admitted = []
+    lookup_thread = start_waiting(admission, 'lookup', admitted)
+    wait_queued(admission, 1)
+    trade_thread = start_waiting(admission, 'trade', admitted)
+    lookup_thread.join()
+    assert admitted == ['shed:evicted by a higher priority request']
+
+    admission.release('lookup')
+    trade_thread.join()
+    assert admitted[-1] == 'trade'
+
+# Function to test that a queued request is shed after the queue timeout
+def test_admission_queue_timeout():
+    admission = AdmissionController(limits={'order_read': 1}, queue_timeout=0.05)
+    admission.acquire('order_read')
+    with pytest.raises(AdmissionRejected) as error:
+        admission.acquire('order_read')
+    assert error.value.reason == 'queue timeout'
+    assert admission.stats()['queue_depth'] == 0
+    assert admission.stats()['shed']['order_read'] == 1
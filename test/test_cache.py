@@ -0,0 +1,84 @@
+import os
+import sys
+
+# making the frontend modules importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'frontend'))
+
+from cache import LRUCache, CacheSnapshotFile, parse_version
+
+# Function to test that the least recently used entry is evicted when the cache is full
+def test_cache_lru_eviction():
+    caching = LRUCache(2)
+    caching.put('GameStart', {'data': 1})
+    caching.put('FishCo', {'data': 2})
+    caching.get('GameStart')
+    caching.put('BoarCo', {'data': 3})
+    assert sorted(caching.keys()) == ['BoarCo', 'GameStart']
+
+# Function to test that a pushed update replaces the cached entry only if it is newer
+def test_cache_refresh_keeps_newest_version():
+    caching = LRUCache(6)
+    caching.put('GameStart', {'data': {'quantity': 100}}, 1)
+
+    assert caching.refresh('GameStart', {'data': {'quantity': 80}}, 2)
+    assert caching.get('GameStart') == {'data': {'quantity': 80}}
+
+    # an out of order push of an older version is ignored
+    assert not caching.refresh('GameStart', {'data': {'quantity': 100}}, 1)
+    assert caching.get('GameStart') == {'data': {'quantity': 80}}
+
+# Function to test that a lookup which raced with a trade cannot install the older item
+def test_cache_stale_fill_is_rejected():
+    caching = LRUCache(6)
+    # the trade is pushed while the symbol is not cached yet, only its version is recorded
+    assert not caching.refresh('GameStart', {'data': {'quantity': 80}}, 2)
+    assert caching.get('GameStart') is None
+
+    # the racing lookup read version 1 from the catalog before the trade
+    assert not caching.put('GameStart', {'data': {'quantity': 100}}, 1)
+    assert caching.get('GameStart') is None
+
+    # a lookup of the current version is cached
+    assert caching.put('GameStart', {'data': {'quantity': 80}}, 2)
+    assert caching.get('GameStart') == {'data': {'quantity': 80}}
+
+# Function to test that the versions of a restarted catalog are newer than the ones it lost
+def test_cache_accepts_versions_of_a_restarted_catalog():
+    caching = LRUCache(6)
+    assert caching.put('GameStart', {'data': {'quantity': 100}}, parse_version('1000:5'))
+    assert not caching.refresh('GameStart', {'data': {'quantity': 90}}, parse_version([1000, 4]))
+
+    # the catalog restarted without writing its versions, its counter starts again from 0
+    assert caching.refresh('GameStart', {'data': {'quantity': 80}}, parse_version([2000, 1]))
+    assert caching.get('GameStart') == {'data': {'quantity': 80}}
+    assert caching.put('FishCo', {'data': {'quantity': 10}}, parse_version('2000:0'))
+
+    # a plain counter of an older catalog and a missing version
+    assert parse_version('3') == parse_version(3) == (0, 3)
+    assert parse_version(None) is None
+
+# Function to test that the access counts survive a restart through the snapshot file
+def test_cache_snapshot_restores_popular_keys(tmp_path):
+    caching = LRUCache(2)
+    caching.put('GameStart', {'data': 1})
+    caching.put('FishCo', {'data': 2})
+    caching.get('FishCo')
+    caching.put('BoarCo', {'data': 3})
+    for i in range(3):
+        caching.get('BoarCo')
+    # the evicted symbol keeps its access count
+    assert 'GameStart' not in caching.keys()
+    assert caching.popular(3) == ['BoarCo', 'FishCo', 'GameStart']
+
+    snapshot_file = CacheSnapshotFile(str(tmp_path / 'cache_snapshot.json'), caching)
+    assert snapshot_file.write()
+    # nothing changed, so the snapshot is not written again
+    assert not snapshot_file.write()
+
+    restarted = LRUCache(2)
+    restarted.restore(snapshot_file.load())
+    assert restarted.popular(1) == ['BoarCo']
+    assert restarted.keys() == []
+    # a warm-up fill does not count as an access
+    restarted.put('BoarCo', {'data': 3}, access=False)
+    assert restarted.snapshot()['access_counts']['BoarCo'] == 4
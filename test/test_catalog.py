@@ -24,4 +24,30 @@ def test_catalog_failure():
     assert response.status_code == 404
     # Checking if the returned response is inline with the expected error response structure
     # Checking if the passed stock is not found
-    assert response.json()['error'] == 'Stock Not Found!'
\ No newline at end of file
+    assert response.json()['error'] == 'Stock Not Found!'
+
+# Function to test the bulk lookup of the catalog service used by the ml service
+def test_catalog_bulk_lookup():
+    # Passing one existing and one unknown stock name in the payload
+    url = "http://localhost:3000/catalog/lookup"
+    # Calling API with request module
+    response = requests.post(url, json={'names': ['GameStart', 'sample']})
+    # Checking if the status code in response is success
+    assert response.status_code == 200
+    # Checking that the found stock is returned and the unknown stock is reported
+    assert response.json()['data']['GameStart']['name'] == 'GameStart'
+    assert response.json()['not_found'] == ['sample']
+    # Checking that the version of the found stock is sent for the cache of the frontend
+    assert len(response.json()['versions']['GameStart']) == 2
+
+# Function to test the listing of every stock used by the ml service recommendations
+def test_catalog_all():
+    url = "http://localhost:3000/catalog/all"
+    # Calling API with request module
+    response = requests.get(url)
+    # Checking if the status code in response is success
+    assert response.status_code == 200
+    # Checking that the stocks are listed without the internal fields
+    stock = [item for item in response.json() if item['name'] == 'GameStart'][0]
+    assert stock['price'] == 100
+    assert 'trading_volume' not in stock and 'version' not in stock
@@ -0,0 +1,28 @@
+import os
+import sys
+
+# making the benchmark modules importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'benchmark'))
+
+from chaos import stall_after
+
+# function to build a trade as recorded by the chaos load
+def trade(start, end, status):
+    return {'start': start, 'end': end, 'status': status, 'number': None, 'payload': {}}
+
+# Function to test that the stall lasts until the first trade sent after the kill succeeds
+def test_chaos_stall_after_kill():
+    trades = [
+        trade(9.0, 9.5, 200),
+        # in flight when the leader was killed, answered after the kill
+        trade(9.8, 10.4, 200),
+        trade(10.1, 10.6, None),
+        trade(10.6, 11.3, 200),
+        trade(11.0, 11.4, 200)
+    ]
+    result = stall_after(trades, 10.0, 20.0)
+    assert round(result['stall_ms']) == 1300
+    assert result['errors'] == 1
+
+    # no trade went through before the restart
+    assert stall_after(trades[:3], 10.0, 20.0) == {'stall_ms': None, 'errors': 1}
@@ -0,0 +1,118 @@
+import asyncio
+import os
+import sys
+import pytest
+
+aiohttp = pytest.importorskip('aiohttp')
+from aiohttp import web
+
+# making the frontend and benchmark modules importable
+base_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.insert(0, os.path.join(base_dir, 'frontend'))
+sys.path.insert(0, os.path.join(base_dir, 'benchmark'))
+
+from async_app import create_app
+from cache import LRUCache
+from admission import AdmissionController
+from leader import LeaderMonitor
+from upstream import UpstreamClient
+from stub_server import start_stub_server
+
+# function to run the async gateway in front of stub upstreams and call it with the given coroutine
+def run_gateway(check, catalog_delay=0.0):
+    catalog = start_stub_server(delay=catalog_delay, body={'name': 'GameStart', 'price': 100, 'quantity': 100})
+    orders = [start_stub_server(body={'transaction_number': 7}) for i in range(2)]
+    nodes = [{'host': server.server_address[0], 'port': server.server_address[1], 'id': i + 1}
+             for i, server in enumerate(orders)]
+    config = {
+        'catalog': {'host': catalog.server_address[0], 'port': catalog.server_address[1]},
+        'order': {'leader_id': 2, 'nodes': nodes},
+        'upstream': {'read_timeout': 1.0},
+        'cache': True
+    }
+    clients = {node['id']: UpstreamClient('order-'+str(node['id']), node['host'], node['port']) for node in nodes}
+    monitor = LeaderMonitor(nodes, clients)
+    monitor.heartbeat()
+    caching = LRUCache(6)
+
+    async def main():
+        runner = web.AppRunner(create_app(config, caching, monitor, AdmissionController()))
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        try:
+            async with aiohttp.ClientSession() as session:
+                await check(session, 'http://127.0.0.1:'+str(port), orders, caching)
+        finally:
+            await runner.cleanup()
+
+    try:
+        asyncio.run(main())
+    finally:
+        monitor.stop()
+        for server in [catalog] + orders:
+            server.kill()
+
+# Function to test that lookups are proxied to the catalog and then served from the cache
+def test_async_gateway_lookup_and_cache():
+    async def check(session, base_url, orders, caching):
+        async with session.get(base_url+'/catalog/GameStart') as response:
+            assert response.status == 200
+            assert (await response.json())['data']['name'] == 'GameStart'
+        assert caching.get('GameStart') == {'data': {'name': 'GameStart', 'price': 100, 'quantity': 100}}
+
+        async with session.post(base_url+'/cache', json={'name': 'GameStart'}) as response:
+            assert response.status == 200
+        assert caching.get('GameStart') is None
+
+    run_gateway(check)
+
+# Function to test that a trade fails over to the next leader when the leader is down
+def test_async_gateway_trade_failover():
+    async def check(session, base_url, orders, caching):
+        # killing the current leader (highest id)
+        orders[1].kill()
+        async with session.post(base_url+'/orders', json={'name': 'GameStart', 'quantity': 1, 'type': 'buy'}) as response:
+            assert response.status == 200
+            assert (await response.json())['data']['transaction_number'] == 7
+
+        async with session.get(base_url+'/metrics') as response:
+            assert (await response.json())['leader']['leader_id'] == 1
+
+    run_gateway(check)
+
+# Function to test that a trade the leader does not answer in time is not sent again to another node
+def test_async_gateway_trade_timeout_does_not_fail_over():
+    async def check(session, base_url, orders, caching):
+        # the leader accepts the trade but answers after the read timeout
+        orders[1].delay = 1.5
+        async with session.post(base_url+'/orders', json={'name': 'GameStart', 'quantity': 1, 'type': 'buy'}) as response:
+            assert response.status == 504
+            assert (await response.json())['error']['code'] == 504
+
+        async with session.get(base_url+'/metrics') as response:
+            metrics = await response.json()
+        assert metrics['leader']['leader_id'] == 2
+        assert metrics['upstreams']['order-1']['requests'] == 0
+
+    run_gateway(check)
+
+# Function to test that a lookup the catalog does not answer in time gets a json 504
+def test_async_gateway_lookup_timeout():
+    async def check(session, base_url, orders, caching):
+        async with session.get(base_url+'/catalog/GameStart') as response:
+            assert response.status == 504
+            assert (await response.json())['error'] == {'message': 'Upstream service timed out', 'code': 504}
+
+    run_gateway(check, catalog_delay=1.5)
+
+# Function to test that an upstream answer that is not json is reported as a bad gateway like in threaded mode
+def test_async_gateway_invalid_upstream_body():
+    async def check(session, base_url, orders, caching):
+        orders[1].body = b'<html>maintenance</html>'
+        async with session.post(base_url+'/orders', json={'name': 'GameStart', 'quantity': 1, 'type': 'buy'}) as response:
+            assert response.status == 502
+            assert (await response.json())['error'] == {'message': 'Upstream service unavailable', 'code': 502}
+
+    run_gateway(check)
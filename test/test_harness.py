@@ -0,0 +1,34 @@
+import os
+import sys
+
+# making the benchmark modules importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'benchmark'))
+
+from harness import compare, client_args
+
+# function to build a scenario result as stored by the harness
+def result(throughput, p99, errors=0):
+    lookup = {'count': 100, 'errors': errors, 'p50_ms': p99 / 2, 'p99_ms': p99}
+    empty = {'count': 0, 'errors': 0}
+    return {'scenario': 'smoke', 'client': {'throughput_rps': throughput,
+                                            'operations': {'lookup': lookup, 'trade': empty, 'order_read': empty}}}
+
+# Function to test that the compare command only flags changes above the thresholds
+def test_harness_compare_thresholds():
+    base = {'smoke': result(100.0, 10.0)}
+
+    rows, regressions = compare(base, {'smoke': result(95.0, 10.5)})
+    assert regressions == []
+    assert {row['metric'] for row in rows} == {'throughput_rps', 'lookup_p50_ms', 'lookup_p99_ms', 'error_rate'}
+
+    rows, regressions = compare(base, {'smoke': result(80.0, 12.0, errors=5)})
+    assert sorted(row['metric'] for row in regressions) == ['error_rate', 'lookup_p50_ms', 'lookup_p99_ms',
+                                                            'throughput_rps']
+
+    # scenarios missing from one of the runs are not compared
+    rows, regressions = compare(base, {})
+    assert rows == []
+
+# Function to test that the scenario options are passed to the client
+def test_harness_client_args():
+    assert client_args({'workers': 4, 'think_time': 0.1}, 7) == ['--think-time', '0.1', '--workers', '4', '--seed', '7']
@@ -0,0 +1,32 @@
+import os
+import random
+import sys
+
+# making the client modules importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'client'))
+
+from histogram import LatencyHistogram
+
+# Function to test that the percentiles stay within the bucket precision of the exact percentiles
+def test_histogram_percentiles():
+    rng = random.Random(7)
+    values = [rng.expovariate(1 / 0.02) for i in range(10000)]
+    histogram = LatencyHistogram()
+    for value in values:
+        histogram.record(value)
+
+    values.sort()
+    for percentage in [50, 90, 99, 99.9]:
+        exact = values[int(percentage / 100.0 * len(values)) - 1] * 1000000
+        assert abs(histogram.percentile(percentage) - exact) <= exact / 64 + 1
+    assert histogram.summary()['count'] == 10000
+
+# Function to test that merging the worker histograms gives the same result as one histogram
+def test_histogram_merge():
+    first, second, both = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+    for i in range(1, 1001):
+        (first if i % 2 else second).record(i / 1000.0)
+        both.record(i / 1000.0)
+    first.merge(second)
+    assert first.summary() == both.summary()
+    assert LatencyHistogram().summary() == {'count': 0}
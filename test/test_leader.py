@@ -0,0 +1,168 @@
+import os
+import sys
+import threading
+import time
+
+# making the frontend and benchmark modules importable
+base_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.insert(0, os.path.join(base_dir, 'frontend'))
+sys.path.insert(0, os.path.join(base_dir, 'benchmark'))
+
+from upstream import UpstreamClient
+from leader import LeaderMonitor, LeaderStateFile
+from stub_server import start_stub_server
+
+# function to start stub order replicas and the pooled clients towards them
+def start_replicas(count):
+    servers = {}
+    nodes = []
+    clients = {}
+    for node_id in range(1, count + 1):
+        server = start_stub_server(body={'status': 'ok', 'transaction_number': 0})
+        host, port = server.server_address
+        servers[node_id] = server
+        nodes.append({'host': host, 'port': port, 'id': node_id})
+        clients[node_id] = UpstreamClient('order-'+str(node_id), host, port, read_timeout=0.5)
+    return servers, nodes, clients
+
+# Function to test that the highest alive node is elected and that every change bumps the epoch
+def test_leader_monitor_elects_highest_id():
+    servers, nodes, clients = start_replicas(3)
+    changes = []
+    monitor = LeaderMonitor(nodes, clients, on_change=lambda leader, epoch: changes.append((leader['id'], epoch)))
+    try:
+        monitor.heartbeat()
+        leader, epoch = monitor.current()
+        assert leader['id'] == 3
+        assert epoch == 1
+
+        # a failure reported from the request path switches to the next alive node right away
+        assert monitor.report_failure(3)
+        leader, epoch = monitor.current()
+        assert leader['id'] == 2
+        assert epoch == 2
+    finally:
+        monitor.stop()
+        for server in servers.values():
+            server.kill()
+    assert changes == [(3, 1), (2, 2)]
+
+# Function to test that a heartbeat waiting on a hanging node does not block the request path
+def test_heartbeat_does_not_block_current():
+    servers, nodes, clients = start_replicas(2)
+    monitor = LeaderMonitor(nodes, clients, timeout=0.5)
+    try:
+        monitor.heartbeat()
+        servers[1].delay = 0.4
+        thread = threading.Thread(target=monitor.heartbeat)
+        thread.start()
+        time.sleep(0.05)
+        start_time = time.time()
+        leader, epoch = monitor.current()
+        assert time.time() - start_time < 0.1
+        assert leader['id'] == 2
+        thread.join()
+    finally:
+        monitor.stop()
+        for server in servers.values():
+            server.kill()
+
+# Function to test that a frontend without its state file continues from the epoch known by the nodes
+def test_leader_monitor_adopts_the_epoch_of_the_nodes():
+    servers, nodes, clients = start_replicas(3)
+    servers[1].body = {'status': 'ok', 'leader_id': 3, 'epoch': 7}
+    servers[2].body = {'status': 'ok', 'leader_id': 3, 'epoch': 4}
+    servers[3].kill()
+    changes = []
+    monitor = LeaderMonitor(nodes, clients, timeout=0.2,
+                            on_change=lambda leader, epoch: changes.append((leader['id'], epoch)))
+    try:
+        # the epoch read from /leader of the nodes that answer, the dead node is skipped
+        assert monitor.adopt_epoch() == 7
+        monitor.heartbeat()
+        monitor.heartbeat()
+        leader, epoch = monitor.current()
+        assert leader['id'] == 2
+        assert epoch == 8
+
+        # a stale reply of a node that missed the adoption announces the leader again above its epoch,
+        # an older epoch is ignored
+        monitor.reannounce(12)
+        monitor.reannounce(5)
+        assert monitor.current()[1] == 13
+    finally:
+        monitor.stop()
+        for server in servers.values():
+            server.kill()
+    assert changes == [(2, 8), (2, 13)]
+
+# Function to test that the leader state is written in the background and only the latest state is kept
+def test_leader_state_file(tmp_path):
+    state_file = LeaderStateFile(str(tmp_path / 'leader_state.json'))
+    assert state_file.load() is None
+
+    state_file.save(3, 1)
+    state_file.save(2, 2)
+    deadline = time.time() + 2
+    while state_file.load() != {'leader_id': 2, 'epoch': 2} and time.time() < deadline:
+        time.sleep(0.01)
+    assert state_file.load() == {'leader_id': 2, 'epoch': 2}
+
+# Chaos test: kill the leader while trades are sent in a loop and measure the failover time
+def test_leader_failover_under_load():
+    servers, nodes, clients = start_replicas(3)
+    monitor = LeaderMonitor(nodes, clients, interval=0.05, timeout=0.1, max_misses=2)
+    monitor.heartbeat()
+    monitor.start()
+
+    stop_event = threading.Event()
+    counters = {'ok': 0, 'retried': 0, 'failed': 0}
+    counters_lock = threading.Lock()
+
+    # worker doing the same thing as the frontend trade endpoint: call the leader, on failure
+    # report it to the monitor and retry once on the new leader
+    def worker():
+        while not stop_event.is_set():
+            leader, epoch = monitor.current()
+            try:
+                clients[leader['id']].post('/orders', json={'name': 'GameStart', 'quantity': 1, 'type': 'buy'})
+                outcome = 'ok'
+            except Exception:
+                outcome = 'failed'
+                if monitor.report_failure(leader['id']):
+                    leader, epoch = monitor.current()
+                    try:
+                        clients[leader['id']].post('/orders', json={'name': 'GameStart', 'quantity': 1, 'type': 'buy'})
+                        outcome = 'retried'
+                    except Exception:
+                        pass
+            with counters_lock:
+                counters[outcome] += 1
+
+    threads = [threading.Thread(target=worker) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    try:
+        time.sleep(0.3)
+        # killing the leader under load
+        kill_time = time.time()
+        servers[3].kill()
+        while monitor.current()[0]['id'] == 3 and time.time() - kill_time < 5:
+            time.sleep(0.005)
+        failover_time = time.time() - kill_time
+        time.sleep(0.3)
+    finally:
+        stop_event.set()
+        for thread in threads:
+            thread.join()
+        monitor.stop()
+        for server in servers.values():
+            server.kill()
+
+    print("failover time: %.1f ms, monitor stats: %s, requests: %s"
+          % (failover_time * 1000, monitor.stats(), counters))
+    assert monitor.current()[0]['id'] == 2
+    assert failover_time < 1.0
+    # every request that hit the dead leader was retried successfully on the new leader
+    assert counters['failed'] == 0
+    assert counters['ok'] > 0
@@ -0,0 +1,22 @@
+import argparse
+import os
+import sys
+import pytest
+
+pytest.importorskip('flask')
+
+# making the benchmark modules importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'benchmark'))
+
+from micro_bench import run_benchmarks
+
+# Function to test that every hot path runs in process with the HTTP calls stubbed
+def test_micro_bench_runs_all_hot_paths():
+    args = argparse.Namespace(catalog_sizes=[10], history_sizes=[10], threads=[1, 2], target_time=0.001,
+                              min_calls=4, rounds=1, filter=None)
+    results = run_benchmarks(args)
+    names = sorted({result['name'] for result in results})
+    assert names == ['catalog.is_trade_valid[catalog=10]', 'catalog.lookup[catalog=10]',
+                     'order.handle_request[history=10]', 'order.order_info[history=10]']
+    assert len(results) == 8
+    assert all(result['calls'] >= 4 and result['ops_per_s'] > 0 for result in results)
@@ -69,3 +69,24 @@ def test_order_id_not_found():
     assert response.json()['code'] == 404
     # asserting if the order id not found and matching the correct error message
     assert response.json()['message'] == "Order does not exist"
+
+# Function to test the listing of the orders of a user used by the ml service recommendations
+def test_user_orders():
+    url = "http://localhost:4000/orders"
+    # Input to the order service with the user of the trade
+    data = {
+        "name":"GameStart",
+        "quantity": 1,
+        "type": "sell",
+        "user_id": "test-user"
+    }
+    response = requests.post(url, json=data)
+    transaction_number = response.json()["transaction_number"]
+
+    # calling API with requests module
+    response = requests.get("http://localhost:4000/orders/user/test-user")
+    # checking that the trade is listed with its user
+    assert response.status_code == 200
+    orders = [item for item in response.json() if item['transaction_number'] == transaction_number]
+    assert orders[0]['user_id'] == "test-user"
+    assert orders[0]['name'] == "GameStart"
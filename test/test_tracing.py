@@ -0,0 +1,25 @@
+import json
+import os
+import sys
+
+# making the frontend modules importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'frontend'))
+
+from tracing import TraceRecorder, trade_number
+
+# Function to test that the served requests are appended to the trace as compact json lines
+def test_trace_recorder_appends_records(tmp_path):
+    path = str(tmp_path / 'trace.ndjson')
+    recorder = TraceRecorder(path)
+    recorder.record(1000.0, 'lookup', 'GameStart', 200, 0.0125)
+    payload = {'name': 'GameStart', 'type': 'buy', 'quantity': 3}
+    recorder.record(1000.5, 'trade', 'GameStart', 200, 0.1, payload, trade_number({'data': {'transaction_number': 4}}))
+    recorder.flush()
+
+    with open(path, 'r') as file:
+        lines = file.read().splitlines()
+    assert lines[0] == '{"t":1000.0,"r":"lookup","s":"GameStart","c":200,"l":12.5}'
+    assert json.loads(lines[1]) == {'t': 1000.5, 'r': 'trade', 's': 'GameStart', 'c': 200, 'l': 100.0,
+                                    'p': payload, 'n': 4}
+    assert recorder.stats()['recorded'] == 2
+    assert trade_number({'error': {'code': 500}}) is None
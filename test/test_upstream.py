@@ -0,0 +1,44 @@
+import os
+import sys
+import pytest
+import requests
+
+# making the frontend and benchmark modules importable
+base_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.insert(0, os.path.join(base_dir, 'frontend'))
+sys.path.insert(0, os.path.join(base_dir, 'benchmark'))
+
+from upstream import UpstreamClient
+from stub_server import start_stub_server
+
+# Function to test that the pooled client reuses its connection and counts the requests
+def test_upstream_client_counters():
+    server = start_stub_server()
+    host, port = server.server_address
+    client = UpstreamClient('catalog', host, port, pool_size=2)
+    try:
+        for i in range(5):
+            response = client.get('/catalog/GameStart')
+            assert response.status_code == 200
+            assert response.json()['name'] == 'GameStart'
+
+        stats = client.stats()
+        assert stats['requests'] == 5
+        assert stats['errors'] == 0
+        assert stats['avg_latency_ms'] > 0
+    finally:
+        client.close()
+        server.shutdown()
+
+# Function to test that a slow upstream raises a timeout and is counted as an error
+def test_upstream_client_read_timeout():
+    server = start_stub_server(delay=0.5)
+    host, port = server.server_address
+    client = UpstreamClient('order-1', host, port, read_timeout=0.1)
+    try:
+        with pytest.raises(requests.exceptions.Timeout):
+            client.get('/ping')
+        assert client.stats()['errors'] == 1
+    finally:
+        client.close()
+        server.shutdown()